@@ -1,9 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 import json
 import os
 # from backend.models.schemas import Station, UserResponse
 from models.schemas import Station, UserResponse
-from db.snowflake_connector import get_snowflake_manager
+from core.database import get_snowflake_manager
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -85,11 +85,8 @@ def delete_station(station_id: int):
         raise HTTPException(status_code=500, detail="Failed to delete station") 
 
 @router.get("/analytics/user-growth")
-def user_growth(days: int = 30):
+async def user_growth(days: int = 30, manager=Depends(get_snowflake_manager)):
     """Return user registration count per day for the last N days."""
-    manager = get_snowflake_manager()
-    if not manager:
-        raise HTTPException(status_code=503, detail="Snowflake not available")
     query = f'''
         SELECT TO_DATE(created_at) as date, COUNT(*) as count
         FROM users
@@ -97,14 +94,11 @@ def user_growth(days: int = 30):
         GROUP BY date
         ORDER BY date
     '''
-    return manager.execute_query(query)
+    return await manager.aexecute_query(query, workload='analytics')
 
 @router.get("/analytics/session-stats")
-def session_stats(days: int = 30):
+async def session_stats(days: int = 30, manager=Depends(get_snowflake_manager)):
     """Return session count and total energy per day for the last N days."""
-    manager = get_snowflake_manager()
-    if not manager:
-        raise HTTPException(status_code=503, detail="Snowflake not available")
     query = f'''
         SELECT TO_DATE(start_time) as date, COUNT(*) as sessions, SUM(energy_consumed_kwh) as total_energy
         FROM sessions
@@ -112,14 +106,11 @@ def session_stats(days: int = 30):
         GROUP BY date
         ORDER BY date
     '''
-    return manager.execute_query(query)
+    return await manager.aexecute_query(query, workload='analytics')
 
 @router.get("/analytics/station-usage")
-def station_usage(top: int = 5):
+async def station_usage(top: int = 5, manager=Depends(get_snowflake_manager)):
     """Return top N stations by total sessions."""
-    manager = get_snowflake_manager()
-    if not manager:
-        raise HTTPException(status_code=503, detail="Snowflake not available")
     query = f'''
         SELECT s.id, s.name, COUNT(sess.id) as total_sessions
         FROM stations s
@@ -128,4 +119,4 @@ def station_usage(top: int = 5):
         ORDER BY total_sessions DESC
         LIMIT {top}
     '''
-    return manager.execute_query(query) 
\ No newline at end of file
+    return await manager.aexecute_query(query, workload='analytics') 
\ No newline at end of file
@@ -4,30 +4,13 @@ import sys
 from typing import List, Optional
 from models.schemas import UserSession, SessionResponse
 from core.jwt_utils import get_token_from_request, verify_token
+from core.database import get_snowflake_manager
 
 # Add parent directory to path to access db module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 router = APIRouter(prefix="/sessions", tags=["Sessions"])
 
-# Lazy import and initialization of Snowflake manager
-def get_snowflake_manager():
-    """Get SnowflakeManager instance with lazy initialization."""
-    try:
-        from db.snowflake_connector import SnowflakeManager
-        return SnowflakeManager()
-    except Exception as e:
-        print(f"Snowflake not available: {e}")
-        return None
-
-def is_snowflake_available():
-    """Check if Snowflake is available."""
-    try:
-        manager = get_snowflake_manager()
-        return manager is not None
-    except:
-        return False
-
 def get_current_user_id(request: Request) -> int:
     """Get current user ID from JWT token."""
     try:
@@ -41,19 +24,14 @@ def get_current_user_id(request: Request) -> int:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 @router.post("/", response_model=dict)
-def log_session(session: UserSession, request: Request):
+async def log_session(session: UserSession, request: Request, snowflake_manager=Depends(get_snowflake_manager)):
     """Log a user charging session to Snowflake database."""
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Database not available")
-        
         # Verify the user is authenticated and owns the session
         current_user_id = get_current_user_id(request)
         if current_user_id != session.user_id:
             raise HTTPException(status_code=403, detail="Cannot log session for another user")
         
-        snowflake_manager = get_snowflake_manager()
-        
         # Insert new session
         insert_query = """
             INSERT INTO sessions (user_id, station_id, start_time, end_time, energy_consumed_kwh, cost)
@@ -65,7 +43,7 @@ def log_session(session: UserSession, request: Request):
         energy_consumed = 0.0  # kWh
         cost = 0.0  # Currency
         
-        snowflake_manager.execute_query(insert_query, (
+        await snowflake_manager.aexecute_query(insert_query, (
             session.user_id,
             session.station_id,
             session.timestamp,  # start_time
@@ -83,14 +61,10 @@ def log_session(session: UserSession, request: Request):
         raise HTTPException(status_code=500, detail="Failed to log session")
 
 @router.get("/", response_model=List[SessionResponse])
-def get_user_sessions(request: Request, limit: int = 50, offset: int = 0):
+async def get_user_sessions(request: Request, limit: int = 50, offset: int = 0, snowflake_manager=Depends(get_snowflake_manager)):
     """Get charging sessions for the current user."""
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Database not available")
-        
         current_user_id = get_current_user_id(request)
-        snowflake_manager = get_snowflake_manager()
         
         # Get user sessions with station information
         query = """
@@ -114,7 +88,7 @@ def get_user_sessions(request: Request, limit: int = 50, offset: int = 0):
             LIMIT %s OFFSET %s
         """
         
-        sessions_data = snowflake_manager.execute_query(query, (current_user_id, limit, offset))
+        sessions_data = await snowflake_manager.aexecute_query(query, (current_user_id, limit, offset))
         
         sessions = []
         for session_data in sessions_data:
@@ -142,14 +116,10 @@ def get_user_sessions(request: Request, limit: int = 50, offset: int = 0):
         raise HTTPException(status_code=500, detail="Failed to retrieve sessions")
 
 @router.get("/statistics")
-def get_session_statistics(request: Request):
+async def get_session_statistics(request: Request, snowflake_manager=Depends(get_snowflake_manager)):
     """Get charging session statistics for the current user."""
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Database not available")
-        
         current_user_id = get_current_user_id(request)
-        snowflake_manager = get_snowflake_manager()
         
         # Get session statistics
         stats_query = """
@@ -164,7 +134,7 @@ def get_session_statistics(request: Request):
             WHERE user_id = %s
         """
         
-        stats_data = snowflake_manager.execute_query(stats_query, (current_user_id,))
+        stats_data = await snowflake_manager.aexecute_query(stats_query, (current_user_id,))
         
         if not stats_data:
             return {
@@ -185,14 +155,10 @@ def get_session_statistics(request: Request):
         raise HTTPException(status_code=500, detail="Failed to retrieve session statistics")
 
 @router.get("/recent")
-def get_recent_sessions(request: Request, count: int = 5):
+async def get_recent_sessions(request: Request, count: int = 5, snowflake_manager=Depends(get_snowflake_manager)):
     """Get recent charging sessions for the current user."""
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Database not available")
-        
         current_user_id = get_current_user_id(request)
-        snowflake_manager = get_snowflake_manager()
         
         # Get recent sessions
         query = """
@@ -212,7 +178,7 @@ def get_recent_sessions(request: Request, count: int = 5):
             LIMIT %s
         """
         
-        recent_sessions = snowflake_manager.execute_query(query, (current_user_id, count))
+        recent_sessions = await snowflake_manager.aexecute_query(query, (current_user_id, count))
         return recent_sessions
         
     except HTTPException:
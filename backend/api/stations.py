@@ -1,212 +1,580 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+import hashlib
+import json
 import os
 import sys
-import requests
-import math
-from typing import List, Optional
-from models.schemas import Station, NearbyStation
+import time
+import asyncio
+import heapq
+import itertools
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from models.schemas import Station, NearbyStation, NearbyStationsResponse, NearbyBatchRequest, AlongRouteRequest, SourceStatus
+from core.compression import MIN_COMPRESS_BYTES, compress_bytes, compress_stream, negotiate_encoding
+from core.config import settings
+from core.database import get_snowflake_manager, get_optional_snowflake_manager
+from core.ocm import get_ocm_cache
+from core.spatial_index import GridIndex
+from core.station_catalog import get_station_catalog
+from core.station_clusters import MAX_CLUSTER_ZOOM, StationClusterIndex, get_station_clusters
+from core.station_search import get_station_search
+from core.station_autocomplete import MAX_SUGGESTIONS, get_station_autocomplete
+from core.station_stats import get_station_stats
 
 # Add parent directory to path to access db module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from db.connectors import StationFilter, parse_connectors, summarize_connections
+from db.geo import bounding_boxes, decode_polyline, haversine_km_array
+from db.station_stats import summarize_station_stats
+
 router = APIRouter(prefix="/stations", tags=["Stations"])
 
-# Lazy import and initialization of Snowflake manager
-def get_snowflake_manager():
-    """Get SnowflakeManager instance with lazy initialization."""
+STATIONS_PAGE_DEFAULT = 1000
+STATIONS_PAGE_MAX = 5000
+STATIONS_STREAM_BATCH = 5000
+STATIONS_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "geojson": "application/geo+json",
+}
+
+# Lines of a /nearby/batch response rendered per streamed chunk
+NEARBY_BATCH_CHUNK = 100
+
+# Routes longer than this many vertices are rejected; simplify them first
+ROUTE_MAX_VERTICES = 50000
+# Without the catalog, consecutive segments are grouped into one database box per this many
+ROUTE_SEGMENTS_PER_BOX = 50
+
+# Stations without an ocm_id are matched on coordinates rounded to ~11 m
+DEDUPE_COORDINATE_DECIMALS = 4
+
+def estimate_travel_time(distance_km: float, avg_speed_kmh: float = 30) -> int:
+    """Estimate travel time in minutes."""
+    return int((distance_km / avg_speed_kmh) * 60)
+
+async def _with_deadline(source: str, lookup, deadline: float, sources: Dict[str, SourceStatus]) -> List[NearbyStation]:
+    """Await one source's lookup, recording in ``sources`` whether it answered before its deadline."""
+    started = time.perf_counter()
     try:
-        from db.snowflake_connector import SnowflakeManager
-        return SnowflakeManager()
+        stations = await asyncio.wait_for(lookup, timeout=deadline)
+        status = SourceStatus(status="ok", results=len(stations))
+    except asyncio.TimeoutError:
+        stations, status = [], SourceStatus(status="timeout")
     except Exception as e:
-        print(f"Snowflake not available: {e}")
-        return None
+        print(f"Error getting nearby stations from {source}: {e}")
+        stations, status = [], SourceStatus(status="error")
+    status.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    sources[source] = status
+    return stations
 
-def is_snowflake_available():
-    """Check if Snowflake is available."""
-    try:
-        manager = get_snowflake_manager()
-        return manager is not None
-    except:
+def _station_json(station: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": station["id"],
+        "name": station["name"],
+        "latitude": station["latitude"],
+        "longitude": station["longitude"],
+        "energy_type": station["energy_type"],
+        "available": bool(station["available"]),
+    }
+
+def _station_feature(station: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "Feature",
+        "id": station["id"],
+        "geometry": {"type": "Point", "coordinates": [station["longitude"], station["latitude"]]},
+        "properties": {
+            "name": station["name"],
+            "energy_type": station["energy_type"],
+            "available": bool(station["available"]),
+        },
+    }
+
+def _render_stations(batches: Iterable[List[Dict[str, Any]]], fmt: str) -> Iterator[bytes]:
+    """Encode batches of station rows as one JSON array, NDJSON lines or a GeoJSON FeatureCollection."""
+    if fmt == "ndjson":
+        for batch in batches:
+            if batch:
+                yield "".join(json.dumps(_station_json(station), default=str) + "\n" for station in batch).encode()
+        return
+
+    opening, encode = ("[", _station_json) if fmt == "json" else ('{"type":"FeatureCollection","features":[', _station_feature)
+    yield opening.encode()
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        chunk = ",".join(json.dumps(encode(station), default=str) for station in batch)
+        yield (chunk if first else "," + chunk).encode()
+        first = False
+    yield b"]" if fmt == "json" else b"]}"
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag."""
+    if not if_none_match:
         return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in candidates)
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points using Haversine formula."""
-    R = 6371  # Earth's radius in kilometers
+# The handler builds its own responses in several formats, so the schema is documentation only
+@router.get("/", responses={200: {"model": List[Station],
+                                  "content": {media_type: {} for media_type in STATIONS_MEDIA_TYPES.values()}}})
+async def get_stations(
+    request: Request,
+    after_id: Optional[int] = Query(None, description="Keyset cursor: return stations with an id greater than this"),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (json: default 1000, at most 5000; "
+                                                          "ndjson/geojson: default the whole catalogue)"),
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson|geojson)$",
+                     description="json array, or streamed ndjson / geojson"),
+    snowflake_manager=Depends(get_optional_snowflake_manager),
+    catalog=Depends(get_station_catalog)
+):
+    """Fetch charging stations in id order, one keyset page at a time.
+    
+    The ``Link: rel="next"`` header points at the following page. Streamed
+    formats can span the whole catalogue; resume one by passing the last id
+    received as ``after_id``. Bodies are gzip or brotli compressed when the
+    client accepts it, and pages carry an ETag for If-None-Match revalidation.
+    
+    X-DB-Query-Count and X-DB-Time-Ms are sent before a streamed body, so for
+    streams read from Snowflake they cover only the first batch's query.
+    """
+    if fmt == "json":
+        limit = min(limit or STATIONS_PAGE_DEFAULT, STATIONS_PAGE_MAX)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    media_type = STATIONS_MEDIA_TYPES[fmt]
+    
+    etag, has_more = None, False
+    if catalog is not None:
+        version, rows, has_more = catalog.page(after_id, limit)
+        # The catalog version changes with every station change, so it identifies the page contents
+        etag = 'W/"%s"' % hashlib.sha1(f"{version}:{fmt}:{after_id}:{limit}".encode()).hexdigest()[:20]
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+        rows = [station._asdict() for station in rows]
+        batches = (rows[i:i + STATIONS_STREAM_BATCH] for i in range(0, len(rows), STATIONS_STREAM_BATCH))
+    elif snowflake_manager is None:
+        raise HTTPException(status_code=503, detail="Snowflake database not available")
+    elif fmt == "json":
+        try:
+            # One extra row tells whether another page follows
+            rows = await snowflake_manager.arun(snowflake_manager.get_stations_page, after_id, limit + 1)
+        except Exception as e:
+            print(f"Error loading stations: {e}")
+            raise HTTPException(status_code=500, detail="Failed to load stations")
+        has_more, rows = len(rows) > limit, rows[:limit]
+        batches = [rows]
+    else:
+        # Fetch the first batch now so a failure is still a 500 and the X-DB-* headers count it;
+        # the rest stream one keyset query per batch without holding a connection in between
+        size = STATIONS_STREAM_BATCH if limit is None else min(STATIONS_STREAM_BATCH, limit)
+        try:
+            rows = await snowflake_manager.arun(snowflake_manager.get_stations_page, after_id, size)
+        except Exception as e:
+            print(f"Error loading stations: {e}")
+            raise HTTPException(status_code=500, detail="Failed to load stations")
+        batches = [rows]
+        if len(rows) == size and (limit is None or limit > size):
+            rest = snowflake_manager.iter_stations(batch_size=STATIONS_STREAM_BATCH, after_id=rows[-1]["id"],
+                                                   limit=None if limit is None else limit - size)
+            batches = itertools.chain(batches, rest)
     
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
+    if has_more and rows:
+        next_url = request.url.include_query_params(after_id=rows[-1]["id"])
+        headers["Link"] = f'<{next_url}>; rel="next"'
     
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
+    if fmt != "json":
+        if etag:
+            headers["ETag"] = etag
+        return StreamingResponse(compress_stream(_render_stations(batches, fmt), encoding),
+                                 media_type=media_type, headers=headers)
     
-    return R * c
+    body = b"".join(_render_stations(batches, fmt))
+    if etag is None:
+        etag = 'W/"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+    headers["ETag"] = etag
+    if len(body) < MIN_COMPRESS_BYTES:
+        headers.pop("Content-Encoding", None)
+    else:
+        body = compress_bytes(body, encoding)
+    return Response(content=body, media_type=media_type, headers=headers)
 
-def estimate_travel_time(distance_km: float, avg_speed_kmh: float = 30) -> int:
-    """Estimate travel time in minutes."""
-    return int((distance_km / avg_speed_kmh) * 60)
+async def _nearby_from_snowflake(snowflake_manager, catalog, lat: float, lon: float,
+                                 radius: float, limit: int,
+                                 station_filter: Optional[StationFilter] = None) -> List[NearbyStation]:
+    """Stations from the in-memory catalog, or from Snowflake until it has loaded."""
+    if catalog is not None:
+        snowflake_stations = [dict(station._asdict(), distance_km=distance) for station, distance
+                              in catalog.nearby(lat, lon, radius, limit=limit, station_filter=station_filter)]
+    else:
+        snowflake_stations = await snowflake_manager.arun(snowflake_manager.get_stations_by_location, lat, lon, radius)
+        if station_filter is not None and station_filter.active:
+            # Rows may predate connector_mask; matches_row falls back to energy_type
+            snowflake_stations = [station for station in snowflake_stations if station_filter.matches_row(station)]
+    
+    return [NearbyStation(**_nearby_fields(station, station.get('distance_km', 0)))
+            for station in snowflake_stations if station.get('distance_km', 0) <= radius]
 
-def fetch_ocm_stations(lat: float, lon: float, radius: float = 10) -> List[dict]:
-    """Fetch stations from Open Charge Map API."""
-    try:
-        ocm_api_key = os.getenv("OCM_API_KEY", "")
-        if not ocm_api_key:
-            return []
-        
-        url = "https://api.openchargemap.io/v3/poi"
-        params = {
-            "key": ocm_api_key,
-            "latitude": lat,
-            "longitude": lon,
-            "distance": radius,
-            "distanceunit": "km",
-            "maxresults": 50,
-            "compact": True,
-            "verbose": False
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"OCM API error: {response.status_code}")
-            return []
-    except Exception as e:
-        print(f"Error fetching OCM stations: {e}")
-        return []
+def _nearby_fields(station: Dict[str, Any], distance: float) -> Dict[str, Any]:
+    """NearbyStation fields for one of our stations at ``distance`` km."""
+    return {
+        "id": str(station["id"]),
+        "name": station["name"],
+        "latitude": station["latitude"],
+        "longitude": station["longitude"],
+        "energy_type": station["energy_type"],
+        "available": station["available"],
+        "distance_km": round(distance, 2),
+        "travel_time_minutes": estimate_travel_time(distance),
+        "source": "snowflake",
+        "ocm_id": station.get("ocm_id"),
+    }
 
-@router.get("/", response_model=List[Station])
-def get_stations():
-    """Fetch all charging stations from Snowflake database."""
-    try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Snowflake database not available")
-        
-        snowflake_manager = get_snowflake_manager()
-        stations_data = snowflake_manager.get_stations(limit=1000)
-        
-        if not stations_data:
-            return []
-        
-        stations = []
-        for station in stations_data:
-            stations.append(Station(
-                id=station["id"],
-                name=station["name"],
-                latitude=station["latitude"],
-                longitude=station["longitude"],
-                energy_type=station["energy_type"],
-                available=station["available"]
+async def _nearby_from_ocm(ocm_cache, lat: float, lon: float, radius: float, limit: int,
+                           held: Optional[Callable[[int], bool]] = None,
+                           station_filter: Optional[StationFilter] = None) -> List[NearbyStation]:
+    """The ``limit`` nearest Open Charge Map stations within the radius, through the geohash-tile cache.
+
+    ``held(ocm_id)`` tells which OCM stations we already store; those are
+    dropped before parsing since the Snowflake source returns them.
+    """
+    ocm_stations = await ocm_cache.stations_near(lat, lon, radius)
+    
+    # Distances for all OCM results in one vectorized pass
+    ocm_stations = [station for station in ocm_stations
+                    if (station.get("AddressInfo") or {}).get("Latitude")
+                    and (station.get("AddressInfo") or {}).get("Longitude")
+                    and not (held is not None and held(station.get("ID")))]
+    if station_filter is not None and station_filter.active:
+        # OCM doesn't provide real-time availability, so its stations count as available
+        summaries = [summarize_connections(station.get("Connections")) for station in ocm_stations]
+        ocm_stations = [station for station, summary in zip(ocm_stations, summaries)
+                        if station_filter.matches(summary.connector_mask, summary.max_power_kw, True)]
+    distances = haversine_km_array(
+        lat, lon,
+        [station["AddressInfo"]["Latitude"] for station in ocm_stations],
+        [station["AddressInfo"]["Longitude"] for station in ocm_stations],
+    ).tolist()
+    
+    # Only the nearest ``limit`` can make the response; parse just those
+    candidates = heapq.nsmallest(limit, ((distance, i) for i, distance in enumerate(distances) if distance <= radius))
+    
+    nearby_stations = []
+    for distance, i in candidates:
+        station = ocm_stations[i]
+        try:
+            # Extract station data from OCM response
+            station_lat = station["AddressInfo"]["Latitude"]
+            station_lon = station["AddressInfo"]["Longitude"]
+            travel_time = estimate_travel_time(distance)
+            
+            # Get station name
+            station_name = station.get("AddressInfo", {}).get("Title", "Unknown Station")
+            if not station_name or station_name == "Unknown Station":
+                station_name = f"Station at {station.get('AddressInfo', {}).get('AddressLine1', 'Unknown Location')}"
+            
+            # Get connection info
+            energy_type = summarize_connections(station.get("Connections", [])).energy_type
+            
+            nearby_stations.append(NearbyStation(
+                id=f"ocm_{station.get('ID', len(nearby_stations) + 1000)}",
+                name=station_name,
+                latitude=station_lat,
+                longitude=station_lon,
+                energy_type=energy_type,
+                available=True,  # OCM doesn't provide real-time availability
+                distance_km=round(distance, 2),
+                travel_time_minutes=travel_time,
+                source="ocm",
+                ocm_id=station.get("ID")
             ))
-        
-        return stations
-        
-    except Exception as e:
-        print(f"Error loading stations: {e}")
-        raise HTTPException(status_code=500, detail="Failed to load stations")
+        except Exception as e:
+            print(f"Error processing OCM station: {e}")
+            continue
+    return nearby_stations
 
-@router.get("/nearby", response_model=List[NearbyStation])
-def get_nearby_stations(
+def merge_nearby(snowflake_stations: List[NearbyStation], ocm_stations: List[NearbyStation],
+                 limit: int) -> List[NearbyStation]:
+    """The ``limit`` nearest stations across both sources, each physical station once.
+
+    An OCM station is a duplicate of a Snowflake row with the same ``ocm_id``
+    or, for rows without one, the same rounded coordinates; the Snowflake row
+    wins since it carries live availability.
+    """
+    held_ids = {station.ocm_id for station in snowflake_stations if station.ocm_id is not None}
+    held_coordinates = {
+        (round(station.latitude, DEDUPE_COORDINATE_DECIMALS), round(station.longitude, DEDUPE_COORDINATE_DECIMALS))
+        for station in snowflake_stations
+    }
+    merged = list(snowflake_stations)
+    for station in ocm_stations:
+        if station.ocm_id in held_ids:
+            continue
+        if (round(station.latitude, DEDUPE_COORDINATE_DECIMALS),
+                round(station.longitude, DEDUPE_COORDINATE_DECIMALS)) in held_coordinates:
+            continue
+        merged.append(station)
+    return heapq.nsmallest(limit, merged, key=lambda station: station.distance_km)
+
+@router.get("/nearby", response_model=NearbyStationsResponse)
+async def get_nearby_stations(
     lat: float = Query(..., description="User's latitude"),
     lon: float = Query(..., description="User's longitude"),
     radius: float = Query(10, description="Search radius in kilometers"),
     use_ocm: bool = Query(True, description="Use Open Charge Map API"),
-    limit: int = Query(5, description="Number of nearest stations to return")
+    limit: int = Query(5, description="Number of nearest stations to return"),
+    connector: Optional[List[str]] = Query(None, description="Connector types to accept, repeated or comma-separated "
+                                                             "(ccs, chademo, type2, type1, tesla, gbt, bharat_ac, ...)"),
+    min_power_kw: Optional[float] = Query(None, ge=0, description="Only stations with a connection of at least this power"),
+    available_only: bool = Query(False, description="Only stations currently available"),
+    snowflake_manager=Depends(get_optional_snowflake_manager),
+    catalog=Depends(get_station_catalog),
+    ocm_cache=Depends(get_ocm_cache)
 ):
-    """Get nearby charging stations with distance and time calculations."""
+    """Get nearby charging stations with distance and time calculations.
+    
+    Snowflake (or the station catalog) and Open Charge Map are queried
+    concurrently, each under its own deadline. Stations from every source that
+    answered in time are merged, without duplicates, into the ``limit``
+    nearest; ``sources`` reports how each one fared. The connector, power and
+    availability filters apply before ``limit``.
+    """
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Snowflake database not available")
-        
-        nearby_stations = []
-        snowflake_manager = get_snowflake_manager()
-        
-        # Get stations from Snowflake
+        station_filter = StationFilter(parse_connectors(connector or []), min_power_kw, available_only)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    sources: Dict[str, SourceStatus] = {}
+    lookups = {}
+    
+    if catalog is None and snowflake_manager is None:
+        sources["snowflake"] = SourceStatus(status="unavailable")
+    else:
+        lookups["snowflake"] = _with_deadline(
+            "snowflake", _nearby_from_snowflake(snowflake_manager, catalog, lat, lon, radius, limit, station_filter),
+            settings.NEARBY_DB_DEADLINE_SECONDS, sources)
+    
+    if not use_ocm:
+        sources["ocm"] = SourceStatus(status="skipped")
+    elif ocm_cache is None or not os.getenv("OCM_API_KEY", ""):
+        sources["ocm"] = SourceStatus(status="unavailable")
+    else:
+        # With the catalog loaded, OCM stations we hold are known before either source answers
+        held = catalog.holds_ocm_id if catalog is not None else None
+        lookups["ocm"] = _with_deadline(
+            "ocm", _nearby_from_ocm(ocm_cache, lat, lon, radius, limit, held, station_filter),
+            settings.NEARBY_OCM_DEADLINE_SECONDS, sources)
+    
+    results = dict(zip(lookups, await asyncio.gather(*lookups.values())))
+    sources_answered = [name for name, status in sources.items() if status.status == "ok"]
+    if not sources_answered and any(status.status != "skipped" for status in sources.values()):
+        raise HTTPException(status_code=503, detail="No station source answered in time")
+    
+    nearby_stations = merge_nearby(results.get("snowflake", []), results.get("ocm", []), limit)
+    
+    return NearbyStationsResponse(
+        stations=nearby_stations,
+        sources=sources,
+        sources_answered=sources_answered
+    )
+
+@router.post("/nearby/batch")
+async def get_nearby_stations_batch(
+    request: Request,
+    batch: NearbyBatchRequest,
+    snowflake_manager=Depends(get_optional_snowflake_manager),
+    catalog=Depends(get_station_catalog)
+):
+    """Nearest stations for many points at once, e.g. every vehicle of a fleet.
+    
+    All queries are resolved together: in one vectorized pass over the station
+    catalog's spatial index, or in a single Snowflake query until the catalog
+    has loaded. Results stream back as NDJSON, one line per query in request
+    order: ``{"index", "id", "stations"}``. Open Charge Map is not consulted;
+    use /stations/nearby for that.
+    """
+    queries = batch.queries
+    if catalog is not None:
+        matches = catalog.nearby_many([(q.lat, q.lon, q.radius, q.limit) for q in queries])
+        results = [[_nearby_fields(station._asdict(), distance) for station, distance in found] for found in matches]
+    elif snowflake_manager is None:
+        raise HTTPException(status_code=503, detail="Snowflake database not available")
+    else:
         try:
-            snowflake_stations = snowflake_manager.get_stations_by_location(lat, lon, radius)
-            
-            for station in snowflake_stations:
-                distance = station.get('distance_km', 0)
-                if distance <= radius:
-                    travel_time = estimate_travel_time(distance)
-                    nearby_stations.append(NearbyStation(
-                        id=str(station["id"]),
-                        name=station["name"],
-                        latitude=station["latitude"],
-                        longitude=station["longitude"],
-                        energy_type=station["energy_type"],
-                        available=station["available"],
-                        distance_km=round(distance, 2),
-                        travel_time_minutes=travel_time,
-                        source="snowflake"
-                    ))
+            matches = await snowflake_manager.arun(snowflake_manager.get_stations_near_points,
+                                                   [(q.lat, q.lon, q.radius, q.limit) for q in queries])
         except Exception as e:
-            print(f"Error getting stations from Snowflake: {e}")
-            raise HTTPException(status_code=500, detail="Failed to retrieve stations from database")
-        
-        # Fetch from Open Charge Map API if enabled
-        if use_ocm:
-            ocm_stations = fetch_ocm_stations(lat, lon, radius)
-            for station in ocm_stations:
-                try:
-                    # Extract station data from OCM response
-                    station_lat = station.get("AddressInfo", {}).get("Latitude", 0)
-                    station_lon = station.get("AddressInfo", {}).get("Longitude", 0)
-                    
-                    if station_lat and station_lon:
-                        distance = calculate_distance(lat, lon, station_lat, station_lon)
-                        if distance <= radius:
-                            travel_time = estimate_travel_time(distance)
-                            
-                            # Get station name
-                            station_name = station.get("AddressInfo", {}).get("Title", "Unknown Station")
-                            if not station_name or station_name == "Unknown Station":
-                                station_name = f"Station at {station.get('AddressInfo', {}).get('AddressLine1', 'Unknown Location')}"
-                            
-                            # Get connection info
-                            connections = station.get("Connections", [])
-                            energy_types = []
-                            for conn in connections:
-                                connection_type = conn.get("ConnectionType", {}).get("Title", "Unknown")
-                                if connection_type not in energy_types:
-                                    energy_types.append(connection_type)
-                            
-                            energy_type = ", ".join(energy_types) if energy_types else "Unknown"
-                            
-                            nearby_stations.append(NearbyStation(
-                                id=f"ocm_{station.get('ID', len(nearby_stations) + 1000)}",
-                                name=station_name,
-                                latitude=station_lat,
-                                longitude=station_lon,
-                                energy_type=energy_type,
-                                available=True,  # OCM doesn't provide real-time availability
-                                distance_km=round(distance, 2),
-                                travel_time_minutes=travel_time,
-                                source="ocm"
-                            ))
-                except Exception as e:
-                    print(f"Error processing OCM station: {e}")
-                    continue
-        
-        # Sort by distance
-        nearby_stations.sort(key=lambda x: x.distance_km)
-        
-        return nearby_stations[:limit]  # Return top N nearest stations
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error getting nearby stations: {e}")
-        raise HTTPException(status_code=500, detail="Failed to retrieve nearby stations")
+            print(f"Error getting nearby stations for a batch: {e}")
+            raise HTTPException(status_code=500, detail="Failed to get nearby stations")
+        results = [[_nearby_fields(station, station["distance_km"]) for station in found] for found in matches]
+    
+    def lines() -> Iterator[bytes]:
+        for start in range(0, len(queries), NEARBY_BATCH_CHUNK):
+            yield b"".join(
+                json.dumps({"index": i, "id": queries[i].id, "stations": results[i]}, default=str).encode() + b"\n"
+                for i in range(start, min(start + NEARBY_BATCH_CHUNK, len(queries))))
+    
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(compress_stream(lines(), encoding), media_type=STATIONS_MEDIA_TYPES["ndjson"],
+                             headers=headers)
+
+def _route_boxes(lats: List[float], lons: List[float], width_km: float) -> List[tuple]:
+    """Corridor bounding boxes covering runs of ROUTE_SEGMENTS_PER_BOX consecutive route segments."""
+    min_lat, max_lat, min_lon, max_lon = bounding_boxes(lats, lons, width_km)
+    boxes = []
+    for start in range(0, max(len(lats) - 1, 1), ROUTE_SEGMENTS_PER_BOX):
+        run = slice(start, start + ROUTE_SEGMENTS_PER_BOX + 1)
+        boxes.append((min_lat[run].min(), max_lat[run].max(), min_lon[run].min(), max_lon[run].max()))
+    return boxes
+
+def _along_route_from_snowflake(snowflake_manager, lats, lons, width_km: float) -> List[tuple]:
+    """Like StationCatalog.along_route, over the stations a corridor box query returns."""
+    rows = snowflake_manager.get_stations_in_boxes(_route_boxes(lats, lons, width_km))
+    index = GridIndex([row["latitude"] for row in rows], [row["longitude"] for row in rows])
+    positions, distances, along = index.along_polyline(lats, lons, width_km)
+    return [(rows[p], float(d), float(a)) for p, d, a in zip(positions, distances, along)]
+
+async def _stations_along_route(route: AlongRouteRequest, snowflake_manager, catalog) -> Dict[str, Any]:
+    try:
+        points = decode_polyline(route.polyline, route.precision)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid polyline: {e}")
+    if not points or len(points) > ROUTE_MAX_VERTICES:
+        raise HTTPException(status_code=400, detail=f"A route needs between 1 and {ROUTE_MAX_VERTICES} vertices")
+    lats, lons = [lat for lat, _ in points], [lon for _, lon in points]
+    
+    if catalog is not None:
+        matches = [(station._asdict(), distance, along)
+                   for station, distance, along in catalog.along_route(lats, lons, route.width_km)]
+    elif snowflake_manager is None:
+        raise HTTPException(status_code=503, detail="Snowflake database not available")
+    else:
+        try:
+            matches = await snowflake_manager.arun(_along_route_from_snowflake, snowflake_manager,
+                                                   lats, lons, route.width_km)
+        except Exception as e:
+            print(f"Error finding stations along a route: {e}")
+            raise HTTPException(status_code=500, detail="Failed to find stations along the route")
+    
+    length = float(haversine_km_array(lats[:-1], lons[:-1], lats[1:], lons[1:]).sum()) if len(points) > 1 else 0.0
+    return {
+        "vertices": len(points),
+        "route_length_km": round(length, 2),
+        "width_km": route.width_km,
+        "stations": [dict(_station_json(station), distance_from_route_km=round(distance, 3),
+                          along_route_km=round(along, 3))
+                     for station, distance, along in matches[:route.limit]],
+    }
+
+@router.get("/along-route")
+async def get_stations_along_route(
+    polyline: str = Query(..., min_length=2, description="Encoded polyline of the route"),
+    width_km: float = Query(2, gt=0, le=50, description="Corridor half-width either side of the route, in km"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of stations"),
+    precision: int = Query(5, ge=5, le=6, description="Polyline precision: 5 (Google) or 6 (OSRM/Valhalla)"),
+    snowflake_manager=Depends(get_optional_snowflake_manager),
+    catalog=Depends(get_station_catalog)
+):
+    """Stations within ``width_km`` of a route, in the order the route passes them.
+    
+    Each station reports its distance from the route and how far along the
+    route it is. Each route segment's corridor box picks candidate cells from
+    the station catalog's spatial index; until the catalog has loaded, one
+    Snowflake query fetches the stations in the corridor. Long polylines can
+    be sent as a JSON body to POST /stations/along-route instead.
+    """
+    route = AlongRouteRequest(polyline=polyline, width_km=width_km, limit=limit, precision=precision)
+    return await _stations_along_route(route, snowflake_manager, catalog)
+
+@router.post("/along-route")
+async def post_stations_along_route(
+    route: AlongRouteRequest,
+    snowflake_manager=Depends(get_optional_snowflake_manager),
+    catalog=Depends(get_station_catalog)
+):
+    """GET /stations/along-route with the route in the request body, for polylines too long for a URL."""
+    return await _stations_along_route(route, snowflake_manager, catalog)
+
+def _parse_bbox(bbox: str) -> tuple:
+    """(min_lon, min_lat, max_lon, max_lat) from a "west,south,east,north" query parameter."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be four numbers: west,south,east,north")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox is outside the valid longitude/latitude range")
+    return min_lon, min_lat, max_lon, max_lat
+
+def _clusters_from_snowflake(snowflake_manager, min_lon: float, min_lat: float, max_lon: float,
+                             max_lat: float, zoom: int) -> tuple:
+    """(clusters, stations by id) from a throwaway cluster index over the stations in the box."""
+    if min_lon <= max_lon:
+        boxes = [(min_lat, max_lat, min_lon, max_lon)]
+    else:
+        boxes = [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    rows = snowflake_manager.get_stations_in_boxes(boxes, row_type='row')
+    index = StationClusterIndex()
+    index.rebuild(rows)
+    return index.clusters(min_lon, min_lat, max_lon, max_lat, zoom), {row.id: row for row in rows}
+
+@router.get("/clusters")
+async def get_station_clusters_in_view(
+    bbox: str = Query(..., description="Map view as west,south,east,north in degrees (west > east crosses the antimeridian)"),
+    zoom: int = Query(..., ge=0, le=22, description="Map zoom level"),
+    clusters=Depends(get_station_clusters),
+    catalog=Depends(get_station_catalog),
+    snowflake_manager=Depends(get_optional_snowflake_manager)
+):
+    """Station marker clusters for a map view, one per grid cell of ~64 screen pixels.
+    
+    Answered from the hierarchical cluster index over the station catalog,
+    which follows station changes incrementally; until it is built, the view's
+    stations are clustered from a Snowflake query. Each cluster has its
+    centroid, station count and available count; single stations also carry
+    their id, name and energy type. Zooms past 16 use zoom 16's grid.
+    """
+    min_lon, min_lat, max_lon, max_lat = _parse_bbox(bbox)
+    if clusters is not None and catalog is not None:
+        try:
+            found, lookup = clusters.clusters(min_lon, min_lat, max_lon, max_lat, zoom), catalog.get
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif snowflake_manager is None:
+        raise HTTPException(status_code=503, detail="Snowflake database not available")
+    else:
+        try:
+            found, stations = await snowflake_manager.arun(_clusters_from_snowflake, snowflake_manager,
+                                                           min_lon, min_lat, max_lon, max_lat, zoom)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            print(f"Error clustering stations: {e}")
+            raise HTTPException(status_code=500, detail="Failed to cluster stations")
+        lookup = stations.get
+    
+    for cluster in found:
+        station = lookup(cluster["station_id"]) if "station_id" in cluster else None
+        if station is not None:
+            cluster.update(name=station.name, energy_type=station.energy_type)
+    return {
+        "zoom": min(zoom, MAX_CLUSTER_ZOOM),
+        "stations": sum(cluster["count"] for cluster in found),
+        "clusters": found,
+    }
 
 @router.get("/count")
-def get_station_count():
+async def get_station_count(snowflake_manager=Depends(get_snowflake_manager)):
     """Get total number of stations in the database."""
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Snowflake database not available")
-        
-        snowflake_manager = get_snowflake_manager()
-        count = snowflake_manager.get_station_count()
+        count = await snowflake_manager.arun(snowflake_manager.get_station_count)
         return {"count": count, "source": "snowflake"}
         
     except Exception as e:
@@ -214,54 +582,83 @@ def get_station_count():
         raise HTTPException(status_code=500, detail="Failed to get station count")
 
 @router.get("/statistics")
-def get_station_statistics():
-    """Get station statistics from Snowflake."""
+async def get_station_statistics(
+    stats=Depends(get_station_stats),
+    snowflake_manager=Depends(get_optional_snowflake_manager)
+):
+    """Get station statistics: totals, availability and counts by state, energy type and town.
+    
+    Served from the in-process counts kept in step with the station catalog;
+    until those are ready, from the materialized station_stats table. That
+    table is filled by ingestion and the periodic verifier, never from here.
+    """
+    if stats is not None:
+        return stats.summary()
+    if snowflake_manager is None:
+        raise HTTPException(status_code=503, detail="Snowflake database not available")
+    
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Snowflake database not available")
-        
-        snowflake_manager = get_snowflake_manager()
-        
-        # Get statistics from Snowflake
-        query = """
-            SELECT 
-                COUNT(*) as total_stations,
-                COUNT(DISTINCT country) as countries,
-                COUNT(DISTINCT energy_type) as energy_types,
-                AVG(CASE WHEN available THEN 1 ELSE 0 END) * 100 as availability_percentage
-            FROM stations
-        """
-        
-        result = snowflake_manager.execute_query(query)
-        if result:
-            return {
-                "total_stations": result[0]["total_stations"],
-                "countries": result[0]["countries"],
-                "energy_types": result[0]["energy_types"],
-                "availability_percentage": round(result[0]["availability_percentage"], 2)
-            }
-        else:
-            return {"error": "No statistics available"}
-            
+        counts = await snowflake_manager.arun(snowflake_manager.get_station_stats, workload='analytics')
     except Exception as e:
         print(f"Error getting statistics: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting statistics: {e}")
+    if not counts:
+        raise HTTPException(status_code=503, detail="Station statistics not computed yet")
+    return summarize_station_stats(counts)
+
+@router.get("/autocomplete")
+async def autocomplete_stations(
+    prefix: str = Query(..., min_length=1, description="What the user has typed so far"),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS, description="Maximum number of suggestions"),
+    autocomplete=Depends(get_station_autocomplete),
+    snowflake_manager=Depends(get_optional_snowflake_manager)
+):
+    """Suggest station names and towns with a word starting with ``prefix``, most popular first.
+    
+    Answered from the in-memory prefix index; until it is built, falls back to
+    the same word-prefix match in Snowflake, with the same suggestion shape.
+    """
+    if autocomplete is not None:
+        return {"prefix": prefix, "suggestions": autocomplete.complete(prefix, limit)}
+    if snowflake_manager is None:
+        raise HTTPException(status_code=503, detail="Snowflake database not available")
+    
+    try:
+        suggestions = await snowflake_manager.arun(snowflake_manager.get_autocomplete_suggestions, prefix, limit,
+                                                   settings.AUTOCOMPLETE_POPULARITY_DAYS)
+        return {"prefix": prefix, "suggestions": suggestions}
+    except Exception as e:
+        print(f"Error autocompleting stations: {e}")
+        raise HTTPException(status_code=500, detail="Failed to autocomplete stations")
 
 @router.get("/search")
-def search_stations(
+async def search_stations(
     query: str = Query(..., description="Search term for station name or location"),
-    limit: int = Query(20, description="Maximum number of results")
+    limit: int = Query(20, description="Maximum number of results"),
+    search_index=Depends(get_station_search),
+    catalog=Depends(get_station_catalog),
+    snowflake_manager=Depends(get_optional_snowflake_manager)
 ):
-    """Search stations by name or location."""
+    """Search stations by name or location.
+    
+    Served from the in-memory trigram index once built: typo tolerant and
+    ranked best match first, with each station's ``score``. Until then falls
+    back to a substring match in Snowflake.
+    """
+    if search_index is not None and catalog is not None:
+        results = []
+        for station_id, score in search_index.search(query, limit):
+            station = catalog.get(station_id)
+            if station is not None:
+                results.append(dict(station._asdict(), score=score))
+        return results
+    if snowflake_manager is None:
+        raise HTTPException(status_code=503, detail="Snowflake database not available")
+    
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Snowflake database not available")
-        
-        snowflake_manager = get_snowflake_manager()
-        
         # Search query
         search_query = """
-            SELECT * FROM stations 
+            SELECT * EXCLUDE (location) FROM stations 
             WHERE LOWER(name) LIKE LOWER(%s) 
                OR LOWER(town) LIKE LOWER(%s) 
                OR LOWER(state) LIKE LOWER(%s)
@@ -270,7 +667,7 @@ def search_stations(
         """
         
         search_term = f"%{query}%"
-        results = snowflake_manager.execute_query(search_query, (search_term, search_term, search_term, limit))
+        results = await snowflake_manager.aexecute_query(search_query, (search_term, search_term, search_term, limit))
         
         return results
         
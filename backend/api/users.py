@@ -4,6 +4,7 @@ import sys
 from typing import Optional
 from models.schemas import UserLogin, UserResponse, UserRegister
 from core.security import verify_password, hash_password
+from core.database import get_snowflake_manager
 from core.jwt_utils import (
     create_access_token, create_refresh_token, verify_token, blacklist_token, get_token_from_request
 )
@@ -17,37 +18,14 @@ router = APIRouter(prefix="/users", tags=["Users"])
 
 limiter = Limiter(key_func=get_remote_address)
 
-# Lazy import and initialization of Snowflake manager
-def get_snowflake_manager():
-    """Get SnowflakeManager instance with lazy initialization."""
-    try:
-        from db.snowflake_connector import SnowflakeManager
-        return SnowflakeManager()
-    except Exception as e:
-        print(f"Snowflake not available: {e}")
-        return None
-
-def is_snowflake_available():
-    """Check if Snowflake is available."""
-    try:
-        manager = get_snowflake_manager()
-        return manager is not None
-    except:
-        return False
-
 @router.post("/register", response_model=UserResponse)
 @limiter.limit("3/minute")
-def register_user(user: UserRegister, response: Response, request: Request):
+async def register_user(user: UserRegister, response: Response, request: Request, snowflake_manager=Depends(get_snowflake_manager)):
     """Register a new user."""
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Database not available")
-        
-        snowflake_manager = get_snowflake_manager()
-        
         # Check if user already exists
         check_query = "SELECT id FROM users WHERE email = %s"
-        existing_user = snowflake_manager.execute_query(check_query, (user.email,))
+        existing_user = await snowflake_manager.aexecute_query(check_query, (user.email,))
         
         if existing_user:
             raise HTTPException(status_code=400, detail="User with this email already exists")
@@ -61,7 +39,7 @@ def register_user(user: UserRegister, response: Response, request: Request):
             VALUES (%s, %s, %s, %s, %s, %s)
         """
         
-        snowflake_manager.execute_query(insert_query, (
+        await snowflake_manager.aexecute_query(insert_query, (
             user.email,
             hashed_password,
             0.0,  # Default eco score
@@ -72,7 +50,7 @@ def register_user(user: UserRegister, response: Response, request: Request):
         
         # Get the created user
         get_user_query = "SELECT id, email, eco_score FROM users WHERE email = %s"
-        new_user = snowflake_manager.execute_query(get_user_query, (user.email,))
+        new_user = await snowflake_manager.aexecute_query(get_user_query, (user.email,))
         
         if not new_user:
             raise HTTPException(status_code=500, detail="Failed to create user")
@@ -109,17 +87,12 @@ def register_user(user: UserRegister, response: Response, request: Request):
 
 @router.post("/login", response_model=UserResponse)
 @limiter.limit("5/minute")
-def login(user: UserLogin, response: Response, request: Request):
+async def login(user: UserLogin, response: Response, request: Request, snowflake_manager=Depends(get_snowflake_manager)):
     """Login user and issue JWT tokens."""
     try:
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Database not available")
-        
-        snowflake_manager = get_snowflake_manager()
-        
         # Get user from database
         query = "SELECT id, email, password_hash, eco_score FROM users WHERE email = %s"
-        user_data = snowflake_manager.execute_query(query, (user.email,))
+        user_data = await snowflake_manager.aexecute_query(query, (user.email,))
         
         if not user_data:
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -190,7 +163,7 @@ def logout(request: Request, response: Response, access_token: Optional[str] = C
     return {"success": True, "message": "Logged out"}
 
 @router.get("/profile")
-def get_user_profile(request: Request):
+async def get_user_profile(request: Request, snowflake_manager=Depends(get_snowflake_manager)):
     """Get current user's profile information."""
     try:
         # Get token from request
@@ -201,17 +174,12 @@ def get_user_profile(request: Request):
         # Verify token
         payload = verify_token(token, token_type='access')
         
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Database not available")
-        
-        snowflake_manager = get_snowflake_manager()
-        
         # Get user profile
         query = """
             SELECT id, email, eco_score, first_name, last_name, vehicle_type, created_at
             FROM users WHERE id = %s
         """
-        user_data = snowflake_manager.execute_query(query, (payload["user_id"],))
+        user_data = await snowflake_manager.aexecute_query(query, (payload["user_id"],))
         
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -225,7 +193,7 @@ def get_user_profile(request: Request):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.put("/profile")
-def update_user_profile(request: Request, profile_update: dict):
+async def update_user_profile(request: Request, profile_update: dict, snowflake_manager=Depends(get_snowflake_manager)):
     """Update current user's profile information."""
     try:
         # Get token from request
@@ -236,11 +204,6 @@ def update_user_profile(request: Request, profile_update: dict):
         # Verify token
         payload = verify_token(token, token_type='access')
         
-        if not is_snowflake_available():
-            raise HTTPException(status_code=503, detail="Database not available")
-        
-        snowflake_manager = get_snowflake_manager()
-        
         # Update user profile
         allowed_fields = ['first_name', 'last_name', 'vehicle_type']
         update_fields = []
@@ -257,7 +220,7 @@ def update_user_profile(request: Request, profile_update: dict):
         update_values.append(payload["user_id"])
         query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s"
         
-        snowflake_manager.execute_query(query, tuple(update_values))
+        await snowflake_manager.aexecute_query(query, tuple(update_values))
         
         return {"success": True, "message": "Profile updated successfully"}
         
@@ -1,7 +1,8 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -9,6 +10,15 @@ from slowapi.errors import RateLimitExceeded
 from fastapi.responses import JSONResponse
 from api import stations, recommendations, sessions, users, admin, forecast
 from api import map_features, chatbot
+from core.config import settings
+from core.database import DatabaseHealthProbe, create_snowflake_manager, database_metrics, query_stats_middleware
+from core.station_catalog import StationCatalog
+from core.station_search import StationSearchIndex
+from core.station_autocomplete import StationAutocomplete
+from core.station_stats import StationStatistics
+from core.station_clusters import StationClusterIndex
+from core.http_client import create_http_client
+from core.ocm import OCMTileCache, fetch_ocm_stations
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,7 +29,66 @@ SENTRY_DSN = os.getenv('SENTRY_DSN')
 if SENTRY_DSN:
     sentry_sdk.init(dsn=SENTRY_DSN, traces_sample_rate=1.0)
 
-app = FastAPI(title="EV User Intelligence & Recommendation Platform")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared Snowflake manager and HTTP client once and keep the database probed in the background."""
+    app.state.http_client = create_http_client(max_connections=settings.HTTP_MAX_CONNECTIONS)
+
+    async def fetch_ocm_tile(lat: float, lon: float, radius_km: float):
+        return await fetch_ocm_stations(app.state.http_client, lat, lon, radius_km,
+                                        max_results=settings.OCM_TILE_MAX_RESULTS)
+
+    app.state.ocm_cache = OCMTileCache(fetch_ocm_tile, ttl=settings.OCM_CACHE_TTL_SECONDS,
+                                       stale_ttl=settings.OCM_CACHE_STALE_SECONDS,
+                                       max_tiles=settings.OCM_CACHE_MAX_TILES,
+                                       max_results=settings.OCM_TILE_MAX_RESULTS)
+    manager = create_snowflake_manager()
+    app.state.snowflake_manager = manager
+    app.state.db_health = DatabaseHealthProbe(manager, interval=settings.DB_HEALTH_CHECK_INTERVAL_SECONDS)
+    await app.state.db_health.start()
+    app.state.station_catalog = None
+    app.state.station_search = None
+    app.state.station_autocomplete = None
+    app.state.station_stats = None
+    app.state.station_clusters = None
+    if manager is not None and settings.STATION_CATALOG_ENABLED:
+        if settings.STATION_SNAPSHOT_PATH:
+            app.state.station_catalog = StationCatalog(manager, refresh_interval=settings.STATION_SNAPSHOT_POLL_SECONDS,
+                                                       snapshot_path=settings.STATION_SNAPSHOT_PATH)
+        else:
+            app.state.station_catalog = StationCatalog(manager, refresh_interval=settings.STATION_CATALOG_REFRESH_SECONDS)
+        app.state.station_search = StationSearchIndex()
+        app.state.station_search.attach(app.state.station_catalog)
+        app.state.station_autocomplete = StationAutocomplete(
+            popularity=lambda: manager.get_station_popularity(settings.AUTOCOMPLETE_POPULARITY_DAYS),
+            popularity_ttl=settings.AUTOCOMPLETE_POPULARITY_REFRESH_SECONDS)
+        app.state.station_autocomplete.attach(app.state.station_catalog)
+        app.state.station_stats = StationStatistics(manager, verify_interval=settings.STATION_STATS_VERIFY_SECONDS)
+        app.state.station_stats.attach(app.state.station_catalog)
+        app.state.station_clusters = StationClusterIndex()
+        app.state.station_clusters.attach(app.state.station_catalog)
+        await app.state.station_catalog.start()
+        await app.state.station_stats.start()
+    try:
+        yield
+    finally:
+        if app.state.station_catalog is not None:
+            await app.state.station_stats.stop()
+            await app.state.station_catalog.stop()
+            app.state.station_catalog = None
+            app.state.station_search = None
+            app.state.station_autocomplete = None
+            app.state.station_stats = None
+            app.state.station_clusters = None
+        await app.state.db_health.stop()
+        app.state.ocm_cache = None
+        await app.state.http_client.aclose()
+        app.state.http_client = None
+        app.state.snowflake_manager = None
+        if manager is not None:
+            manager.close()
+
+app = FastAPI(title="EV User Intelligence & Recommendation Platform", lifespan=lifespan)
 
 # Rate limiting setup
 limiter = Limiter(key_func=get_remote_address)
@@ -35,8 +104,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Query-Count", "X-DB-Time-Ms", "Server-Timing", "ETag", "Link"],
 )
 
+# Per-request query count / DB time headers and per-route query metrics
+app.middleware("http")(query_stats_middleware)
+
 # Include all API routers
 app.include_router(stations.router)
 app.include_router(recommendations.router)
@@ -59,4 +132,26 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring."""
-    return {"status": "healthy"}
\ No newline at end of file
+    db_health = getattr(app.state, "db_health", None)
+    catalog = getattr(app.state, "station_catalog", None)
+    search = getattr(app.state, "station_search", None)
+    autocomplete = getattr(app.state, "station_autocomplete", None)
+    station_stats = getattr(app.state, "station_stats", None)
+    clusters = getattr(app.state, "station_clusters", None)
+    return {
+        "status": "healthy",
+        "database": db_health.status() if db_health else None,
+        "station_catalog": catalog.status() if catalog else None,
+        "station_search": search.status() if search else None,
+        "station_autocomplete": autocomplete.status() if autocomplete else None,
+        "station_stats": station_stats.status() if station_stats else None,
+        "station_clusters": clusters.status() if clusters else None
+    }
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """Query timing per route and query tag, slow query counts, connection pool and OCM cache stats."""
+    metrics = database_metrics(request)
+    ocm_cache = getattr(app.state, "ocm_cache", None)
+    metrics["ocm_cache"] = ocm_cache.stats() if ocm_cache else None
+    return metrics
@@ -0,0 +1,71 @@
+import zlib
+from typing import Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # br is offered only when the brotli package is installed
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; the framing costs more than it saves
+MIN_COMPRESS_BYTES = 1024
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None for identity.
+
+    Honours q-values (``gzip;q=0`` refuses gzip) and prefers brotli, which
+    compresses JSON noticeably better, when both are acceptable.
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def _compressor(encoding: str):
+    if encoding == "br":
+        return brotli.Compressor(quality=5)
+    return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+
+
+def compress_bytes(data: bytes, encoding: Optional[str]) -> bytes:
+    """Compress a whole body with the negotiated encoding (None leaves it as is)."""
+    if encoding is None:
+        return data
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    compressor = _compressor(encoding)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk, flushing after each so clients can parse as it arrives."""
+    if encoding is None:
+        yield from chunks
+        return
+    compressor = _compressor(encoding)
+    for chunk in chunks:
+        if encoding == "br":
+            out = compressor.process(chunk) + compressor.flush()
+        else:
+            out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield compressor.finish() if encoding == "br" else compressor.flush()
@@ -9,9 +9,34 @@ class Settings(BaseSettings):
     SNOWFLAKE_WAREHOUSE: str = os.getenv("SNOWFLAKE_WAREHOUSE", "")
     SNOWFLAKE_DATABASE: str = os.getenv("SNOWFLAKE_DATABASE", "")
     SNOWFLAKE_SCHEMA: str = os.getenv("SNOWFLAKE_SCHEMA", "")
+    # "snowflake" or "sqlite" (embedded local backend for offline runs and benchmarks)
+    DB_BACKEND: str = os.getenv("DB_BACKEND", "snowflake")
+    LOCAL_DB_PATH: str = os.getenv("LOCAL_DB_PATH", "ev_local.db")
+    DB_HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("DB_HEALTH_CHECK_INTERVAL_SECONDS", "30"))
+    # In-memory station catalog serving /stations/nearby; polls updated_at for changes
+    STATION_CATALOG_ENABLED: bool = os.getenv("STATION_CATALOG_ENABLED", "true").lower() == "true"
+    STATION_CATALOG_REFRESH_SECONDS: float = float(os.getenv("STATION_CATALOG_REFRESH_SECONDS", "30"))
+    # Binary snapshot written by ingestion; when set, every worker maps it instead of loading the table,
+    # checking this often for a newer one
+    STATION_SNAPSHOT_PATH: str = os.getenv("STATION_SNAPSHOT_PATH", "")
+    STATION_SNAPSHOT_POLL_SECONDS: float = float(os.getenv("STATION_SNAPSHOT_POLL_SECONDS", "5"))
+    # Autocomplete ranks by sessions over this many days, re-read at most this often
+    AUTOCOMPLETE_POPULARITY_DAYS: int = int(os.getenv("AUTOCOMPLETE_POPULARITY_DAYS", "90"))
+    AUTOCOMPLETE_POPULARITY_REFRESH_SECONDS: float = float(os.getenv("AUTOCOMPLETE_POPULARITY_REFRESH_SECONDS", "3600"))
+    # How often station statistics are re-derived from the stations table and repaired if they drifted
+    STATION_STATS_VERIFY_SECONDS: float = float(os.getenv("STATION_STATS_VERIFY_SECONDS", "3600"))
+    # Per-source deadlines for /stations/nearby; sources that miss theirs are left out of the response
+    NEARBY_DB_DEADLINE_SECONDS: float = float(os.getenv("NEARBY_DB_DEADLINE_SECONDS", "3"))
+    NEARBY_OCM_DEADLINE_SECONDS: float = float(os.getenv("NEARBY_OCM_DEADLINE_SECONDS", "2"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
     
     # Open Charge Map settings
     OCM_API_KEY: str = os.getenv("OCM_API_KEY", "")
+    # Geohash-tile cache of OCM results; stale tiles are served while refetched in the background
+    OCM_CACHE_TTL_SECONDS: float = float(os.getenv("OCM_CACHE_TTL_SECONDS", "3600"))
+    OCM_CACHE_STALE_SECONDS: float = float(os.getenv("OCM_CACHE_STALE_SECONDS", "86400"))
+    OCM_CACHE_MAX_TILES: int = int(os.getenv("OCM_CACHE_MAX_TILES", "2048"))
+    OCM_TILE_MAX_RESULTS: int = int(os.getenv("OCM_TILE_MAX_RESULTS", "250"))
     
     # ML Model settings
     RECOMMENDATION_MODEL_PATH: str = os.getenv("RECOMMENDATION_MODEL_PATH", "models/lightfm_model.pkl")
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, Request
+from starlette.routing import Match
+
+# Add parent directory to path to access db module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from db.query_stats import query_metrics, track_queries
+
+QUERY_TAG_PREFIX = "ev-api"
+
+logger = logging.getLogger(__name__)
+
+
+def create_snowflake_manager():
+    """Create the app-scoped SnowflakeManager, or None if Snowflake is not configured."""
+    try:
+        from db.snowflake_connector import get_snowflake_manager as get_global_manager
+        return get_global_manager()
+    except Exception as e:
+        logger.warning(f"Snowflake not available: {e}")
+        return None
+
+
+class DatabaseHealthProbe:
+    """Periodically pings the database in the background and caches the result.
+
+    Request handlers only read ``available``; they never construct a manager or
+    wait on a probe themselves.
+    """
+
+    def __init__(self, manager, interval: float = 30.0, timeout: float = 10.0):
+        self.manager = manager
+        self.interval = interval
+        self.timeout = timeout
+        self.available = False
+        self.last_checked: Optional[float] = None
+        self.last_latency_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self) -> bool:
+        """Run one probe and update the cached availability."""
+        if self.manager is None:
+            self.available = False
+            self.last_error = "Snowflake is not configured"
+            return False
+
+        started = time.perf_counter()
+        try:
+            with track_queries(f"{QUERY_TAG_PREFIX}:health-probe"):
+                await asyncio.wait_for(asyncio.to_thread(self.manager.ping), timeout=self.timeout)
+            self.available = True
+            self.last_error = None
+        except Exception as e:
+            if self.available:
+                logger.warning(f"Database health probe failed: {e!r}")
+            self.available = False
+            self.last_error = repr(e)
+        self.last_latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.last_checked = time.time()
+        return self.available
+
+    async def start(self) -> None:
+        """Probe once so the first requests see a real result, then keep probing in the background."""
+        await self.check()
+        if self.manager is not None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "last_checked": self.last_checked,
+            "last_latency_ms": self.last_latency_ms,
+            "last_error": self.last_error,
+        }
+
+
+def get_snowflake_manager(request: Request):
+    """FastAPI dependency returning the app-scoped SnowflakeManager.
+
+    Raises 503 when Snowflake is not configured or the last health probe failed.
+    """
+    manager = getattr(request.app.state, "snowflake_manager", None)
+    health = getattr(request.app.state, "db_health", None)
+    if manager is None or (health is not None and not health.available):
+        raise HTTPException(status_code=503, detail="Snowflake database not available")
+    return manager
+
+
+def get_optional_snowflake_manager(request: Request):
+    """Like get_snowflake_manager, but None instead of 503 for endpoints with other sources to fall back on."""
+    try:
+        return get_snowflake_manager(request)
+    except HTTPException:
+        return None
+
+
+def route_name(request: Request) -> str:
+    """The matched route template (e.g. "GET /stations/nearby"), so metrics group by endpoint."""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return f"{request.method} {getattr(route, 'path', request.url.path)}"
+    return f"{request.method} unmatched"
+
+
+async def query_stats_middleware(request: Request, call_next):
+    """Tag each request's queries with its route and report their count and DB time.
+
+    Adds X-DB-Query-Count, X-DB-Time-Ms and a Server-Timing "db" entry to the
+    response and folds the totals into the per-route metrics.
+    """
+    route = route_name(request)
+    with track_queries(f"{QUERY_TAG_PREFIX}:{route}") as stats:
+        response = await call_next(request)
+
+    summary = stats.as_dict()
+    query_metrics.record_request(route, stats)
+    response.headers["X-DB-Query-Count"] = str(summary["queries"])
+    response.headers["X-DB-Time-Ms"] = f"{summary['total_ms']:.1f}"
+    response.headers.append("Server-Timing", f'db;dur={summary["total_ms"]:.1f};desc="{summary["queries"]} queries"')
+    return response
+
+
+def database_metrics(request: Request) -> Dict[str, Any]:
+    """Query metrics per tag and route, plus the connection pool of the app's manager."""
+    manager = getattr(request.app.state, "snowflake_manager", None)
+    metrics = query_metrics.snapshot()
+    metrics["pool"] = manager.pool_stats() if manager is not None else None
+    return metrics
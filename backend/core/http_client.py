@@ -0,0 +1,21 @@
+from typing import Optional
+import httpx
+from fastapi import Request
+
+
+def create_http_client(max_connections: int = 50, timeout: float = 10.0) -> httpx.AsyncClient:
+    """Create the app-scoped async HTTP client for outbound API calls.
+
+    One client per process keeps TCP/TLS connections to upstream APIs (Open
+    Charge Map) alive between requests instead of reconnecting on every call.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+        headers={"User-Agent": "ev-user-intelligence-platform"},
+    )
+
+
+def get_http_client(request: Request) -> Optional[httpx.AsyncClient]:
+    """FastAPI dependency returning the shared async HTTP client, or None outside the app lifespan."""
+    return getattr(request.app.state, "http_client", None)
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import math
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import Request
+
+# Add parent directory to path to access db module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from db.geo import KM_PER_DEGREE_LAT, bounding_box, geohash_bounds, geohash_cell_size, geohashes_in_box
+
+logger = logging.getLogger(__name__)
+
+OCM_API_URL = "https://api.openchargemap.io/v3/poi"
+
+# Coarsest and finest tile precisions; ~625 km and ~1.2 km cells
+MIN_TILE_PRECISION = 2
+MAX_TILE_PRECISION = 6
+# A search never fans out to more tiles than this; larger circles use coarser tiles
+MAX_TILES_PER_QUERY = 9
+
+# fetch(lat, lon, radius_km) -> raw OCM POIs around the point
+Fetch = Callable[[float, float, float], Awaitable[List[Dict[str, Any]]]]
+
+
+async def fetch_ocm_stations(client, lat: float, lon: float, radius: float = 10, max_results: int = 50) -> List[dict]:
+    """Fetch stations from Open Charge Map API with the shared async HTTP client."""
+    params = {
+        "key": os.getenv("OCM_API_KEY", ""),
+        "latitude": lat,
+        "longitude": lon,
+        "distance": radius,
+        "distanceunit": "km",
+        "maxresults": max_results,
+        "compact": True,
+        "verbose": False
+    }
+
+    response = await client.get(OCM_API_URL, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def tile_precision(lat: float, radius_km: float) -> int:
+    """Finest geohash precision whose cells are at least ``radius_km`` on their shorter side.
+
+    This is the radius bucket: every radius up to a cell's size maps to the same
+    tiles, so nearby searches with different radii share cache entries.
+    """
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    for precision in range(MAX_TILE_PRECISION, MIN_TILE_PRECISION - 1, -1):
+        lat_deg, lon_deg = geohash_cell_size(precision)
+        if min(lat_deg * KM_PER_DEGREE_LAT, lon_deg * KM_PER_DEGREE_LAT * cos_lat) >= radius_km:
+            return precision
+    return MIN_TILE_PRECISION
+
+
+def covering_tiles(lat: float, lon: float, radius_km: float) -> List[str]:
+    """Geohash tiles that together cover the search circle."""
+    box = bounding_box(lat, lon, radius_km)
+    precision = tile_precision(lat, radius_km)
+    tiles = geohashes_in_box(*box, precision)
+    while len(tiles) > MAX_TILES_PER_QUERY and precision > MIN_TILE_PRECISION:
+        precision -= 1
+        tiles = geohashes_in_box(*box, precision)
+    return tiles
+
+
+def tile_query(tile: str) -> Tuple[float, float, float]:
+    """(lat, lon, radius_km) of the OCM query covering a tile: its center and half-diagonal."""
+    min_lat, max_lat, min_lon, max_lon = geohash_bounds(tile)
+    lat, lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    height = (max_lat - min_lat) * KM_PER_DEGREE_LAT
+    width = (max_lon - min_lon) * KM_PER_DEGREE_LAT * math.cos(math.radians(lat))
+    return lat, lon, math.hypot(height, width) / 2 * 1.05
+
+
+class _Entry:
+    __slots__ = ("stations", "fetched_at", "complete")
+
+    def __init__(self, stations: List[Dict[str, Any]], fetched_at: float, complete: bool = True):
+        self.stations = stations
+        self.fetched_at = fetched_at
+        # False when the fetch hit the result cap: OCM returned the stations nearest the
+        # tile center, not every station in the tile
+        self.complete = complete
+
+
+class OCMTileCache:
+    """TTL + LRU cache of Open Charge Map results keyed by geohash tile.
+
+    A nearby search is answered by merging the tiles that cover its circle.
+    Entries younger than ``ttl`` are served as is; entries up to ``stale_ttl``
+    past that are served immediately while one background fetch refreshes them
+    (stale-while-revalidate); older or missing tiles are fetched before
+    answering. Concurrent requests for the same tile share a single fetch, and
+    fetches keep running if the request that started them gives up.
+
+    ``max_results`` is the cap ``fetch`` applies. A tile whose fetch returns
+    that many stations may be missing some, so searches descend into its
+    child tiles that overlap the circle instead (down to MAX_TILE_PRECISION).
+    """
+
+    def __init__(self, fetch: Fetch, ttl: float = 3600.0, stale_ttl: float = 86400.0, max_tiles: int = 2048,
+                 max_results: Optional[int] = None):
+        self._fetch = fetch
+        self.max_results = max_results
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_tiles = max_tiles
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # Metrics
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._revalidations = 0
+        self._evictions = 0
+        self._fetch_errors = 0
+        self._truncated = 0
+
+    async def stations_near(self, lat: float, lon: float, radius_km: float) -> List[Dict[str, Any]]:
+        """OCM POIs from every tile covering the circle, deduplicated by OCM ID.
+
+        Results are not filtered by distance; callers do that exactly.
+        """
+        box = bounding_box(lat, lon, radius_km)
+        tiles = await asyncio.gather(*(self._tile_stations(tile, box) for tile in covering_tiles(lat, lon, radius_km)))
+        merged: Dict[Any, Dict[str, Any]] = {}
+        for stations in tiles:
+            for station in stations:
+                merged.setdefault(station.get("ID", id(station)), station)
+        return list(merged.values())
+
+    async def _tile_stations(self, tile: str, box: Tuple[float, float, float, float]) -> List[Dict[str, Any]]:
+        """A tile's stations within ``box``'s reach, from its children when its own fetch was capped."""
+        entry = await self._get_tile(tile)
+        if entry.complete or len(tile) >= MAX_TILE_PRECISION:
+            return entry.stations
+        min_lat, max_lat, min_lon, max_lon = geohash_bounds(tile)
+        overlap = (max(box[0], min_lat), min(box[1], max_lat), max(box[2], min_lon), min(box[3], max_lon))
+        children = [child for child in geohashes_in_box(*overlap, len(tile) + 1) if child.startswith(tile)]
+        if not children:
+            return entry.stations
+        merged: List[Dict[str, Any]] = []
+        for stations in await asyncio.gather(*(self._tile_stations(child, box) for child in children)):
+            merged.extend(stations)
+        return merged
+
+    async def _get_tile(self, tile: str) -> _Entry:
+        entry = self._entries.get(tile)
+        now = time.monotonic()
+        if entry is not None:
+            age = now - entry.fetched_at
+            if age <= self.ttl:
+                self._hits += 1
+                self._entries.move_to_end(tile)
+                return entry
+            if age <= self.ttl + self.stale_ttl:
+                self._stale_hits += 1
+                self._entries.move_to_end(tile)
+                if tile not in self._inflight:
+                    self._revalidations += 1
+                    self._start_fetch(tile)
+                return entry
+
+        self._misses += 1
+        task = self._inflight.get(tile) or self._start_fetch(tile)
+        # Shield so a caller hitting its deadline does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def _start_fetch(self, tile: str) -> asyncio.Task:
+        task = asyncio.ensure_future(self._fetch_tile(tile))
+        # Background revalidations have no awaiter; retrieve their outcome so errors are not reported twice
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[tile] = task
+        return task
+
+    async def _fetch_tile(self, tile: str) -> _Entry:
+        task = asyncio.current_task()
+        try:
+            stations = await self._fetch(*tile_query(tile))
+        except Exception as e:
+            self._fetch_errors += 1
+            logger.warning("OCM fetch for tile %s failed: %s", tile, e)
+            raise
+        finally:
+            if self._inflight.get(tile) is task:
+                del self._inflight[tile]
+        complete = self.max_results is None or len(stations) < self.max_results
+        if not complete:
+            self._truncated += 1
+            if len(tile) >= MAX_TILE_PRECISION:
+                logger.warning("OCM fetch for finest tile %s hit the %d result cap", tile, self.max_results)
+        return self._store(tile, stations, complete)
+
+    def _store(self, tile: str, stations: List[Dict[str, Any]], complete: bool = True) -> _Entry:
+        entry = self._entries[tile] = _Entry(stations, time.monotonic(), complete)
+        self._entries.move_to_end(tile)
+        while len(self._entries) > self.max_tiles:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+        return entry
+
+    def clear(self) -> None:
+        """Drop every tile; fetches already running finish without new callers joining them."""
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._stale_hits + self._misses
+        return {
+            "tiles": len(self._entries),
+            "max_tiles": self.max_tiles,
+            "hits": self._hits,
+            "stale_hits": self._stale_hits,
+            "misses": self._misses,
+            "hit_ratio": round((self._hits + self._stale_hits) / lookups, 4) if lookups else 0.0,
+            "revalidations": self._revalidations,
+            "evictions": self._evictions,
+            "fetch_errors": self._fetch_errors,
+            "truncated_tiles": self._truncated,
+            "inflight": len(self._inflight),
+        }
+
+
+def get_ocm_cache(request: Request) -> Optional[OCMTileCache]:
+    """FastAPI dependency returning the OCM tile cache, or None outside the app lifespan."""
+    return getattr(request.app.state, "ocm_cache", None)
@@ -20,8 +20,8 @@ def verify_password(password: str, hashed: str) -> bool:
 def get_user_by_email_from_db(email: str):
     """Get user from Snowflake database by email."""
     try:
-        from db.snowflake_connector import SnowflakeManager
-        snowflake_manager = SnowflakeManager()
+        from db.snowflake_connector import get_snowflake_manager
+        snowflake_manager = get_snowflake_manager()
         
         query = "SELECT id, email, password_hash, eco_score FROM users WHERE email = %s"
         user_data = snowflake_manager.execute_query(query, (email,))
@@ -43,8 +43,8 @@ def get_user_by_email_from_db(email: str):
 def create_user_in_db(email: str, password: str, first_name: str, last_name: str, vehicle_type: str):
     """Create a new user in Snowflake database."""
     try:
-        from db.snowflake_connector import SnowflakeManager
-        snowflake_manager = SnowflakeManager()
+        from db.snowflake_connector import get_snowflake_manager
+        snowflake_manager = get_snowflake_manager()
         
         # Check if user already exists
         check_query = "SELECT id FROM users WHERE email = %s"
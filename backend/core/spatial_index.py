@@ -0,0 +1,227 @@
+import math
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Add parent directory to path to access db module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from db.geo import (EARTH_RADIUS_KM, GRID_INDEX_ARRAYS, KM_PER_DEGREE_LAT, bounding_box, bounding_boxes, grid_cell_keys,
+                    grid_index_arrays, grid_shape, haversine_km_radians)
+
+# Half the earth's circumference: a radius that covers the whole globe
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+
+_EMPTY = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+
+def _expand(lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For runs of the given lengths, each element's run number and its step within the run."""
+    runs = np.repeat(np.arange(len(lengths)), lengths)
+    run_starts = np.cumsum(lengths) - lengths
+    return runs, np.arange(len(runs)) - run_starts[runs]
+
+
+class GridIndex:
+    """Immutable lat/lon grid over a set of points, answering radius and k-nearest queries.
+
+    Points are bucketed into ``cell_deg`` x ``cell_deg`` cells and kept sorted by
+    row-major cell id, so the cells of one grid row that overlap a bounding box
+    form a single contiguous slice found with two binary searches. Candidates
+    from those slices are then filtered by exact haversine distance.
+
+    Query results are positions into the arrays the index was built from.
+    Build a new index to change the point set; readers can keep using the old one.
+    """
+
+    def __init__(self, lats, lons, cell_deg: float = 0.1):
+        self._assign(grid_index_arrays(lats, lons, cell_deg), cell_deg)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], cell_deg: float) -> "GridIndex":
+        """An index over arrays saved from ``arrays()``, used as they are (e.g. views of a mapped file)."""
+        index = cls.__new__(cls)
+        index._assign(arrays, cell_deg)
+        return index
+
+    def _assign(self, arrays: Dict[str, np.ndarray], cell_deg: float) -> None:
+        self.cell_deg = cell_deg
+        self._n_rows, self._n_cols = grid_shape(cell_deg)
+        self._keys, self._positions, self._lat, self._lon, self._cos_lat = (arrays[name] for name in GRID_INDEX_ARRAYS)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """The index's sorted arrays by GRID_INDEX_ARRAYS name, for saving alongside the points."""
+        return dict(zip(GRID_INDEX_ARRAYS, (self._keys, self._positions, self._lat, self._lon, self._cos_lat)))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _cell_keys(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        return grid_cell_keys(lats, lons, self.cell_deg)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Sorted-array offsets of every point in the cells overlapping the bounding box."""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        corners = self._cell_keys(np.array([min_lat, max_lat]), np.array([min_lon, max_lon]))
+        (row_lo, row_hi), (col_lo, col_hi) = corners // self._n_cols, corners % self._n_cols
+        row_starts = np.arange(row_lo, row_hi + 1, dtype=np.int64) * self._n_cols
+        starts = np.searchsorted(self._keys, row_starts + col_lo, side="left")
+        ends = np.searchsorted(self._keys, row_starts + col_hi, side="right")
+        spans = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        if not spans:
+            return _EMPTY[0]
+        return spans[0] if len(spans) == 1 else np.concatenate(spans)
+
+    def _box_candidates(self, min_lat: np.ndarray, max_lat: np.ndarray, min_lon: np.ndarray,
+                        max_lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """_candidates for many boxes at once: (box number, sorted-array offset) per candidate.
+
+        Works on one (box, grid row) pair per element, so there is no Python
+        loop over boxes.
+        """
+        row_lo, col_lo = np.divmod(self._cell_keys(min_lat, min_lon), self._n_cols)
+        row_hi, col_hi = np.divmod(self._cell_keys(max_lat, max_lon), self._n_cols)
+        row_box, row_step = _expand(row_hi - row_lo + 1)
+        row_starts = (row_lo[row_box] + row_step) * self._n_cols
+        starts = np.searchsorted(self._keys, row_starts + col_lo[row_box], side="left")
+        ends = np.searchsorted(self._keys, row_starts + col_hi[row_box], side="right")
+        span_index, span_step = _expand(ends - starts)
+        return row_box[span_index], starts[span_index] + span_step
+
+    def _distances(self, lat: float, lon: float, offsets: np.ndarray) -> np.ndarray:
+        lat0 = math.radians(lat)
+        return haversine_km_radians(lat0, math.radians(lon), self._lat[offsets], self._lon[offsets],
+                                    cos_lat1=math.cos(lat0), cos_lat2=self._cos_lat[offsets])
+
+    def within(self, lat: float, lon: float, radius_km: float, limit: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, distances_km) of points within ``radius_km``, nearest first.
+
+        With ``limit``, only the ``limit`` nearest are returned.
+        """
+        if limit is not None and limit <= 0:
+            return _EMPTY
+        offsets = self._candidates(lat, lon, radius_km)
+        if offsets.size == 0:
+            return _EMPTY
+
+        distances = self._distances(lat, lon, offsets)
+        mask = distances <= radius_km
+        offsets, distances = offsets[mask], distances[mask]
+        if limit is not None and limit < offsets.size:
+            top = np.argpartition(distances, limit - 1)[:limit]
+            offsets, distances = offsets[top], distances[top]
+
+        order = np.argsort(distances, kind="stable")
+        return self._positions[offsets[order]], distances[order]
+
+    def within_many(self, lats: Sequence[float], lons: Sequence[float], radii_km: Sequence[float],
+                    limits: Optional[Sequence[int]] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """``within`` for many query points at once, one (positions, distances_km) pair per point.
+
+        Candidates of all queries are gathered into one array tagged with their
+        query number, so the distances, radius filter, per-query ordering and
+        limits each take a single vectorized pass instead of one per point.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        radii = np.asarray(radii_km, dtype=np.float64)
+        n = len(lats)
+        if n == 0:
+            return []
+
+        query, offsets = self._box_candidates(*bounding_boxes(lats, lons, radii))
+        if offsets.size == 0:
+            return [_EMPTY] * n
+        lat0, lon0 = np.radians(lats), np.radians(lons)
+        distances = haversine_km_radians(lat0[query], lon0[query], self._lat[offsets], self._lon[offsets],
+                                         cos_lat1=np.cos(lat0)[query], cos_lat2=self._cos_lat[offsets])
+        mask = distances <= radii[query]
+        query, offsets, distances = query[mask], offsets[mask], distances[mask]
+
+        order = np.lexsort((distances, query))
+        query, offsets, distances = query[order], offsets[order], distances[order]
+        if limits is not None:
+            # Rank of each match within its query, from where that query's run starts
+            rank = np.arange(len(query)) - np.searchsorted(query, query, side="left")
+            keep = rank < np.asarray(limits, dtype=np.int64)[query]
+            query, offsets, distances = query[keep], offsets[keep], distances[keep]
+
+        bounds = np.searchsorted(query, np.arange(n + 1), side="left")
+        positions = self._positions[offsets]
+        return [(positions[lo:hi], distances[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    def along_polyline(self, lats: Sequence[float], lons: Sequence[float], width_km: float,
+                       chunk_segments: int = 4096) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(positions, distances_km, along_km) of points within ``width_km`` of a polyline.
+
+        ``distances_km`` is each point's distance from the route and
+        ``along_km`` how far along the route its closest approach lies; results
+        are ordered by ``along_km``. Each segment's bounding box, widened by
+        the corridor, selects grid cells as in ``within``; candidates outside
+        the box itself are dropped before the exact test. Distances to a
+        segment are measured in a local equirectangular projection, which is
+        accurate for the segment lengths routing engines emit. Segments are
+        processed ``chunk_segments`` at a time to bound memory on long routes.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if len(lats) == 0 or len(self) == 0:
+            return _EMPTY + (np.empty(0, dtype=np.float64),)
+        if len(lats) == 1:
+            positions, distances = self.within(lats[0], lons[0], width_km)
+            return positions, distances, np.zeros(len(positions))
+
+        lat1, lon1, lat2, lon2 = lats[:-1], lons[:-1], lats[1:], lons[1:]
+        lengths = haversine_km_radians(np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2))
+        starts_along = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+        box1, box2 = bounding_boxes(lat1, lon1, width_km), bounding_boxes(lat2, lon2, width_km)
+        boxes = (np.minimum(box1[0], box2[0]), np.maximum(box1[1], box2[1]),
+                 np.minimum(box1[2], box2[2]), np.maximum(box1[3], box2[3]))
+
+        found = []
+        for first in range(0, len(lengths), chunk_segments):
+            chunk = slice(first, first + chunk_segments)
+            segment, offsets = self._box_candidates(*(bound[chunk] for bound in boxes))
+            segment += first
+            min_lat, max_lat, min_lon, max_lon = (np.radians(bound[segment]) for bound in boxes)
+            plat, plon = self._lat[offsets], self._lon[offsets]
+            inside = (plat >= min_lat) & (plat <= max_lat) & (plon >= min_lon) & (plon <= max_lon)
+            segment, offsets, plat, plon = segment[inside], offsets[inside], plat[inside], plon[inside]
+
+            # Kilometre plane around each segment: x east, y north, origin at the segment start
+            ay, ax = np.radians(lat1[segment]), np.radians(lon1[segment])
+            scale_x = EARTH_RADIUS_KM * np.cos((ay + np.radians(lat2[segment])) * 0.5)
+            dx = (np.radians(lon2[segment]) - ax) * scale_x
+            dy = (np.radians(lat2[segment]) - ay) * EARTH_RADIUS_KM
+            px, py = (plon - ax) * scale_x, (plat - ay) * EARTH_RADIUS_KM
+            length2 = dx * dx + dy * dy
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(length2 > 0, np.clip((px * dx + py * dy) / length2, 0.0, 1.0), 0.0)
+            distances = np.hypot(px - t * dx, py - t * dy)
+            near = distances <= width_km
+            found.append((offsets[near], distances[near], starts_along[segment[near]] + t[near] * lengths[segment[near]]))
+
+        offsets, distances, along = (np.concatenate(parts) for parts in zip(*found))
+        # A point near several segments keeps its closest approach
+        order = np.lexsort((along, distances, offsets))
+        offsets, distances, along = offsets[order], distances[order], along[order]
+        first = np.ones(len(offsets), dtype=bool)
+        first[1:] = offsets[1:] != offsets[:-1]
+        offsets, distances, along = offsets[first], distances[first], along[first]
+
+        order = np.argsort(along, kind="stable")
+        return self._positions[offsets[order]], distances[order], along[order]
+
+    def nearest(self, lat: float, lon: float, k: int,
+                max_radius_km: float = MAX_RADIUS_KM) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, distances_km) of the ``k`` nearest points within ``max_radius_km``.
+
+        Searches a growing radius; once ``k`` points fall inside it they are the
+        true k nearest, since every point outside is farther than the radius.
+        """
+        radius = min(self.cell_deg * KM_PER_DEGREE_LAT, max_radius_km)
+        while True:
+            positions, distances = self.within(lat, lon, radius, limit=k)
+            if len(positions) >= k or radius >= max_radius_km:
+                return positions, distances
+            radius = min(radius * 4, max_radius_km)
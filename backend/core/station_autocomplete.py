@@ -0,0 +1,211 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import numpy as np
+from fastapi import Request
+from core.station_search import normalize
+
+logger = logging.getLogger(__name__)
+
+# Prefixes this short match huge ranges; their answers are memoized per build
+MEMO_PREFIX_LENGTH = 2
+# Highest limit a caller may ask for; memoized answers hold this many
+MAX_SUGGESTIONS = 20
+
+
+_STATION, _TOWN = 0, 1
+
+
+class _Build:
+    """One immutable build of the autocomplete index.
+
+    ``texts`` holds each suggestion's normalized text once. The searchable keys
+    are every word start inside those texts: entry ``e`` stands for
+    ``texts[suggestion[e]][offset[e]:]``, and entries are sorted by that key.
+    So "tata power" is found by both "ta" and "po" without storing the
+    suffixes themselves, and a prefix query is two binary searches.
+    Suggestions live in parallel arrays; dicts are only built for results.
+    """
+
+    def __init__(self, texts: List[str], labels: List[str], kinds: List[int], refs: List[int],
+                 towns: List[Optional[str]], weights: List[float]):
+        self.texts = texts
+        self.labels = labels
+        self.kinds = np.asarray(kinds, dtype=np.int8)
+        # Station id for stations, station count for towns
+        self.refs = np.asarray(refs, dtype=np.int64)
+        self.towns = towns
+        self.weights = np.asarray(weights, dtype=np.float32)
+
+        entry_suggestion, entry_offset = [], []
+        for i, text in enumerate(texts):
+            for offset in [0] + [j + 1 for j, ch in enumerate(text) if ch == " "]:
+                entry_suggestion.append(i)
+                entry_offset.append(offset)
+        order = np.array(sorted(range(len(entry_suggestion)),
+                                key=lambda e: texts[entry_suggestion[e]][entry_offset[e]:]), dtype=np.int64)
+        self.suggestion = np.array(entry_suggestion, dtype=np.int32)[order]
+        self.offset = np.array(entry_offset, dtype=np.int32)[order]
+        self.weight = self.weights[self.suggestion]
+        self.memo: Dict[str, List[Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.suggestion)
+
+    def _key(self, entry: int) -> str:
+        return self.texts[self.suggestion[entry]][self.offset[entry]:]
+
+    def _describe(self, i: int) -> Dict[str, Any]:
+        weight = float(self.weights[i])
+        if self.kinds[i] == _TOWN:
+            return {"text": self.labels[i], "type": "town", "stations": int(self.refs[i]), "weight": weight}
+        return {"text": self.labels[i], "type": "station", "station_id": int(self.refs[i]),
+                "town": self.towns[i], "weight": weight}
+
+    def complete(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        entries = range(len(self))
+        lo = bisect.bisect_left(entries, prefix, key=self._key)
+        hi = bisect.bisect_left(entries, prefix + "\U0010ffff", lo=lo, key=self._key)
+        if lo == hi:
+            return []
+
+        weights = self.weight[lo:hi]
+        # A suggestion can match at several word starts; take spare candidates to fill the limit after dedupe
+        take = min(hi - lo, limit * 3)
+        top = np.argpartition(-weights, take - 1)[:take] if take < hi - lo else np.arange(hi - lo)
+        top = top[np.lexsort((top, -weights[top]))]
+        seen, results = set(), []
+        for entry in top:
+            suggestion = int(self.suggestion[lo + entry])
+            if suggestion not in seen:
+                seen.add(suggestion)
+                results.append(self._describe(suggestion))
+                if len(results) == limit:
+                    break
+        return results
+
+
+class StationAutocomplete:
+    """Prefix completion over station names and towns, ranked by popularity.
+
+    Every word of a name or town can start a match. A station's weight is one
+    plus its recent charging sessions; a town's is the sum over its stations,
+    so busy places surface first. Rebuilt from the station catalog when a
+    change touches names or towns or removes stations (builds are immutable
+    and swapped in whole); session counts come from ``popularity`` and are
+    re-read at most every ``popularity_ttl`` seconds.
+    """
+
+    def __init__(self, popularity: Optional[Callable[[], Dict[Any, int]]] = None, popularity_ttl: float = 3600.0):
+        self.popularity = popularity
+        self.popularity_ttl = popularity_ttl
+        self.ready = False
+        self.last_build_seconds: Optional[float] = None
+        self._build = _Build([], [], [], [], [], [])
+        self._popularity: Dict[Any, int] = {}
+        self._popularity_at: Optional[float] = None
+        # (name, town) of every station in the current build, to skip rebuilds that would change nothing
+        self._indexed: Dict[Any, tuple] = {}
+        self._build_lock = threading.Lock()
+
+    def attach(self, catalog) -> None:
+        """Rebuild from a StationCatalog whenever a change reaches the index."""
+        def on_change(upserted, removed):
+            if self.needs_rebuild(upserted, removed):
+                self.rebuild(catalog.stations)
+        catalog.add_listener(on_change)
+
+    def needs_rebuild(self, upserted: Iterable[tuple], removed: Iterable[Any]) -> bool:
+        """Whether a catalog change alters indexed text or weights; availability or power updates do not."""
+        if not self.ready or self._popularity_stale():
+            return True
+        if any(station_id in self._indexed for station_id in removed):
+            return True
+        return any(self._indexed.get(station.id) != (station.name, station.town) for station in upserted)
+
+    def _popularity_stale(self) -> bool:
+        return (self.popularity is not None and self._popularity_at is not None
+                and time.monotonic() - self._popularity_at > self.popularity_ttl)
+
+    def _session_counts(self) -> Dict[Any, int]:
+        if self.popularity is None:
+            return {}
+        now = time.monotonic()
+        if self._popularity_at is None or now - self._popularity_at > self.popularity_ttl:
+            try:
+                self._popularity = self.popularity()
+            except Exception as e:
+                logger.warning(f"Could not load station popularity, keeping previous weights: {e!r}")
+            self._popularity_at = now
+        return self._popularity
+
+    def rebuild(self, stations: Iterable[tuple]) -> None:
+        """Build from catalog rows and swap the new build in."""
+        with self._build_lock:
+            started = time.perf_counter()
+            sessions = self._session_counts()
+            texts, labels, kinds, refs, towns, weights = [], [], [], [], [], []
+            town_positions: Dict[str, int] = {}
+            indexed: Dict[Any, tuple] = {}
+            for station in stations:
+                indexed[station.id] = (station.name, station.town)
+                weight = 1 + sessions.get(station.id, 0)
+                name = normalize(station.name)
+                if name:
+                    texts.append(name)
+                    labels.append(station.name)
+                    kinds.append(_STATION)
+                    refs.append(station.id)
+                    towns.append(station.town)
+                    weights.append(weight)
+                town = normalize(station.town)
+                if town:
+                    position = town_positions.get(town)
+                    if position is None:
+                        town_positions[town] = len(texts)
+                        texts.append(town)
+                        labels.append(station.town)
+                        kinds.append(_TOWN)
+                        refs.append(1)
+                        towns.append(None)
+                        weights.append(weight)
+                    else:
+                        refs[position] += 1
+                        weights[position] += weight
+
+            self._build = _Build(texts, labels, kinds, refs, towns, weights)
+            self._indexed = indexed
+            self.ready = True
+            self.last_build_seconds = round(time.perf_counter() - started, 3)
+            logger.info(f"Built station autocomplete: {len(texts)} suggestions, "
+                        f"{len(self._build)} keys in {self.last_build_seconds}s")
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Up to ``limit`` suggestions whose name or town has a word starting with ``prefix``, heaviest first."""
+        prefix = normalize(prefix)
+        limit = min(limit, MAX_SUGGESTIONS)
+        if not prefix or limit <= 0:
+            return []
+        build = self._build
+        if len(prefix) > MEMO_PREFIX_LENGTH:
+            return build.complete(prefix, limit)
+        results = build.memo.get(prefix)
+        if results is None:
+            results = build.memo[prefix] = build.complete(prefix, MAX_SUGGESTIONS)
+        return results[:limit]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "suggestions": len(self._build.texts),
+            "keys": len(self._build),
+            "last_build_seconds": self.last_build_seconds,
+        }
+
+
+def get_station_autocomplete(request: Request) -> Optional[StationAutocomplete]:
+    """FastAPI dependency returning the autocomplete index once built, else None (query the database)."""
+    index = getattr(request.app.state, "station_autocomplete", None)
+    return index if index is not None and index.ready else None
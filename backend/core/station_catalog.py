@@ -0,0 +1,398 @@
+import asyncio
+import bisect
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from fastapi import Request
+from core.spatial_index import GridIndex
+
+# Add parent directory to path to access db module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from db.connectors import StationFilter, mask_from_energy_type
+from db.query_stats import track_queries
+from db.station_snapshot import StationSnapshot, snapshot_identity
+
+logger = logging.getLogger(__name__)
+
+STATION_COLUMNS_SQL = "SELECT * EXCLUDE (location) FROM stations"
+
+# Called with (upserted rows, removed station ids) after every change to the catalog
+Listener = Callable[[List[tuple], List[Any]], None]
+
+
+class StationColumns:
+    """Columnar copy of the station attributes nearby filters test, aligned with catalog positions.
+
+    Connector types are a uint32 bitmask per station (db/connectors.py), power
+    is float with NaN for unknown, so a filter is a few vectorized compares
+    over the candidate positions instead of string matching per row. The
+    coordinates live in the GridIndex, sorted by cell.
+    """
+
+    def __init__(self, connectors: np.ndarray, max_power_kw: np.ndarray, available: np.ndarray):
+        self.connectors = connectors
+        self.max_power_kw = max_power_kw
+        self.available = available
+
+    @classmethod
+    def from_rows(cls, stations: Sequence[tuple]) -> "StationColumns":
+        # Rows ingested before connector_mask existed are parsed once per distinct energy_type
+        parsed: Dict[Any, int] = {}
+
+        def connectors(station: tuple) -> int:
+            if getattr(station, 'connector_mask', None) is not None:
+                return station.connector_mask
+            if station.energy_type not in parsed:
+                parsed[station.energy_type] = mask_from_energy_type(station.energy_type)
+            return parsed[station.energy_type]
+
+        return cls(
+            np.array([connectors(s) for s in stations], dtype=np.uint32),
+            np.array([np.nan if getattr(s, 'max_power_kw', None) is None else s.max_power_kw for s in stations],
+                     dtype=np.float32),
+            np.array([bool(s.available) for s in stations], dtype=bool),
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: StationSnapshot) -> "StationColumns":
+        """Columns viewing a mapped snapshot's arrays; copied only where rows lack a value."""
+        connectors, power = snapshot.array('connector_mask'), snapshot.array('max_power_kw')
+        missing = np.flatnonzero(~snapshot.valid('connector_mask'))
+        if missing.size:
+            connectors = connectors.copy()
+            for position in missing:
+                connectors[position] = mask_from_energy_type(snapshot.rows[position].energy_type)
+        if not snapshot.valid('max_power_kw').all():
+            power = np.where(snapshot.valid('max_power_kw'), power, np.nan)
+        return cls(connectors, power, snapshot.array('available'))
+
+    def matching(self, station_filter: StationFilter, positions: np.ndarray) -> np.ndarray:
+        """Boolean mask of which ``positions`` pass the filter."""
+        keep = np.ones(len(positions), dtype=bool)
+        if station_filter.connectors:
+            keep &= (self.connectors[positions] & np.uint32(station_filter.connectors)) != 0
+        if station_filter.min_power_kw is not None:
+            # NaN (unknown power) compares False
+            keep &= self.max_power_kw[positions] >= station_filter.min_power_kw
+        if station_filter.available_only:
+            keep &= self.available[positions]
+        return keep
+
+
+class _CatalogState:
+    """One immutable generation of the catalog; swapped as a whole on refresh."""
+
+    def __init__(self, stations: Tuple[tuple, ...], version: int, cell_deg: float):
+        self.stations = stations
+        self.version = version
+        self.positions = {station.id: i for i, station in enumerate(stations)}
+        self.ocm_ids = frozenset(station.ocm_id for station in stations if station.ocm_id is not None)
+        self.index = GridIndex([s.latitude for s in stations], [s.longitude for s in stations], cell_deg)
+        self._by_id: Optional[Tuple[List[Any], Tuple[tuple, ...]]] = None
+        self._columns: Optional[StationColumns] = None
+
+    @property
+    def by_id(self) -> Tuple[List[Any], Tuple[tuple, ...]]:
+        """(sorted ids, stations in id order), built on first use since only pagination needs it."""
+        if self._by_id is None:
+            ordered = tuple(sorted(self.stations, key=lambda station: station.id))
+            self._by_id = ([station.id for station in ordered], ordered)
+        return self._by_id
+
+    @property
+    def columns(self) -> StationColumns:
+        """Columnar attributes, built on first use since only filtered searches need them."""
+        if self._columns is None:
+            self._columns = StationColumns.from_rows(self.stations)
+        return self._columns
+
+
+class _SortedIds:
+    """Position lookups and membership tests over a sorted id array, by binary search."""
+
+    def __init__(self, ids: np.ndarray):
+        self._ids = ids
+
+    def get(self, value: Any, default: Optional[int] = None) -> Optional[int]:
+        if not isinstance(value, (int, np.integer)) or isinstance(value, bool) or not len(self._ids):
+            return default
+        position = int(np.searchsorted(self._ids, value))
+        return position if position < len(self._ids) and self._ids[position] == value else default
+
+    def __contains__(self, value: Any) -> bool:
+        return self.get(value) is not None
+
+
+class _SnapshotState:
+    """A catalog generation served from a mapped StationSnapshot rather than rows held in memory.
+
+    Rows are decoded from the mapping when read; ids, the spatial index and
+    the filter columns are views of it, so workers mapping the same snapshot
+    share one copy through the page cache.
+    """
+
+    def __init__(self, snapshot: StationSnapshot, version: int, cell_deg: float):
+        self.snapshot = snapshot
+        self.stations = snapshot.rows
+        self.version = version
+        self.positions = _SortedIds(snapshot.array('id'))
+        self.ocm_ids = _SortedIds(snapshot.array('ocm_ids'))
+        if snapshot.cell_deg == cell_deg:
+            self.index = GridIndex.from_arrays(snapshot.grid_arrays(), cell_deg)
+        else:
+            self.index = GridIndex(snapshot.array('latitude'), snapshot.array('longitude'), cell_deg)
+        # Snapshot rows are already in id order
+        self.by_id = (snapshot.array('id'), snapshot.rows)
+        self._columns: Optional[StationColumns] = None
+
+    @property
+    def columns(self) -> StationColumns:
+        if self._columns is None:
+            self._columns = StationColumns.from_snapshot(self.snapshot)
+        return self._columns
+
+
+def _snapshot_changes(old: StationSnapshot, new: StationSnapshot) -> Tuple[List[tuple], List[Any]]:
+    """(rows new or changed in ``new``, ids only in ``old``), found by comparing id and row hash arrays."""
+    positions, found = old.positions_of(new.array('id'))
+    changed = ~found
+    if old.count:
+        changed |= old.array('row_hash')[positions] != new.array('row_hash')
+    _, kept = new.positions_of(old.array('id'))
+    return [new.rows[p] for p in np.flatnonzero(changed)], old.array('id')[~kept].tolist()
+
+
+class StationCatalog:
+    """In-memory copy of the stations table with a spatial index, for lookups without a warehouse round trip.
+
+    Loaded in the background at startup and kept fresh by polling ``updated_at``;
+    a full reload runs when the row count shows stations were deleted. Readers
+    always see one consistent generation; refreshes build the next one aside
+    and swap it in. Rows are the manager's named tuples (``station.name``).
+
+    With ``snapshot_path`` the catalog maps the station snapshot the ingestion
+    job writes (db/station_snapshot.py) instead of querying the table, and a
+    refresh swaps in the file's next version once it has been replaced.
+    """
+
+    def __init__(self, manager, refresh_interval: float = 30.0, cell_deg: float = 0.1,
+                 snapshot_path: Optional[str] = None):
+        self.manager = manager
+        self.refresh_interval = refresh_interval
+        self.cell_deg = cell_deg
+        self.snapshot_path = snapshot_path
+        self.ready = False
+        self.last_refresh: Optional[float] = None
+        self.last_load_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._state = _CatalogState((), 0, cell_deg)
+        self._watermark = None
+        self._listeners: List[Listener] = []
+        self._task: Optional[asyncio.Task] = None
+
+    # --- reads ---
+    def __len__(self) -> int:
+        return len(self._state.stations)
+
+    @property
+    def version(self) -> int:
+        return self._state.version
+
+    @property
+    def stations(self) -> Tuple[tuple, ...]:
+        return self._state.stations
+
+    def get(self, station_id: Any) -> Optional[tuple]:
+        state = self._state
+        position = state.positions.get(station_id)
+        return None if position is None else state.stations[position]
+
+    def page(self, after_id: Any = None, limit: Optional[int] = None) -> Tuple[int, List[tuple], bool]:
+        """(version, stations, has_more) for one keyset page in id order, like manager.get_stations_page."""
+        state = self._state
+        ids, ordered = state.by_id
+        start = 0 if after_id is None else bisect.bisect_right(ids, after_id)
+        end = len(ids) if limit is None else min(start + limit, len(ids))
+        return state.version, list(ordered[start:end]), end < len(ids)
+
+    def holds_ocm_id(self, ocm_id: Any) -> bool:
+        """Whether a station ingested from this Open Charge Map ID is in the catalog."""
+        return ocm_id in self._state.ocm_ids
+
+    def nearby(self, lat: float, lon: float, radius_km: float, limit: Optional[int] = None,
+               station_filter: Optional[StationFilter] = None) -> List[Tuple[tuple, float]]:
+        """(station, distance_km) pairs within ``radius_km``, nearest first.
+
+        With ``station_filter``, only stations passing it are returned; the
+        filter is applied before ``limit``.
+        """
+        state = self._state
+        if station_filter is None or not station_filter.active:
+            positions, distances = state.index.within(lat, lon, radius_km, limit=limit)
+        else:
+            positions, distances = state.index.within(lat, lon, radius_km)
+            keep = state.columns.matching(station_filter, positions)
+            positions, distances = positions[keep][:limit], distances[keep][:limit]
+        return [(state.stations[p], float(d)) for p, d in zip(positions, distances)]
+
+    def nearby_many(self, queries: List[Tuple[float, float, float, int]]) -> List[List[Tuple[tuple, float]]]:
+        """``nearby`` for many (lat, lon, radius_km, limit) queries, resolved in one pass over the index."""
+        state = self._state
+        if not queries:
+            return []
+        lats, lons, radii, limits = zip(*queries)
+        return [[(state.stations[p], float(d)) for p, d in zip(positions, distances)]
+                for positions, distances in state.index.within_many(lats, lons, radii, limits)]
+
+    def along_route(self, lats, lons, width_km: float) -> List[Tuple[tuple, float, float]]:
+        """(station, distance_from_route_km, along_route_km) for stations within ``width_km`` of a route."""
+        state = self._state
+        positions, distances, along = state.index.along_polyline(lats, lons, width_km)
+        return [(state.stations[p], float(d), float(a)) for p, d, a in zip(positions, distances, along)]
+
+    def nearest(self, lat: float, lon: float, k: int, max_radius_km: Optional[float] = None) -> List[Tuple[tuple, float]]:
+        """The ``k`` nearest (station, distance_km) pairs, optionally capped at ``max_radius_km``."""
+        state = self._state
+        if max_radius_km is None:
+            positions, distances = state.index.nearest(lat, lon, k)
+        else:
+            positions, distances = state.index.nearest(lat, lon, k, max_radius_km)
+        return [(state.stations[p], float(d)) for p, d in zip(positions, distances)]
+
+    def add_listener(self, listener: Listener) -> None:
+        """Register a callback run (on the refresh thread) after each catalog change."""
+        self._listeners.append(listener)
+
+    def status(self) -> Dict[str, Any]:
+        state = self._state
+        return {
+            "ready": self.ready,
+            "stations": len(self),
+            "version": self.version,
+            "last_refresh": self.last_refresh,
+            "last_load_seconds": self.last_load_seconds,
+            "last_error": self.last_error,
+            "snapshot": state.snapshot.status() if isinstance(state, _SnapshotState) else None,
+        }
+
+    # --- loading ---
+    def load(self) -> int:
+        """Load the whole stations table, replacing the current generation. Returns the station count."""
+        if self.snapshot_path:
+            self._map_snapshot()
+            return len(self)
+        started = time.perf_counter()
+        stations: List[tuple] = []
+        for batch in self.manager.iter_query(STATION_COLUMNS_SQL, batch_size=5000, row_type='row'):
+            stations.extend(batch)
+
+        loaded_ids = {station.id for station in stations}
+        removed = [station_id for station_id in self._state.positions if station_id not in loaded_ids]
+        self._watermark = max((s.updated_at for s in stations if s.updated_at is not None), default=None)
+        self._install(tuple(stations), stations, removed)
+
+        self.last_load_seconds = round(time.perf_counter() - started, 3)
+        logger.info(f"Loaded {len(stations)} stations into the catalog in {self.last_load_seconds}s")
+        return len(stations)
+
+    def refresh(self) -> int:
+        """Apply rows changed since the last refresh. Returns how many stations changed."""
+        if self.snapshot_path:
+            state = self._state
+            if isinstance(state, _SnapshotState) and snapshot_identity(self.snapshot_path) == state.snapshot.identity:
+                self.last_refresh = time.time()
+                return 0
+            return self._map_snapshot()
+        if self._watermark is None:
+            return self.load()
+
+        # >= so rows committed later within the same timestamp tick are not missed;
+        # rows already held unchanged are skipped below
+        changed = self.manager.execute_query_rows(
+            f"{STATION_COLUMNS_SQL} WHERE updated_at >= %s ORDER BY updated_at", (self._watermark,))
+        state = self._state
+        upserted = [row for row in changed if state.positions.get(row.id) is None
+                    or state.stations[state.positions[row.id]] != row]
+
+        if upserted:
+            stations = list(state.stations)
+            for row in upserted:
+                position = state.positions.get(row.id)
+                if position is None:
+                    stations.append(row)
+                else:
+                    stations[position] = row
+            self._watermark = max(self._watermark, max(row.updated_at for row in upserted))
+            self._install(tuple(stations), upserted, [])
+
+        # updated_at cannot show deletions; a shrinking table needs a full reload
+        if self.manager.get_station_count() != len(self):
+            logger.info("Station count changed outside updated_at; reloading the catalog")
+            self.load()
+        self.last_refresh = time.time()
+        return len(upserted)
+
+    def _map_snapshot(self) -> int:
+        """Swap in the snapshot file's current version. Returns how many stations changed."""
+        started = time.perf_counter()
+        snapshot = StationSnapshot(self.snapshot_path)
+        previous = self._state
+        if isinstance(previous, _SnapshotState):
+            upserted, removed = _snapshot_changes(previous.snapshot, snapshot)
+        else:
+            upserted, removed = snapshot.rows, list(previous.positions)
+        self._swap(_SnapshotState(snapshot, previous.version + 1, self.cell_deg), upserted, removed)
+
+        self.last_load_seconds = round(time.perf_counter() - started, 3)
+        logger.info(f"Mapped station snapshot v{snapshot.version} ({len(snapshot)} stations, {len(upserted)} changed, "
+                    f"{len(removed)} removed) in {self.last_load_seconds}s")
+        return len(upserted)
+
+    def _install(self, stations: Tuple[tuple, ...], upserted: List[tuple], removed: List[Any]) -> None:
+        self._swap(_CatalogState(stations, self._state.version + 1, self.cell_deg), upserted, removed)
+
+    def _swap(self, state, upserted: Sequence[tuple], removed: List[Any]) -> None:
+        self._state = state
+        self.ready = True
+        self.last_refresh = time.time()
+        for listener in self._listeners:
+            try:
+                listener(upserted, removed)
+            except Exception as e:
+                logger.error(f"Station catalog listener failed: {e!r}")
+
+    # --- background refresh ---
+    async def start(self) -> None:
+        """Load and then poll for changes in the background; callers fall back to the database until ready."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        step = self.load
+        while True:
+            try:
+                with track_queries("ev-api:station-catalog"):
+                    await self.manager.arun(step, workload='analytics')
+                self.last_error = None
+                step = self.refresh if self.ready else self.load
+            except Exception as e:
+                logger.warning(f"Station catalog refresh failed: {e!r}")
+                self.last_error = repr(e)
+            await asyncio.sleep(self.refresh_interval)
+
+
+def get_station_catalog(request: Request) -> Optional[StationCatalog]:
+    """FastAPI dependency returning the station catalog once loaded, else None (query the database)."""
+    catalog = getattr(request.app.state, "station_catalog", None)
+    return catalog if catalog is not None and catalog.ready else None
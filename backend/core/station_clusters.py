@@ -0,0 +1,188 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+# Zoom levels with their own grid; deeper zooms are answered from MAX_CLUSTER_ZOOM
+MAX_CLUSTER_ZOOM = 16
+# Cluster cell size in screen pixels (256 px map tiles)
+CLUSTER_CELL_PX = 64
+# Web Mercator stops here; points beyond are clamped
+MAX_MERCATOR_LAT = 85.05112878
+# Views spanning more cells than this at their zoom are refused (a whole screen is a few thousand)
+MAX_VIEW_CELLS = 16384
+
+_CELLS_PER_TILE = 256 // CLUSTER_CELL_PX
+_FINEST_CELLS = (2 ** MAX_CLUSTER_ZOOM) * _CELLS_PER_TILE
+
+
+def mercator_xy(lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator positions as fractions of the world, (0, 0) top left."""
+    lats = np.radians(np.clip(np.asarray(lats, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = (np.asarray(lons, dtype=np.float64) + 180.0) / 360.0
+    y = 0.5 - np.log(np.tan(np.pi / 4 + lats / 2)) / (2 * np.pi)
+    return np.clip(x, 0.0, 1.0), np.clip(y, 0.0, 1.0)
+
+
+def _finest_cells(lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+    x, y = mercator_xy(lats, lons)
+    return (np.minimum((x * _FINEST_CELLS).astype(np.int64), _FINEST_CELLS - 1),
+            np.minimum((y * _FINEST_CELLS).astype(np.int64), _FINEST_CELLS - 1))
+
+
+class StationClusterIndex:
+    """Hierarchical grid of station counts for map marker clustering.
+
+    Each zoom level has a grid of CLUSTER_CELL_PX x CLUSTER_CELL_PX pixel
+    cells in Web Mercator, and each cell is split into four at the next zoom,
+    so a station's cell at any zoom is its finest cell shifted right. A cell
+    holds [count, sum of latitudes, sum of longitudes, available count, sum
+    of station ids]; the sums give the cluster centroid, and while a cell
+    holds one station its id sum is that station's id.
+
+    Everything is a sum, so a changed station is moved by subtracting it from
+    its old cells and adding it to its new ones, one cell per zoom level.
+    Fed by StationCatalog listeners; queries and updates share a lock since
+    the catalog refreshes on a worker thread.
+    """
+
+    def __init__(self, max_zoom: int = MAX_CLUSTER_ZOOM):
+        self.max_zoom = max_zoom
+        self.ready = False
+        self._levels: List[Dict[Tuple[int, int], List[float]]] = [{} for _ in range(max_zoom + 1)]
+        self._placed: Dict[Any, Tuple[int, int, float, float, bool]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._placed)
+
+    def attach(self, catalog) -> None:
+        """Keep this index in step with a StationCatalog."""
+        def on_change(upserted: List[tuple], removed: List[Any]) -> None:
+            if not self.ready:
+                self.rebuild(catalog.stations)
+            else:
+                self.update(upserted, removed)
+        catalog.add_listener(on_change)
+
+    # --- maintenance ---
+    def _apply(self, levels, station_id, placed, sign: int) -> None:
+        ix, iy, lat, lon, available = placed
+        shift = MAX_CLUSTER_ZOOM
+        for zoom in range(self.max_zoom, -1, -1):
+            key = (ix >> (shift - zoom), iy >> (shift - zoom))
+            cell = levels[zoom].get(key)
+            if cell is None:
+                cell = levels[zoom][key] = [0, 0.0, 0.0, 0, 0]
+            cell[0] += sign
+            cell[1] += sign * lat
+            cell[2] += sign * lon
+            cell[3] += sign * available
+            cell[4] += sign * station_id
+            if cell[0] == 0:
+                del levels[zoom][key]
+
+    @staticmethod
+    def _place(station) -> Optional[Tuple[int, int, float, float, bool]]:
+        if station.latitude is None or station.longitude is None:
+            return None
+        ix, iy = _finest_cells(station.latitude, station.longitude)
+        return int(ix), int(iy), float(station.latitude), float(station.longitude), bool(station.available)
+
+    def rebuild(self, stations: Iterable[tuple]) -> None:
+        """Replace the whole index with one built from ``stations`` (catalog rows).
+
+        Each zoom level is aggregated in one pass over arrays rather than
+        station by station as ``update`` does.
+        """
+        stations = [station for station in stations if station.latitude is not None and station.longitude is not None]
+        ids = np.array([station.id for station in stations], dtype=np.int64)
+        lats = np.array([station.latitude for station in stations], dtype=np.float64)
+        lons = np.array([station.longitude for station in stations], dtype=np.float64)
+        available = np.array([bool(station.available) for station in stations], dtype=np.int64)
+        ix, iy = _finest_cells(lats, lons)
+        placed = dict(zip(ids.tolist(), zip(ix.tolist(), iy.tolist(), lats.tolist(), lons.tolist(),
+                                            available.astype(bool).tolist())))
+
+        levels: List[Dict[Tuple[int, int], List[float]]] = []
+        for zoom in range(self.max_zoom + 1):
+            shift = MAX_CLUSTER_ZOOM - zoom
+            keys = ((ix >> shift) << 32) | (iy >> shift)
+            cells, cell_of = np.unique(keys, return_inverse=True)
+            sums = [np.bincount(cell_of, minlength=len(cells))] + [
+                np.bincount(cell_of, weights=values, minlength=len(cells)) for values in (lats, lons)]
+            sums += [np.bincount(cell_of, weights=values, minlength=len(cells)).astype(np.int64)
+                     for values in (available, ids)]
+            levels.append({(key >> 32, key & 0xffffffff): list(cell)
+                           for key, *cell in zip(cells.tolist(), *(column.tolist() for column in sums))})
+        with self._lock:
+            self._levels, self._placed = levels, placed
+            self.ready = True
+        logger.info(f"Built station cluster index: {len(placed)} stations, "
+                    f"{len(levels[self.max_zoom])} cells at zoom {self.max_zoom}")
+
+    def update(self, upserted: Iterable[tuple], removed: Iterable[Any] = ()) -> None:
+        """Move changed stations to their new cells and take deleted ones out."""
+        changes = [(station.id, self._place(station)) for station in upserted]
+        with self._lock:
+            for station_id, where in [(station_id, None) for station_id in removed] + changes:
+                old = self._placed.pop(station_id, None)
+                if old is not None:
+                    self._apply(self._levels, station_id, old, -1)
+                if where is not None:
+                    self._placed[station_id] = where
+                    self._apply(self._levels, station_id, where, 1)
+
+    # --- queries ---
+    def clusters(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+                 zoom: int) -> List[Dict[str, Any]]:
+        """Clusters of the cells at ``zoom`` that overlap a bounding box, largest first.
+
+        Entries are ``{"lat", "lon", "count", "available"}`` at the cluster
+        centroid, plus ``station_id`` for cells holding a single station. A
+        box with ``min_lon > max_lon`` crosses the antimeridian. Raises
+        ValueError for views spanning more than MAX_VIEW_CELLS cells.
+        """
+        zoom = max(0, min(zoom, self.max_zoom))
+        shift = MAX_CLUSTER_ZOOM - zoom
+        xs, ys = _finest_cells([max_lat, min_lat], [min_lon, max_lon])
+        x0, x1, y0, y1 = (int(corner) >> shift for corner in (*xs, *ys))
+        x_ranges = [(x0, x1)] if x0 <= x1 else [(x0, (_FINEST_CELLS >> shift) - 1), (0, x1)]
+        n_range = sum(hi - lo + 1 for lo, hi in x_ranges) * (y1 - y0 + 1)
+        if n_range > MAX_VIEW_CELLS:
+            raise ValueError(f"The view spans {n_range} cells at zoom {zoom}; at most {MAX_VIEW_CELLS} are allowed")
+
+        with self._lock:
+            level = self._levels[zoom]
+            if n_range <= len(level):
+                cells = [(key, level[key]) for lo, hi in x_ranges for x in range(lo, hi + 1)
+                         for key in ((x, y) for y in range(y0, y1 + 1)) if key in level]
+            else:
+                cells = [((x, y), cell) for (x, y), cell in level.items()
+                         if y0 <= y <= y1 and any(lo <= x <= hi for lo, hi in x_ranges)]
+            cells = [(key, list(cell)) for key, cell in cells]
+
+        results = []
+        for _, (count, sum_lat, sum_lon, available, id_sum) in sorted(cells, key=lambda item: -item[1][0]):
+            cluster = {"lat": round(sum_lat / count, 6), "lon": round(sum_lon / count, 6),
+                       "count": int(count), "available": int(available)}
+            if count == 1:
+                cluster["station_id"] = id_sum
+            results.append(cluster)
+        return results
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "stations": len(self),
+            "cells": sum(len(level) for level in self._levels),
+        }
+
+
+def get_station_clusters(request: Request) -> Optional[StationClusterIndex]:
+    """FastAPI dependency returning the cluster index once built, else None (cluster a database query)."""
+    index = getattr(request.app.state, "station_clusters", None)
+    return index if index is not None and index.ready else None
@@ -0,0 +1,212 @@
+import functools
+import logging
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import numpy as np
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+# Searched columns and how much a match in each counts towards the score
+SEARCH_FIELDS: Dict[str, float] = {"name": 1.0, "town": 0.8, "address_line1": 0.7, "state": 0.6}
+# Share of the query's trigrams a field must contain to match at all
+MIN_SIMILARITY = 0.35
+# Weight of whole-field similarity in the score, so a field equal to the query
+# outranks a longer one that merely contains it
+SIMILARITY_WEIGHT = 0.25
+# Stations changed since the last build are kept in a small delta segment;
+# past this many the index is rebuilt
+REBUILD_THRESHOLD = 1000
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# (normalized text, trigrams) of each searched field of one station
+Document = Tuple[Tuple[str, FrozenSet[str]], ...]
+
+
+@functools.lru_cache(maxsize=65536)
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, strip accents and collapse punctuation to single spaces."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+@functools.lru_cache(maxsize=65536)
+def trigrams(text: str) -> FrozenSet[str]:
+    """pg_trgm-style trigrams of normalized text: each word padded with two leading and one trailing space."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class _Segment:
+    """Postings for a fixed set of documents; only the ``alive`` mask changes after construction.
+
+    Each trigram maps to an array of ``doc * n_fields + field`` codes, so one
+    bincount over a query's postings yields shared-trigram counts for every
+    (station, field) pair at once.
+    """
+
+    def __init__(self, docs: List[Tuple[Any, Document]], n_fields: int):
+        self.ids = np.array([station_id for station_id, _ in docs], dtype=np.int64)
+        self.n_fields = n_fields
+        self.field_sizes = np.array([[len(grams) for _, grams in doc] for _, doc in docs],
+                                    dtype=np.float64).reshape(len(docs), n_fields)
+        self.alive = np.ones(len(docs), dtype=bool)
+        self.positions = {station_id: i for i, (station_id, _) in enumerate(docs)}
+
+        codes: Dict[str, List[int]] = {}
+        for i, (_, doc) in enumerate(docs):
+            base = i * n_fields
+            for field, (_, grams) in enumerate(doc):
+                for gram in grams:
+                    codes.setdefault(gram, []).append(base + field)
+        self.postings = {gram: np.array(posting, dtype=np.int64) for gram, posting in codes.items()}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def scores(self, grams: FrozenSet[str], weights: np.ndarray, min_similarity: float) -> np.ndarray:
+        """Score per document: best weighted field match, 0 where no field matches well enough."""
+        postings = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not postings or not len(self):
+            return np.zeros(len(self))
+        shared = np.bincount(np.concatenate(postings), minlength=len(self) * self.n_fields)
+        shared = shared.reshape(len(self), self.n_fields).astype(np.float64)
+        coverage = shared / len(grams)
+        similarity = shared / np.maximum(len(grams) + self.field_sizes - shared, 1)
+        field_scores = np.where(coverage >= min_similarity, weights * (coverage + SIMILARITY_WEIGHT * similarity), 0)
+        return np.where(self.alive, field_scores.max(axis=1), 0)
+
+
+class StationSearchIndex:
+    """In-memory trigram inverted index over station names and addresses.
+
+    A query matches a station when enough of its trigrams appear in one of
+    the searched fields, so typos and partial words still match. Matches are
+    ranked by the best weighted field score: the share of query trigrams the
+    field contains, plus a smaller term for how close the whole field is to
+    the query.
+
+    Fed by StationCatalog listeners. The bulk of the stations sit in an
+    immutable base segment; changed stations are masked out of it and kept in
+    a small delta segment until there are enough of them to rebuild. Searches
+    and updates are serialized with a lock since the catalog refreshes on a
+    worker thread.
+    """
+
+    def __init__(self, fields: Dict[str, float] = SEARCH_FIELDS, min_similarity: float = MIN_SIMILARITY):
+        self.fields = fields
+        self.min_similarity = min_similarity
+        self.ready = False
+        self._weights = np.array(list(fields.values()), dtype=np.float64)
+        self._lock = threading.Lock()
+        self._docs: Dict[Any, Document] = {}
+        self._base = _Segment([], len(fields))
+        self._delta_docs: Dict[Any, Document] = {}
+        self._delta = _Segment([], len(fields))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def attach(self, catalog) -> None:
+        """Keep this index in step with a StationCatalog."""
+        def on_change(upserted: List[tuple], removed: List[Any]) -> None:
+            if not self.ready or len(upserted) + len(removed) > REBUILD_THRESHOLD:
+                self.rebuild(catalog.stations)
+            else:
+                self.update(upserted, removed)
+        catalog.add_listener(on_change)
+
+    # --- maintenance ---
+    def _document(self, station) -> Document:
+        texts = (normalize(getattr(station, field, None)) for field in self.fields)
+        return tuple((text, trigrams(text)) for text in texts)
+
+    def rebuild(self, stations: Iterable[tuple]) -> None:
+        """Replace the whole index with one built from ``stations`` (catalog rows)."""
+        docs = {station.id: self._document(station) for station in stations}
+        base = _Segment(list(docs.items()), len(self.fields))
+        with self._lock:
+            self._docs, self._base = docs, base
+            self._delta_docs, self._delta = {}, _Segment([], len(self.fields))
+            self.ready = True
+        logger.info(f"Built station search index: {len(docs)} stations, {len(base.postings)} trigrams")
+
+    def update(self, upserted: Iterable[tuple], removed: Iterable[Any] = ()) -> None:
+        """Apply changed and deleted stations."""
+        changes = [(station.id, self._document(station)) for station in upserted]
+        with self._lock:
+            touched = False
+            for station_id, doc in [(station_id, None) for station_id in removed] + changes:
+                if self._docs.get(station_id) == doc:
+                    continue
+                touched = True
+                position = self._base.positions.get(station_id)
+                if position is not None:
+                    self._base.alive[position] = False
+                if doc is None:
+                    self._docs.pop(station_id, None)
+                    self._delta_docs.pop(station_id, None)
+                else:
+                    self._docs[station_id] = doc
+                    self._delta_docs[station_id] = doc
+            if touched:
+                self._delta = _Segment(list(self._delta_docs.items()), len(self.fields))
+            compact = len(self._delta_docs) > REBUILD_THRESHOLD
+        if compact:
+            self._compact()
+
+    def _compact(self) -> None:
+        with self._lock:
+            docs = dict(self._docs)
+        base = _Segment(list(docs.items()), len(self.fields))
+        with self._lock:
+            # Skip if another update landed meanwhile; the next one compacts again
+            if docs == self._docs:
+                self._base = base
+                self._delta_docs, self._delta = {}, _Segment([], len(self.fields))
+
+    # --- queries ---
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Any, float]]:
+        """(station id, score) pairs for the best ``limit`` matches, best first; ties by id."""
+        grams = trigrams(normalize(query))
+        if not grams or limit <= 0:
+            return []
+
+        ids, scores = [], []
+        with self._lock:
+            for segment in (self._base, self._delta):
+                segment_scores = segment.scores(grams, self._weights, self.min_similarity)
+                matched = np.flatnonzero(segment_scores)
+                if len(matched) > limit:
+                    # Keep everything tied with the limit-th best so ties resolve by id below
+                    kth = np.partition(segment_scores[matched], len(matched) - limit)[len(matched) - limit]
+                    matched = matched[segment_scores[matched] >= kth]
+                ids.append(segment.ids[matched])
+                scores.append(segment_scores[matched])
+
+        ids, scores = np.concatenate(ids), np.round(np.concatenate(scores), 4)
+        order = np.lexsort((ids, -scores))[:limit]
+        return [(ids[i].item(), float(scores[i])) for i in order]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "stations": len(self),
+            "trigrams": len(self._base.postings),
+            "delta_stations": len(self._delta_docs),
+        }
+
+
+def get_station_search(request: Request) -> Optional[StationSearchIndex]:
+    """FastAPI dependency returning the station search index once built, else None (query the database)."""
+    index = getattr(request.app.state, "station_search", None)
+    return index if index is not None and index.ready else None
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from fastapi import Request
+
+# Add parent directory to path to access db module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from db.query_stats import track_queries
+from db.station_stats import StatsKey, count_stations, diff_stats, station_stats_keys, summarize_station_stats
+
+logger = logging.getLogger(__name__)
+
+
+class StationStatistics:
+    """Station statistics kept in process and updated from StationCatalog changes.
+
+    Holds the same (dimension, value) counts as the station_stats table, plus
+    which keys each station counts towards, so a changed station only moves
+    its own counts. ``summary()`` is a dict build over a few hundred counts.
+
+    A background job re-derives everything every ``verify_interval`` seconds:
+    the in-process counts against the catalog, and station_stats against a
+    full aggregation of the stations table. Drift is logged and repaired.
+    """
+
+    def __init__(self, manager, verify_interval: float = 3600.0):
+        self.manager = manager
+        self.verify_interval = verify_interval
+        self.ready = False
+        self.last_verified: Optional[float] = None
+        self.last_drift: Dict[str, int] = {}
+        self.last_error: Optional[str] = None
+        self._catalog = None
+        self._counts: Counter = Counter()
+        self._keys: Dict[Any, List[StatsKey]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def attach(self, catalog) -> None:
+        """Follow a StationCatalog: recount on its first load, then apply each change."""
+        self._catalog = catalog
+
+        def on_change(upserted: List[tuple], removed: List[Any]) -> None:
+            if not self.ready:
+                self.reset(catalog.stations)
+            else:
+                self.update(upserted, removed)
+        catalog.add_listener(on_change)
+
+    # --- maintenance ---
+    def reset(self, stations) -> None:
+        """Recount from scratch."""
+        keys = {station.id: station_stats_keys(station) for station in stations}
+        counts = Counter(key for station_keys in keys.values() for key in station_keys)
+        with self._lock:
+            self._keys, self._counts = keys, counts
+            self.ready = True
+
+    def update(self, upserted, removed=()) -> None:
+        """Move the counts of changed and deleted stations."""
+        with self._lock:
+            for station_id in removed:
+                self._counts.subtract(self._keys.pop(station_id, ()))
+            for station in upserted:
+                self._counts.subtract(self._keys.get(station.id, ()))
+                self._keys[station.id] = station_stats_keys(station)
+                self._counts.update(self._keys[station.id])
+
+    # --- reads ---
+    def counts(self) -> Dict[StatsKey, int]:
+        with self._lock:
+            return {key: n for key, n in self._counts.items() if n}
+
+    def summary(self) -> Dict[str, Any]:
+        return summarize_station_stats(self.counts())
+
+    # --- verification ---
+    def verify(self) -> Dict[str, int]:
+        """Check both copies of the statistics against a recount and repair any drift.
+
+        Blocking; returns how many keys were off in each copy.
+        """
+        drift = {"in_process": 0, "warehouse": 0}
+        if self._catalog is not None and self._catalog.ready:
+            stations = self._catalog.stations
+            off = diff_stats(count_stations(stations), self.counts())
+            if off:
+                logger.warning(f"In-process station statistics drifted on {len(off)} keys; recounting")
+                self.reset(stations)
+            drift["in_process"] = len(off)
+
+        expected = self.manager.compute_station_stats()
+        off = diff_stats(expected, self.manager.get_station_stats())
+        if off:
+            logger.warning(f"station_stats drifted on {len(off)} keys, e.g. {sorted(off.items())[:5]}; rebuilding")
+            self.manager.rebuild_station_stats(expected)
+        drift["warehouse"] = len(off)
+        return drift
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # The first pass also materializes station_stats for tables created before it existed
+        while True:
+            try:
+                with track_queries("ev-api:station-stats"):
+                    self.last_drift = await self.manager.arun(self.verify, workload='analytics')
+                self.last_verified = time.time()
+                self.last_error = None
+            except Exception as e:
+                logger.warning(f"Station statistics verification failed: {e!r}")
+                self.last_error = repr(e)
+            await asyncio.sleep(self.verify_interval)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "keys": len(self.counts()),
+            "last_verified": self.last_verified,
+            "last_drift": self.last_drift,
+            "last_error": self.last_error,
+        }
+
+
+def get_station_stats(request: Request) -> Optional[StationStatistics]:
+    """FastAPI dependency returning the in-process statistics once counted, else None (read station_stats)."""
+    stats = getattr(request.app.state, "station_stats", None)
+    return stats if stats is not None and stats.ready else None
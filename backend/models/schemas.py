@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class Station(BaseModel):
@@ -20,6 +20,33 @@ class NearbyStation(BaseModel):
     distance_km: float
     travel_time_minutes: int
     source: str  # "snowflake" or "ocm"
+    ocm_id: Optional[int] = None
+
+class SourceStatus(BaseModel):
+    status: str  # "ok", "timeout", "error", "unavailable" or "skipped"
+    elapsed_ms: Optional[float] = None
+    results: int = 0
+
+class NearbyStationsResponse(BaseModel):
+    stations: List[NearbyStation]
+    sources: Dict[str, SourceStatus]
+    sources_answered: List[str]
+
+class NearbyQuery(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    radius: float = Field(10, gt=0, le=500)
+    limit: int = Field(5, ge=1, le=100)
+    id: Optional[str] = Field(None, max_length=100)  # caller's reference, e.g. a vehicle id; echoed back
+
+class NearbyBatchRequest(BaseModel):
+    queries: List[NearbyQuery] = Field(..., min_length=1, max_length=1000)
+
+class AlongRouteRequest(BaseModel):
+    polyline: str = Field(..., min_length=2)  # encoded polyline of the route
+    width_km: float = Field(2, gt=0, le=50)  # corridor half-width either side of the route
+    limit: int = Field(100, ge=1, le=1000)
+    precision: int = Field(5, ge=5, le=6)  # 5 for Google, 6 for OSRM/Valhalla polylines
 
 class UserSession(BaseModel):
     user_id: int
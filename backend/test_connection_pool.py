@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from db.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query):
+        if self.conn.broken:
+            raise RuntimeError("connection reset")
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(connect, **kwargs), created
+
+
+def test_connections_are_reused():
+    pool, created = make_pool(max_size=2)
+    for _ in range(5):
+        with pool.connection():
+            pass
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats["checkouts"] == 5
+    assert stats["idle"] == 1 and stats["in_use"] == 0
+
+
+def test_pool_is_bounded_and_times_out():
+    pool, _ = make_pool(max_size=1, checkout_timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+    # A waiter is woken up as soon as the connection comes back
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=2)))
+    waiter.start()
+    pool.release(conn)
+    waiter.join()
+    assert got == [conn]
+    assert pool.stats()["waits"] == 1
+
+
+def test_unhealthy_connection_is_replaced_on_checkout():
+    pool, created = make_pool(max_size=1, health_check_interval=0)
+    with pool.connection() as conn:
+        pass
+    conn.broken = True
+    with pool.connection() as replacement:
+        assert replacement is not conn
+    assert conn.closed
+    assert len(created) == 2
+    assert pool.stats()["health_check_failures"] == 1
+
+
+def test_idle_connections_are_evicted():
+    pool, _ = make_pool(max_size=2, max_idle_seconds=0)
+    with pool.connection() as conn:
+        pass
+    assert pool.evict_idle() == 1
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+
+
+def test_evicted_connections_are_closed_outside_the_lock():
+    pool, _ = make_pool(max_size=2, max_idle_seconds=0)
+    with pool.connection() as conn:
+        pass
+    closing, unblock = threading.Event(), threading.Event()
+
+    def slow_close():
+        closing.set()
+        unblock.wait(2)
+        conn.closed = True
+
+    conn.close = slow_close
+    evictor = threading.Thread(target=pool.evict_idle)
+    evictor.start()
+    assert closing.wait(2)
+    # The pool stays usable while the evicted connection is still closing
+    other = pool.acquire(timeout=1)
+    pool.release(other)
+    assert pool.stats()["idle"] == 1
+    unblock.set()
+    evictor.join()
+    assert conn.closed
+
+
+def test_closed_connection_is_not_returned_to_pool():
+    pool, _ = make_pool(max_size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.close()
+            raise RuntimeError("boom")
+    assert pool.stats()["size"] == 0
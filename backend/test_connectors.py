@@ -0,0 +1,85 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from core.station_catalog import StationCatalog
+from db.connectors import (CONNECTOR_BITS, StationFilter, connector_names, connector_type, mask_from_energy_type,
+                           parse_connectors, summarize_connections)
+from db.local_backend import LocalManager
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("CCS (Type 2)", "ccs"),
+    ("Type 2 (Socket Only)", "type2"),
+    ("Type 1 (J1772)", "type1"),
+    ("CHAdeMO", "chademo"),
+    ("NACS / Tesla Supercharger", "tesla"),
+    ("GB-T DC - GB/T 20234.3", "gbt"),
+    ("Bharat DC-001", "bharat_dc"),
+    ("BS1363 3 Pin 13 Amp", "domestic"),
+    ("Type I (AS 3112)", "domestic"),
+    ("Something New", "other"),
+    ("Unknown", None),
+    (None, None),
+])
+def test_connector_type(title, expected):
+    assert connector_type(title) == expected
+
+
+def test_summarize_connections():
+    summary = summarize_connections([
+        {"ConnectionType": {"Title": "CCS (Type 2)"}, "PowerKW": 60},
+        {"ConnectionType": {"Title": "Type 2 (Socket Only)"}, "Amps": 32, "Voltage": 400},
+        {"ConnectionType": {"Title": "CCS (Type 2)"}, "PowerKW": 150.0},
+    ])
+    assert summary.energy_type == "CCS (Type 2), Type 2 (Socket Only)"
+    assert connector_names(summary.connector_mask) == ["ccs", "type2"]
+    assert summary.max_power_kw == 150.0
+    assert summarize_connections([]) == ("Unknown", 0, None)
+    assert mask_from_energy_type(summary.energy_type) == summary.connector_mask
+
+
+def test_parse_connectors():
+    assert parse_connectors(["ccs,CHAdeMO", "Type 2 (Tethered Connector)", "bharat ac"]) == (
+        CONNECTOR_BITS["ccs"] | CONNECTOR_BITS["chademo"] | CONNECTOR_BITS["type2"] | CONNECTOR_BITS["bharat_ac"])
+    assert parse_connectors([]) == 0
+    with pytest.raises(ValueError):
+        parse_connectors(["warp drive"])
+
+
+def test_catalog_filters_match_row_by_row_filtering():
+    rng = np.random.default_rng(3)
+    types = ["CCS (Type 2)", "CHAdeMO", "Type 2 (Socket Only)", "Bharat DC-001", "Type 1 (J1772)"]
+    stations = []
+    for i in range(400):
+        titles = list(rng.choice(types, size=int(rng.integers(1, 3)), replace=False))
+        summary = summarize_connections([{"ConnectionType": {"Title": t}, "PowerKW": float(rng.choice([7.4, 22, 50, 150]))}
+                                         for t in titles])
+        station = {"ocm_id": i, "name": f"Station {i}", "latitude": float(rng.uniform(10.9, 11.1)),
+                   "longitude": float(rng.uniform(76.9, 77.1)), "energy_type": summary.energy_type,
+                   "connector_mask": summary.connector_mask, "max_power_kw": summary.max_power_kw}
+        if i % 5 == 0:
+            # Rows ingested before the connector columns existed
+            station.update(connector_mask=None, max_power_kw=None)
+        stations.append(station)
+
+    manager = LocalManager(":memory:")
+    manager.upsert_stations(stations)
+    manager.execute_query("UPDATE stations SET available = FALSE WHERE ocm_id % 3 = 0")
+    catalog = StationCatalog(manager)
+    catalog.load()
+
+    for station_filter in [StationFilter(parse_connectors(["ccs"])),
+                           StationFilter(parse_connectors(["chademo", "bharat_dc"]), min_power_kw=50),
+                           StationFilter(available_only=True),
+                           StationFilter(parse_connectors(["type1"]), 22, True)]:
+        found = catalog.nearby(11.0, 77.0, 8, station_filter=station_filter)
+        expected = sorted((distance, station.id) for station, distance in catalog.nearby(11.0, 77.0, 8)
+                          if station_filter.matches_row(station))
+        assert [station.id for station, _ in found] == [station_id for _, station_id in expected]
+        assert found and all(station_filter.matches_row(station) for station, _ in found)
+        assert [s.id for s, _ in catalog.nearby(11.0, 77.0, 8, limit=3, station_filter=station_filter)] == \
+            [station_id for _, station_id in expected[:3]]
+    manager.close()
@@ -0,0 +1,53 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app import app
+from core.database import DatabaseHealthProbe
+
+
+class FakeManager:
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.pings = 0
+
+    async def arun(self, func, *args, workload="interactive", **kwargs):
+        return func(*args, **kwargs)
+
+    def ping(self):
+        self.pings += 1
+        if not self.healthy:
+            raise RuntimeError("warehouse unreachable")
+
+
+def test_probe_caches_availability():
+    manager = FakeManager()
+    probe = DatabaseHealthProbe(manager, interval=60)
+    assert asyncio.run(probe.check()) is True
+    assert probe.available and probe.last_error is None
+
+    manager.healthy = False
+    assert asyncio.run(probe.check()) is False
+    assert not probe.available
+    assert "warehouse unreachable" in probe.last_error
+    assert manager.pings == 2
+
+
+def test_probe_without_manager_is_unavailable():
+    probe = DatabaseHealthProbe(None)
+    assert asyncio.run(probe.check()) is False
+
+
+def test_requests_use_app_scoped_manager():
+    with TestClient(app) as client:
+        manager = FakeManager()
+        app.state.snowflake_manager = manager
+        app.state.db_health.manager = manager
+        app.state.db_health.available = False
+        assert client.get("/stations/count").status_code == 503
+
+        # Handlers only read the cached probe result; they never ping themselves
+        app.state.db_health.available = True
+        manager.get_station_count = lambda: 42
+        response = client.get("/stations/count")
+        assert response.status_code == 200
+        assert response.json()["count"] == 42
+        assert manager.pings == 0
@@ -0,0 +1,69 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from db.geo import (bounding_box, bounding_boxes, decode_polyline, encode_polyline, geohash_bounds, geohash_encode, geohashes_in_box, haversine_km,
+                    haversine_km_array, haversine_matrix_km)
+
+
+def test_bounding_box_contains_radius():
+    min_lat, max_lat, min_lon, max_lon = bounding_box(11.0, 77.0, 10)
+    assert haversine_km(11.0, 77.0, max_lat, 77.0) == pytest.approx(10, rel=1e-3)
+    assert haversine_km(11.0, 77.0, 11.0, max_lon) >= 10
+    assert min_lat < 11.0 < max_lat and min_lon < 77.0 < max_lon
+
+
+def test_bounding_box_widens_at_poles_and_antimeridian():
+    assert bounding_box(89.95, 10.0, 20)[2:] == (-180.0, 180.0)
+    assert bounding_box(0.0, 179.99, 5)[2:] == (-180.0, 180.0)
+
+
+def test_bounding_boxes_match_scalar():
+    points = [(11.0, 77.0, 10), (89.95, 10.0, 20), (0.0, 179.99, 5), (-45.0, -120.0, 300), (90.0, 0.0, 1)]
+    boxes = np.column_stack(bounding_boxes(*zip(*points)))
+    assert boxes == pytest.approx(np.array([bounding_box(*point) for point in points]))
+
+
+def test_vectorized_haversine_matches_scalar():
+    rng = np.random.default_rng(3)
+    lats1, lons1 = rng.uniform(-80, 80, 500), rng.uniform(-180, 180, 500)
+    lats2, lons2 = rng.uniform(-80, 80, 500), rng.uniform(-180, 180, 500)
+    expected = [haversine_km(a, b, c, d) for a, b, c, d in zip(lats1, lons1, lats2, lons2)]
+
+    assert haversine_km_array(lats1, lons1, lats2, lons2) == pytest.approx(expected, rel=1e-9)
+    single32 = haversine_km_array(lats1, lons1, lats2, lons2, float32=True)
+    assert single32.dtype == np.float32
+    assert single32 == pytest.approx(expected, abs=0.05)
+
+    # One origin broadcast against many destinations, and the full matrix
+    assert haversine_km_array(lats1[0], lons1[0], lats2, lons2)[7] == pytest.approx(
+        haversine_km(lats1[0], lons1[0], lats2[7], lons2[7]))
+    matrix = haversine_matrix_km(lats1[:3], lons1[:3], lats2, lons2)
+    assert matrix.shape == (3, 500)
+    assert matrix[2, 9] == pytest.approx(haversine_km(lats1[2], lons1[2], lats2[9], lons2[9]))
+    assert haversine_km_array(0.0, 0.0, 0.0, 180.0) == pytest.approx(20015.09, abs=0.01)
+
+
+def test_geohash_encode_and_bounds():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    min_lat, max_lat, min_lon, max_lon = geohash_bounds("u4pruydqqvj")
+    assert min_lat <= 57.64911 <= max_lat and min_lon <= 10.40744 <= max_lon
+
+
+def test_geohashes_in_box_cover_every_point():
+    box = bounding_box(11.0, 77.0, 10)
+    cells = set(geohashes_in_box(*box, 4))
+    rng = np.random.default_rng(5)
+    for lat, lon in zip(rng.uniform(box[0], box[1], 200), rng.uniform(box[2], box[3], 200)):
+        assert geohash_encode(lat, lon, 4) in cells
+
+
+def test_polyline_round_trip():
+    # The example from Google's polyline format documentation
+    assert decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@") == [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    route = [(11.016844, 76.955833), (11.0168, 76.96), (-33.86882, 151.209296)]
+    assert decode_polyline(encode_polyline(route, 6), 6) == route
+    with pytest.raises(ValueError):
+        decode_polyline("_p~iF~ps|U_")
@@ -0,0 +1,439 @@
+import os
+import sys
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from db.local_backend import LocalManager, translate_sql
+
+
+@pytest.fixture
+def manager():
+    manager = LocalManager(":memory:")
+    yield manager
+    manager.close()
+
+
+def test_translates_snowflake_dialect():
+    sql = translate_sql("SELECT TO_DATE(created_at) FROM users WHERE created_at >= DATEADD(day, -7, CURRENT_DATE()) AND id = %s")
+    assert sql == "SELECT date(created_at) FROM users WHERE created_at >= datetime(CURRENT_DATE, '-7 day') AND id = ?"
+    assert "INTEGER PRIMARY KEY AUTOINCREMENT" in translate_sql("id INTEGER AUTOINCREMENT PRIMARY KEY, t TIMESTAMP_NTZ")
+
+    merge = translate_sql("""
+        MERGE INTO user_locations AS t
+        USING (SELECT %s AS user_id, %s AS latitude) AS s
+        ON t.user_id = s.user_id
+        WHEN MATCHED THEN UPDATE SET latitude = s.latitude
+        WHEN NOT MATCHED THEN INSERT (user_id, latitude) VALUES (s.user_id, s.latitude)
+    """)
+    assert merge.startswith("INSERT INTO user_locations (user_id, latitude) SELECT s.user_id, s.latitude")
+    assert "ON CONFLICT(user_id) DO UPDATE SET latitude = excluded.latitude" in merge
+
+
+def test_station_queries(manager):
+    manager.insert_stations_batch([
+        {"id": i, "ocm_id": 500 + i, "name": f"Station {i}", "latitude": 11.0 + i * 0.01,
+         "longitude": 77.0, "energy_type": "CCS"}
+        for i in range(10)
+    ])
+    assert manager.get_station_count() == 10
+    nearby = manager.get_stations_by_location(11.0, 77.0, 3)
+    assert [station["id"] for station in nearby] == [0, 1, 2]
+    assert nearby[1]["distance_km"] == pytest.approx(1.11, abs=0.01)
+
+    # Streamed keyset batches release the pooled connection between batches
+    batches = manager.iter_stations(batch_size=4)
+    assert [station["id"] for station in next(batches)] == [0, 1, 2, 3]
+    assert manager.pool_stats()["in_use"] == 0
+    assert [len(batch) for batch in batches] == [4, 2]
+    assert [len(batch) for batch in manager.iter_stations(batch_size=4, after_id=1, limit=5)] == [4, 1]
+
+
+def test_bulk_load_rejects_bad_rows_without_aborting(manager):
+    stations = [
+        {"id": i, "ocm_id": i, "name": f"Station {i}", "latitude": 10.0, "longitude": 77.0}
+        for i in range(100)
+    ]
+    stations.append({"id": 200, "ocm_id": 200, "name": "No coordinates", "latitude": None, "longitude": 77.0})
+    stations.append({"id": 5, "ocm_id": 5, "name": "Duplicate id", "latitude": 10.0, "longitude": 77.0})
+
+    report = manager.bulk_load_stations(stations)
+    assert report["rows_loaded"] == 100
+    assert report["rows_rejected"] == 2
+    assert report["rejected"][0] == {"ocm_id": 200, "error": "non-numeric coordinates"}
+    assert report["rejected"][1] == {"ocm_id": 5, "error": "conflicts with an existing id or ocm_id"}
+    assert manager.get_station_count() == 100
+
+
+def test_upsert_stations_is_idempotent(manager):
+    stations = [
+        {"ocm_id": 700 + i, "name": f"Station {i}", "latitude": 10.0 + i * 0.01, "longitude": 77.0, "energy_type": "CCS"}
+        for i in range(20)
+    ]
+    report = manager.upsert_stations(stations)
+    assert (report["inserted"], report["updated"], report["unchanged"]) == (20, 0, 0)
+    ids = {row["ocm_id"]: row["id"] for row in manager.execute_query("SELECT id, ocm_id FROM stations")}
+
+    report = manager.upsert_stations(stations + [{"name": "No key", "latitude": 10.0, "longitude": 77.0}])
+    assert (report["inserted"], report["updated"], report["unchanged"]) == (0, 0, 20)
+    assert report["rows_rejected"] == 1
+
+    stations[3] = dict(stations[3], name="Renamed")
+    report = manager.upsert_stations(stations + [{"ocm_id": 999, "name": "New", "latitude": 11.0, "longitude": 77.0}])
+    assert (report["inserted"], report["updated"], report["unchanged"]) == (1, 1, 19)
+
+    rows = manager.execute_query("SELECT id, ocm_id, name FROM stations")
+    assert len(rows) == 21
+    assert all(ids[row["ocm_id"]] == row["id"] for row in rows if row["ocm_id"] != 999)
+    assert next(row["name"] for row in rows if row["ocm_id"] == 703) == "Renamed"
+
+
+def test_user_location_upsert_and_sessions(manager):
+    user = manager.create_user("driver@example.com", "hash", "Ada", "Lovelace", "EV")
+    manager.upsert_user_location(user["id"], 11.0, 77.0, message="first")
+    manager.upsert_user_location(user["id"], 11.01, 77.0, message="moved")
+    users = manager.get_nearby_users(11.0, 77.0, 5)
+    assert len(users) == 1 and users[0]["message"] == "moved"
+
+    assert manager.log_session(user["id"], 1, "2024-01-01 10:00:00", "2024-01-01 11:00:00", 12.5, 4.0)
+    assert manager.get_user_sessions(user["id"])[0]["energy_consumed_kwh"] == 12.5
+
+
+def test_api_runs_on_local_backend(monkeypatch):
+    import db.snowflake_connector as connector
+    from app import app
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("LOCAL_DB_PATH", ":memory:")
+    monkeypatch.setattr(connector, "snowflake_manager", None)
+    with TestClient(app) as client:
+        assert client.get("/health").json()["database"]["available"] is True
+        assert client.get("/stations/count").json()["count"] == 0
+        assert client.get("/admin/analytics/user-growth").status_code == 200
+
+        response = client.get("/stations/count")
+        assert response.headers["X-DB-Query-Count"] == "1"
+        assert float(response.headers["X-DB-Time-Ms"]) >= 0
+        assert response.headers["Server-Timing"].startswith("db;dur=")
+
+        metrics = client.get("/metrics").json()
+        assert metrics["routes"]["GET /stations/count"]["queries"] >= 2
+        assert metrics["queries"]["ev-api:GET /stations/count"]["rows"] >= 2
+        assert metrics["pool"]["name"] == "sqlite"
+
+        # /stations/nearby answers from the station catalog once it is loaded
+        app.state.snowflake_manager.upsert_stations([
+            {"ocm_id": 1, "name": "Catalog Station", "latitude": 11.0, "longitude": 77.0, "energy_type": "CCS"}])
+        app.state.station_catalog.load()
+        response = client.get("/stations/nearby", params={"lat": 11.001, "lon": 77.0, "use_ocm": False})
+        assert [station["name"] for station in response.json()["stations"]] == ["Catalog Station"]
+        assert response.json()["sources_answered"] == ["snowflake"]
+        assert response.json()["sources"]["ocm"]["status"] == "skipped"
+        assert response.headers["X-DB-Query-Count"] == "0"
+
+        # /stations/search answers from the trigram index, tolerating typos
+        response = client.get("/stations/search", params={"query": "catalgo"})
+        assert [station["name"] for station in response.json()] == ["Catalog Station"]
+        assert response.headers["X-DB-Query-Count"] == "0"
+
+        response = client.get("/stations/autocomplete", params={"prefix": "stat"})
+        assert [s["station_id"] for s in response.json()["suggestions"]] == [app.state.station_catalog.stations[0].id]
+
+        # /stations/statistics answers from the in-process counts
+        response = client.get("/stations/statistics")
+        assert response.json()["total_stations"] == 1
+        assert response.json()["by_energy_type"] == [{"energy_type": "CCS", "count": 1}]
+        assert response.headers["X-DB-Query-Count"] == "0"
+
+
+def test_nearby_returns_sources_that_answer_before_their_deadline(monkeypatch):
+    import asyncio
+    import time
+    import httpx
+    import db.snowflake_connector as connector
+    from app import app
+    from core.config import settings
+
+    async def slow_ocm(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=[])
+
+    async def fast_ocm(request):
+        return httpx.Response(200, json=[
+            {"ID": 42, "AddressInfo": {"Title": "OCM Station", "Latitude": 11.002, "Longitude": 77.0},
+             "Connections": [{"ConnectionType": {"Title": "CCS"}}]},
+            {"ID": 43, "AddressInfo": {"Title": "Too far", "Latitude": 12.0, "Longitude": 77.0}},
+        ])
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("LOCAL_DB_PATH", ":memory:")
+    monkeypatch.setenv("OCM_API_KEY", "test-key")
+    monkeypatch.setattr(connector, "snowflake_manager", None)
+    monkeypatch.setattr(settings, "NEARBY_OCM_DEADLINE_SECONDS", 0.2)
+    params = {"lat": 11.0, "lon": 77.0, "radius": 5}
+    with TestClient(app) as client:
+        app.state.http_client = httpx.AsyncClient(transport=httpx.MockTransport(slow_ocm))
+        started = time.perf_counter()
+        body = client.get("/stations/nearby", params=params).json()
+        assert time.perf_counter() - started < 0.9
+        assert body["sources"]["ocm"]["status"] == "timeout"
+        assert body["sources_answered"] == ["snowflake"]
+
+        app.state.http_client = httpx.AsyncClient(transport=httpx.MockTransport(fast_ocm))
+        app.state.ocm_cache.clear()
+        body = client.get("/stations/nearby", params=params).json()
+        assert body["sources_answered"] == ["snowflake", "ocm"]
+        assert [(station["id"], station["source"]) for station in body["stations"]] == [("ocm_42", "ocm")]
+        assert client.get("/stations/nearby", params=dict(params, connector="chademo")).json()["stations"] == []
+
+        # Once ingested, the OCM copy of a station is dropped in favour of ours
+        app.state.snowflake_manager.upsert_stations([
+            {"ocm_id": 42, "name": "OCM Station", "latitude": 11.002, "longitude": 77.0, "energy_type": "CCS"}])
+        app.state.station_catalog.load()
+        body = client.get("/stations/nearby", params=params).json()
+        assert [(station["source"], station["ocm_id"]) for station in body["stations"]] == [("snowflake", 42)]
+
+
+@pytest.mark.parametrize("use_catalog", [False, True])
+def test_nearby_filters_by_connector_power_and_availability(monkeypatch, use_catalog):
+    import db.snowflake_connector as connector
+    from app import app
+    from core.config import settings
+    from db.connectors import summarize_connections
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("LOCAL_DB_PATH", ":memory:")
+    monkeypatch.setattr(connector, "snowflake_manager", None)
+    monkeypatch.setattr(settings, "STATION_CATALOG_ENABLED", use_catalog)
+    connections = [[("CCS (Type 2)", 60)], [("Type 2 (Socket Only)", 22)], [("CHAdeMO", 50), ("CCS (Type 2)", 150)]]
+    with TestClient(app) as client:
+        manager = app.state.snowflake_manager
+        manager.upsert_stations([
+            dict(zip(("energy_type", "connector_mask", "max_power_kw"), summarize_connections(
+                [{"ConnectionType": {"Title": title}, "PowerKW": kw} for title, kw in station])),
+                 ocm_id=i, name=f"Station {i}", latitude=11.0 + i * 0.01, longitude=77.0)
+            for i, station in enumerate(connections)
+        ] + [{"ocm_id": 3, "name": "Legacy", "latitude": 11.03, "longitude": 77.0, "energy_type": "Type 2, CCS"}])
+        manager.execute_query("UPDATE stations SET available = FALSE WHERE ocm_id = 0")
+        if use_catalog:
+            app.state.station_catalog.load()
+
+        def names(**filters):
+            response = client.get("/stations/nearby", params=dict(
+                {"lat": 11.0, "lon": 77.0, "radius": 10, "limit": 10, "use_ocm": False}, **filters))
+            assert response.status_code == 200
+            return [station["name"] for station in response.json()["stations"]]
+
+        assert names() == ["Station 0", "Station 1", "Station 2", "Legacy"]
+        assert names(connector="ccs") == ["Station 0", "Station 2", "Legacy"]
+        assert names(connector=["chademo", "type2"]) == ["Station 1", "Station 2", "Legacy"]
+        assert names(connector="ccs", min_power_kw=100) == ["Station 2"]
+        assert names(connector="ccs", available_only=True, limit=1) == ["Station 2"]
+        assert client.get("/stations/nearby", params={"lat": 11.0, "lon": 77.0, "connector": "warp"}).status_code == 400
+
+
+@pytest.mark.parametrize("use_catalog", [False, True])
+def test_station_pages_stream_compress_and_revalidate(monkeypatch, use_catalog):
+    import json
+    import api.stations as stations_api
+    import db.snowflake_connector as connector
+    from app import app
+    from core.config import settings
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("LOCAL_DB_PATH", ":memory:")
+    monkeypatch.setattr(connector, "snowflake_manager", None)
+    monkeypatch.setattr(settings, "STATION_CATALOG_ENABLED", use_catalog)
+    # Several batches per stream
+    monkeypatch.setattr(stations_api, "STATIONS_STREAM_BATCH", 10)
+    with TestClient(app) as client:
+        app.state.snowflake_manager.upsert_stations([
+            {"ocm_id": i, "name": f"Station {i}", "latitude": 11.0 + i * 0.001, "longitude": 77.0,
+             "energy_type": "CCS", "available": True} for i in range(1, 26)])
+        if use_catalog:
+            app.state.station_catalog.load()
+
+        # Keyset pages chain through Link headers and together cover every station once
+        ids, url = [], "/stations/?limit=10"
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            ids += [station["id"] for station in response.json()]
+            url = response.links.get("next", {}).get("url")
+        assert len(ids) == 25 and ids == sorted(ids)
+
+        response = client.get("/stations/", params={"format": "ndjson"}, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        lines = response.text.splitlines()
+        assert [json.loads(line)["id"] for line in lines] == ids
+
+        response = client.get("/stations/", params={"format": "geojson", "after_id": ids[19]})
+        features = response.json()["features"]
+        assert [feature["id"] for feature in features] == ids[20:]
+        assert features[0]["geometry"]["coordinates"] == [77.0, pytest.approx(11.021)]
+
+        response = client.get("/stations/", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip" and len(response.json()) == 25
+        etag = response.headers["etag"]
+        assert client.get("/stations/", headers={"If-None-Match": etag}).status_code == 304
+
+        app.state.snowflake_manager.upsert_stations([
+            {"ocm_id": 1, "name": "Renamed", "latitude": 11.001, "longitude": 77.0, "energy_type": "CCS"}])
+        if use_catalog:
+            app.state.station_catalog.refresh()
+        response = client.get("/stations/", headers={"If-None-Match": etag})
+        assert response.status_code == 200 and response.json()[0]["name"] == "Renamed"
+
+
+@pytest.mark.parametrize("use_catalog", [False, True])
+def test_nearby_batch_answers_every_query_in_order(monkeypatch, use_catalog):
+    import json
+    import db.snowflake_connector as connector
+    from app import app
+    from core.config import settings
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("LOCAL_DB_PATH", ":memory:")
+    monkeypatch.setattr(connector, "snowflake_manager", None)
+    monkeypatch.setattr(settings, "STATION_CATALOG_ENABLED", use_catalog)
+    with TestClient(app) as client:
+        app.state.snowflake_manager.upsert_stations([
+            {"ocm_id": i, "name": f"Station {i}", "latitude": 11.0 + i * 0.01, "longitude": 77.0,
+             "energy_type": "CCS"} for i in range(10)])
+        if use_catalog:
+            app.state.station_catalog.load()
+
+        queries = [{"lat": 11.0, "lon": 77.0, "radius": 3, "limit": 2, "id": "bus-1"},
+                   {"lat": 11.05, "lon": 77.0, "radius": 1.5},
+                   {"lat": 40.0, "lon": -74.0}]
+        response = client.post("/stations/nearby/batch", json={"queries": queries})
+        assert response.status_code == 200
+        assert response.headers["X-DB-Query-Count"] == ("0" if use_catalog else "1")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [(line["index"], line["id"]) for line in lines] == [(0, "bus-1"), (1, None), (2, None)]
+        assert [station["name"] for station in lines[0]["stations"]] == ["Station 0", "Station 1"]
+        assert [station["name"] for station in lines[1]["stations"]][0] == "Station 5"
+        assert len(lines[1]["stations"]) == 3 and lines[2]["stations"] == []
+        assert lines[0]["stations"][1]["distance_km"] == pytest.approx(1.11, abs=0.01)
+
+        assert client.post("/stations/nearby/batch", json={"queries": []}).status_code == 422
+
+
+@pytest.mark.parametrize("use_catalog", [False, True])
+def test_stations_along_route_in_route_order(monkeypatch, use_catalog):
+    import db.snowflake_connector as connector
+    from app import app
+    from core.config import settings
+    from db.geo import encode_polyline
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("LOCAL_DB_PATH", ":memory:")
+    monkeypatch.setattr(connector, "snowflake_manager", None)
+    monkeypatch.setattr(settings, "STATION_CATALOG_ENABLED", use_catalog)
+    with TestClient(app) as client:
+        # An L-shaped route north from (11.0, 77.0), then east; stations beside it, and one 5 km off
+        app.state.snowflake_manager.upsert_stations([
+            {"ocm_id": 1, "name": "East leg", "latitude": 11.205, "longitude": 77.15, "energy_type": "CCS"},
+            {"ocm_id": 2, "name": "Start", "latitude": 11.0, "longitude": 77.001, "energy_type": "CCS"},
+            {"ocm_id": 3, "name": "Corner", "latitude": 11.2, "longitude": 76.995, "energy_type": "CCS"},
+            {"ocm_id": 4, "name": "Far", "latitude": 11.1, "longitude": 77.05, "energy_type": "CCS"},
+        ])
+        if use_catalog:
+            app.state.station_catalog.load()
+
+        polyline = encode_polyline([(11.0, 77.0), (11.1, 77.0), (11.2, 77.0), (11.2, 77.2)])
+        body = client.get("/stations/along-route", params={"polyline": polyline, "width_km": 2}).json()
+        assert body["vertices"] == 4 and body["route_length_km"] == pytest.approx(22.2 + 21.8, abs=0.3)
+        assert [station["name"] for station in body["stations"]] == ["Start", "Corner", "East leg"]
+        east = body["stations"][2]
+        assert east["distance_from_route_km"] == pytest.approx(0.556, abs=0.01)
+        assert east["along_route_km"] == pytest.approx(22.24 + 16.35, abs=0.2)
+
+        response = client.post("/stations/along-route", json={"polyline": polyline, "width_km": 6, "limit": 3})
+        assert [station["name"] for station in response.json()["stations"]] == ["Start", "Far", "Corner"]
+        assert client.get("/stations/along-route", params={"polyline": "~~"}).status_code == 400
+
+
+@pytest.mark.parametrize("use_catalog", [False, True])
+def test_station_clusters_for_a_map_view(monkeypatch, use_catalog):
+    import db.snowflake_connector as connector
+    from app import app
+    from core.config import settings
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("LOCAL_DB_PATH", ":memory:")
+    monkeypatch.setattr(connector, "snowflake_manager", None)
+    monkeypatch.setattr(settings, "STATION_CATALOG_ENABLED", use_catalog)
+    with TestClient(app) as client:
+        # Nine stations around Coimbatore, one in Chennai
+        app.state.snowflake_manager.upsert_stations(
+            [{"ocm_id": i, "name": f"Coimbatore {i}", "latitude": 11.0 + i * 0.002, "longitude": 76.96,
+              "energy_type": "CCS"} for i in range(9)]
+            + [{"ocm_id": 9, "name": "Chennai", "latitude": 13.08, "longitude": 80.27, "energy_type": "Type 2"}])
+        if use_catalog:
+            app.state.station_catalog.load()
+
+        body = client.get("/stations/clusters", params={"bbox": "76,8,81,14", "zoom": 6}).json()
+        assert body["stations"] == 10
+        assert [(c["count"], c.get("name")) for c in body["clusters"]] == [(9, None), (1, "Chennai")]
+        assert body["clusters"][0]["lat"] == pytest.approx(11.008)
+
+        body = client.get("/stations/clusters", params={"bbox": "76.9,10.9,77.0,11.1", "zoom": 18}).json()
+        assert body["zoom"] == 16 and len(body["clusters"]) == 9
+        assert {c["name"] for c in body["clusters"]} == {f"Coimbatore {i}" for i in range(9)}
+
+        if use_catalog:
+            app.state.snowflake_manager.upsert_stations([
+                {"ocm_id": 9, "name": "Chennai", "latitude": 11.0, "longitude": 76.962, "energy_type": "Type 2"}])
+            app.state.station_catalog.refresh()
+            body = client.get("/stations/clusters", params={"bbox": "76,8,81,14", "zoom": 6}).json()
+            assert [c["count"] for c in body["clusters"]] == [10]
+
+        assert client.get("/stations/clusters", params={"bbox": "76,8,81", "zoom": 6}).status_code == 400
+        assert client.get("/stations/clusters", params={"bbox": "-180,-85,180,85", "zoom": 15}).status_code == 400
+
+
+def test_compression_negotiation():
+    from core.compression import compress_bytes, compress_stream, negotiate_encoding
+    import gzip
+
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding(None) is None
+    data = b"station," * 1000
+    assert gzip.decompress(compress_bytes(data, "gzip")) == data
+    assert gzip.decompress(b"".join(compress_stream([data[:100], data[100:]], "gzip"))) == data
+
+
+def test_queries_are_tracked_across_executor_threads(manager):
+    import asyncio
+    from db.query_stats import query_metrics, track_queries
+
+    async def run():
+        with track_queries("test:tracked") as stats:
+            await asyncio.gather(*(manager.aexecute_query("SELECT %s AS n", (i,)) for i in range(3)))
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats.as_dict()["queries"] == 3 and stats.as_dict()["rows"] == 3
+    assert query_metrics.snapshot()["queries"]["test:tracked"]["queries"] == 3
+
+
+def test_bulk_load_and_merge_are_tracked(manager):
+    from db.query_stats import track_queries
+
+    stations = [{"ocm_id": 800 + i, "name": f"Station {i}", "latitude": 10.0, "longitude": 77.0} for i in range(10)]
+    with track_queries("test:bulk") as stats:
+        manager.bulk_load_stations(stations)
+    assert (stats.as_dict()["queries"], stats.as_dict()["rows"]) == (1, 10)
+
+    # A conflicting batch is redone row by row, which is recorded too
+    with track_queries("test:bulk") as stats:
+        manager.bulk_load_stations(stations[:3])
+    assert (stats.as_dict()["queries"], stats.as_dict()["errors"]) == (2, 0)
+
+    manager._prepare_station_staging()
+    manager.bulk_load_stations([dict(stations[0], name="Renamed")], table="stations_staging")
+    with track_queries("test:merge") as stats:
+        assert manager._merge_staged_stations() == (0, 1)
+    assert stats.as_dict()["queries"] >= 1 and stats.as_dict()["rows"] >= 1
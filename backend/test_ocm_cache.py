@@ -0,0 +1,154 @@
+import asyncio
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from core import ocm
+from core.ocm import OCMTileCache, covering_tiles, tile_query
+from db.geo import geohash_bounds, haversine_km
+
+
+class FakeOCM:
+    """Fetch stand-in returning one POI at the center of each requested tile."""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, lat, lon, radius_km):
+        self.calls.append((lat, lon, radius_km))
+        call = len(self.calls)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [{"ID": call, "AddressInfo": {"Latitude": lat, "Longitude": lon}},
+                {"ID": 0, "AddressInfo": {"Latitude": lat, "Longitude": lon}}]
+
+
+def test_tile_query_covers_whole_tile():
+    for tile in covering_tiles(11.0, 77.0, 10):
+        lat, lon, radius = tile_query(tile)
+        min_lat, max_lat, min_lon, max_lon = geohash_bounds(tile)
+        assert all(haversine_km(lat, lon, a, b) <= radius
+                   for a in (min_lat, max_lat) for b in (min_lon, max_lon))
+
+
+def test_nearby_radii_share_tiles():
+    assert covering_tiles(11.0, 77.0, 2) == covering_tiles(11.0, 77.0, 3)
+    assert len(covering_tiles(11.0, 77.0, 200)) <= ocm.MAX_TILES_PER_QUERY
+
+
+def test_cache_hits_merge_and_dedupe():
+    fetch = FakeOCM()
+    cache = OCMTileCache(fetch)
+
+    async def run():
+        first = await cache.stations_near(11.0, 77.0, 10)
+        second = await cache.stations_near(11.0, 77.0, 10)
+        return first, second
+
+    first, second = asyncio.run(run())
+    tiles = len(covering_tiles(11.0, 77.0, 10))
+    assert len(fetch.calls) == tiles
+    # Every tile returns ID 0; it appears once in the merged result
+    assert len(first) == tiles + 1 and second == first
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["tiles"]) == (tiles, tiles, tiles)
+
+
+def test_concurrent_misses_share_one_fetch():
+    fetch = FakeOCM(delay=0.05)
+    cache = OCMTileCache(fetch)
+
+    async def run():
+        await asyncio.gather(*(cache.stations_near(11.0, 77.0, 2) for _ in range(5)))
+
+    asyncio.run(run())
+    assert len(fetch.calls) == len(covering_tiles(11.0, 77.0, 2))
+
+
+def test_fetch_survives_caller_timeout():
+    fetch = FakeOCM(delay=0.1)
+    cache = OCMTileCache(fetch)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.stations_near(11.0, 77.0, 2), timeout=0.01)
+        await asyncio.sleep(0.2)
+        return await cache.stations_near(11.0, 77.0, 2)
+
+    assert asyncio.run(run())
+    assert cache.stats()["hits"] == len(covering_tiles(11.0, 77.0, 2))
+
+
+def test_stale_tiles_are_served_and_revalidated(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(ocm.time, "monotonic", lambda: clock[0])
+    fetch = FakeOCM()
+    cache = OCMTileCache(fetch, ttl=60, stale_ttl=600)
+
+    async def run():
+        fresh = await cache.stations_near(11.0, 77.0, 2)
+        clock[0] += 120
+        stale = await cache.stations_near(11.0, 77.0, 2)
+        await asyncio.sleep(0)
+        refreshed = await cache.stations_near(11.0, 77.0, 2)
+        clock[0] += 10000
+        expired = await cache.stations_near(11.0, 77.0, 2)
+        return fresh, stale, refreshed, expired
+
+    fresh, stale, refreshed, expired = asyncio.run(run())
+    tiles = len(covering_tiles(11.0, 77.0, 2))
+    assert stale == fresh and refreshed != fresh and expired != refreshed
+    stats = cache.stats()
+    assert stats["stale_hits"] == tiles and stats["revalidations"] == tiles
+    assert len(fetch.calls) == 3 * tiles
+
+
+def test_lru_evicts_least_recently_used_tile():
+    cache = OCMTileCache(FakeOCM(), max_tiles=2)
+
+    async def run():
+        # Radius well inside one precision-6 tile at its center
+        for tile in ("t9yw00", "t9yw01", "t9yw00", "t9yw02"):
+            lat, lon, _ = tile_query(tile)
+            await cache.stations_near(lat, lon, 0.05)
+
+    asyncio.run(run())
+    assert list(cache._entries) == ["t9yw00", "t9yw02"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_capped_tile_fetch_descends_into_child_tiles():
+    # A dense cluster off the tile center: a capped fetch around the center misses some of it
+    stations = [{"ID": i, "AddressInfo": {"Latitude": 11.0 + (i // 10) * 0.02, "Longitude": 77.0 + (i % 10) * 0.02}}
+                 for i in range(100)]
+
+    async def capped_fetch(lat, lon, radius_km):
+        near = sorted((haversine_km(lat, lon, s["AddressInfo"]["Latitude"], s["AddressInfo"]["Longitude"]), s["ID"])
+                      for s in stations)
+        return [stations[i] for distance, i in near if distance <= radius_km][:30]
+
+    def search(cache):
+        return {s["ID"] for s in asyncio.run(cache.stations_near(11.1, 77.1, 12))}
+
+    expected = {s["ID"] for s in stations
+                if haversine_km(11.1, 77.1, s["AddressInfo"]["Latitude"], s["AddressInfo"]["Longitude"]) <= 12}
+    assert not expected <= search(OCMTileCache(capped_fetch))
+    cache = OCMTileCache(capped_fetch, max_results=30)
+    assert expected <= search(cache)
+    assert cache.stats()["truncated_tiles"] >= 1
+
+
+def test_failed_fetch_is_not_cached():
+    fetch = FakeOCM(fail=True)
+    cache = OCMTileCache(fetch)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await cache.stations_near(11.0, 77.0, 2)
+
+    asyncio.run(run())
+    assert cache.stats()["tiles"] == 0 and cache.stats()["fetch_errors"] >= 1
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import sys
+import time
+import httpx
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from db.ocm_crawler import OCMCrawler, TokenBucket
+
+
+class FakeOCM:
+    """MockTransport handler serving ``total`` POIs per query by offset, failing the first requests on demand."""
+
+    def __init__(self, total=250, failures=(), delay=0.0):
+        self.total = total
+        self.failures = list(failures)
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.failures:
+            status, headers = self.failures.pop(0)
+            return httpx.Response(status, headers=headers)
+        params = request.url.params
+        query = params.get("countrycode") or params.get("latitude")
+        offset, size = int(params["offset"]), int(params["maxresults"])
+        return httpx.Response(200, json=[{"ID": f"{query}-{i}"} for i in range(offset, min(offset + size, self.total))])
+
+
+def crawler(ocm, **options):
+    settings = dict(rate=1000, burst=1000, concurrency=4, backoff_base=0.01, transport=httpx.MockTransport(ocm))
+    settings.update(options)
+    return OCMCrawler("key", **settings)
+
+
+def test_crawl_paginates_queries_concurrently():
+    ocm = FakeOCM(total=250, delay=0.02)
+    client = crawler(ocm, concurrency=3)
+    results = client.crawl_sync([({"countrycode": code}, 1000) for code in ("IN", "US", "GB", "DE")]
+                                + [({"countrycode": "FR"}, 120)])
+
+    assert [len(stations) for stations in results] == [250, 250, 250, 250, 120]
+    assert len({station["ID"] for station in results[0]}) == 250
+    # Three pages per query (100, 100, 50) and two for the capped one (100, 20)
+    assert len(ocm.requests) == 14
+    assert ocm.max_in_flight == 3
+    assert all(request.url.params["key"] == "key" for request in ocm.requests)
+    stats = client.stats()
+    assert stats["requests"] == 14 and stats["stations"] == 1120 and stats["requests_per_sec"] > 0
+
+
+def test_retries_throttling_and_server_errors():
+    ocm = FakeOCM(total=50, failures=[(429, {"Retry-After": "0.05"}), (503, {})])
+    client = crawler(ocm)
+    started = time.perf_counter()
+    results = client.crawl_sync([({"countrycode": "IN"}, 100)])
+
+    assert len(results[0]) == 50
+    # Retry-After paused the bucket before the retries
+    assert time.perf_counter() - started >= 0.05
+    stats = client.stats()
+    assert (stats["requests"], stats["retries"], stats["throttled"], stats["failed_queries"]) == (3, 2, 1, 0)
+
+
+def test_failed_queries_do_not_stop_the_crawl():
+    ocm = FakeOCM(total=50, failures=[(400, {})])
+    client = crawler(ocm, concurrency=1)
+    results = client.crawl_sync([({"countrycode": "XX"}, 100), ({"countrycode": "IN"}, 100)])
+    assert results == [None, [{"ID": f"IN-{i}"} for i in range(50)]]
+
+    # Out of retries
+    ocm = FakeOCM(total=50, failures=[(500, {})] * 3)
+    client = crawler(ocm, max_retries=2)
+    assert client.crawl_sync([({"countrycode": "IN"}, 100)]) == [None]
+    assert client.stats()["failed_queries"] == 1 and client.stats()["requests"] == 3
+
+
+def test_token_bucket_paces_requests():
+    async def run():
+        bucket = TokenBucket(rate=100, burst=5)
+        started = time.perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(25)))
+        return time.perf_counter() - started
+
+    # The burst goes at once, the other 20 at 100/s
+    assert 0.18 <= asyncio.run(run()) < 0.5
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import sys
+import threading
+from contextlib import contextmanager
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from db.connection_pool import ConnectionPool
+from db.snowflake_connector import SnowflakeManager
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    for name in ["USER", "PASSWORD", "ACCOUNT", "WAREHOUSE", "DATABASE", "SCHEMA"]:
+        monkeypatch.setenv(f"SNOWFLAKE_{name}", f"test_{name.lower()}")
+    manager = SnowflakeManager()
+    yield manager
+    manager.close()
+
+
+def test_async_queries_run_on_workload_executor(manager, monkeypatch):
+    def fake_execute_query(query, params=None):
+        return [{"thread": threading.current_thread().name, "query": query, "params": params}]
+
+    monkeypatch.setattr(manager, "execute_query", fake_execute_query)
+
+    async def run():
+        return await asyncio.gather(
+            manager.aexecute_query("SELECT 1", (1,)),
+            manager.aexecute_query("SELECT 2", workload="analytics"),
+        )
+
+    interactive, analytics = asyncio.run(run())
+    assert interactive[0]["thread"].startswith("snowflake-interactive")
+    assert interactive[0]["params"] == (1,)
+    assert analytics[0]["thread"].startswith("snowflake-analytics")
+
+
+def test_unknown_workload_is_rejected(manager):
+    with pytest.raises(ValueError):
+        asyncio.run(manager.aexecute_query("SELECT 1", workload="batch"))
+
+
+class FakeCursor:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.description = [(name,) for name in columns] if columns else None
+        self.position = 0
+
+    def execute(self, query, params=None, **kwargs):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        batch = self.rows[self.position:self.position + size]
+        self.position += len(batch)
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+
+    def cursor(self):
+        return FakeCursor(self.rows, self.columns)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def use_fake_result(manager, monkeypatch, rows, columns):
+    @contextmanager
+    def get_connection():
+        yield FakeConnection(rows, columns)
+
+    monkeypatch.setattr(manager, "get_connection", get_connection)
+
+
+def test_rows_and_columns_match_dict_results(manager, monkeypatch):
+    rows = [(1, "Alpha", 11.0, None), (2, "Beta", 12.5, "Chennai")]
+    use_fake_result(manager, monkeypatch, rows, ["ID", "NAME", "LATITUDE", "TOWN"])
+
+    dicts = manager.execute_query("SELECT * FROM stations")
+    assert dicts[1] == {"ID": 2, "NAME": "Beta", "LATITUDE": 12.5, "TOWN": "Chennai"}
+
+    records = manager.execute_query_rows("SELECT * FROM stations")
+    assert records[0].name == "Alpha" and records[1][2] == 12.5
+    assert type(records[0]) is type(records[1])
+
+    columns = manager.execute_query_columnar("SELECT * FROM stations")
+    assert columns["LATITUDE"].dtype.kind == "f"
+    assert columns["LATITUDE"].tolist() == [11.0, 12.5]
+    assert columns["TOWN"].tolist() == [None, "Chennai"]
+
+
+def test_statements_without_results_return_empty(manager, monkeypatch):
+    use_fake_result(manager, monkeypatch, [], None)
+    assert manager.execute_query("DELETE FROM stations") == []
+    assert manager.execute_query_rows("DELETE FROM stations") == []
+    assert manager.execute_query_columnar("DELETE FROM stations") == {}
+
+
+def test_iter_query_streams_batches_and_releases_connection(manager, monkeypatch):
+    rows = [(i, f"Station {i}") for i in range(25)]
+    pool = ConnectionPool(lambda: FakeConnection(rows, ["ID", "NAME"]), max_size=1)
+    monkeypatch.setattr(manager, "pool", pool)
+
+    batches = list(manager.iter_query("SELECT * FROM stations", batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert batches[2][-1] == {"ID": 24, "NAME": "Station 24"}
+    assert pool.stats()["in_use"] == 0
+
+    # The connection is held while iterating and returned when the consumer stops early
+    stream = manager.iter_query("SELECT * FROM stations", batch_size=10, row_type="row")
+    first = next(stream)
+    assert first[0].name == "Station 0"
+    assert pool.stats()["in_use"] == 1
+    stream.close()
+    assert pool.stats()["in_use"] == 0
+    assert pool.stats()["idle"] == 1
+
+
+class RecordingCursor(FakeCursor):
+    """Cursor that records statements and answers COPY INTO with a load summary."""
+
+    def __init__(self, statements):
+        super().__init__([], None)
+        self.statements = statements
+        self.tags = []
+
+    def execute(self, query, params=None, _statement_params=None):
+        self.statements.append(" ".join(query.split()))
+        self.tags.append((_statement_params or {}).get("QUERY_TAG"))
+        if query.lstrip().startswith("COPY INTO"):
+            self.description = [(name,) for name in ["file", "status", "rows_parsed", "rows_loaded", "errors_seen", "first_error"]]
+            self.rows = [("stations.csv.gz", "PARTIALLY_LOADED", 3, 2, 1, "Numeric value 'x' is not recognized")]
+
+    def executemany(self, query, params_list, _statement_params=None):
+        self.execute(query, _statement_params=_statement_params)
+
+
+def test_bulk_load_uses_put_and_copy(manager, monkeypatch):
+    statements = []
+
+    class Connection(FakeConnection):
+        def cursor(self):
+            return RecordingCursor(statements)
+
+    @contextmanager
+    def get_connection():
+        yield Connection([], None)
+
+    monkeypatch.setattr(manager, "get_connection", get_connection)
+    stations = [{"id": i, "name": f"Station {i}", "latitude": 10.0, "longitude": 77.0} for i in range(3)]
+    stations.append({"id": 9, "name": "", "latitude": 10.0, "longitude": 77.0})
+
+    report = manager.bulk_load_stations(stations)
+    assert statements[0].startswith("PUT 'file://") and "@%stations" in statements[0]
+    assert statements[1].startswith("COPY INTO stations (id, ocm_id, name")
+    assert "ON_ERROR = CONTINUE" in statements[1]
+    assert report["rows_loaded"] == 2
+    assert report["rows_rejected"] == 2
+
+
+def test_query_tag_is_passed_per_statement(manager, monkeypatch):
+    from db.query_stats import track_queries
+
+    statements, cursors = [], []
+
+    class Connection(FakeConnection):
+        def cursor(self):
+            cursors.append(RecordingCursor(statements))
+            return cursors[-1]
+
+    @contextmanager
+    def get_connection():
+        yield Connection([], None)
+
+    monkeypatch.setattr(manager, "get_connection", get_connection)
+    with track_queries("ev-api:GET /stations/") as stats:
+        manager.execute_query("SELECT 1")
+        manager.bulk_load_stations([{"id": 1, "name": "Station 1", "latitude": 10.0, "longitude": 77.0}])
+    manager.execute_query("SELECT 2")
+
+    # No ALTER SESSION round trips; the bulk load's PUT and COPY are tagged and counted too
+    assert statements[0] == "SELECT 1" and statements[1].startswith("PUT") and statements[2].startswith("COPY INTO")
+    assert statements[3] == "SELECT 2"
+    assert [tag for cursor in cursors for tag in cursor.tags] == ["ev-api:GET /stations/"] * 3 + [None]
+    assert stats.as_dict()["queries"] == 3
+
+
+def test_station_stats_rebuild_runs_in_one_transaction_and_sums_duplicates(manager, monkeypatch):
+    statements, connections = [], []
+
+    class Connection(FakeConnection):
+        def cursor(self):
+            return RecordingCursor(statements)
+
+    @contextmanager
+    def get_connection():
+        connections.append(Connection([], None))
+        yield connections[-1]
+
+    monkeypatch.setattr(manager, "get_connection", get_connection)
+    manager.rebuild_station_stats({("total", ""): 3, ("state", "Kerala"): 3})
+    assert len(connections) == 1
+    assert [statement.split(" (")[0] for statement in statements] == [
+        "BEGIN", "DELETE FROM station_stats", "INSERT INTO station_stats", "COMMIT"]
+
+    # Duplicate (dimension, value) rows are summed, so verification sees them as drift
+    queries = []
+    monkeypatch.setattr(manager, "execute_query", lambda query, params=None: queries.append(query) or [
+        {"dimension": "state", "value": "Kerala", "station_count": 6}])
+    assert manager.get_station_stats() == {("state", "Kerala"): 6}
+    assert "SUM(station_count)" in queries[0] and "GROUP BY dimension, value" in queries[0]
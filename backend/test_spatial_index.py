@@ -0,0 +1,124 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from core.spatial_index import GridIndex
+from core.station_catalog import StationCatalog
+from db.geo import haversine_km, haversine_km_array
+from db.local_backend import LocalManager
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(7)
+    return rng.uniform(8.0, 13.5, 5000), rng.uniform(76.0, 80.5, 5000)
+
+
+def brute_force(lats, lons, lat, lon):
+    return np.array([haversine_km(lat, lon, a, b) for a, b in zip(lats, lons)])
+
+
+def test_within_matches_brute_force(points):
+    lats, lons = points
+    index = GridIndex(lats, lons)
+    for lat, lon, radius in [(11.0, 77.0, 10), (9.3, 78.1, 35), (13.4, 80.4, 3), (0.0, 0.0, 50)]:
+        positions, distances = index.within(lat, lon, radius)
+        expected = brute_force(lats, lons, lat, lon)
+        assert sorted(positions.tolist()) == sorted(np.flatnonzero(expected <= radius).tolist())
+        assert distances.tolist() == sorted(distances.tolist())
+        assert distances == pytest.approx(expected[positions])
+
+
+def test_within_many_matches_within(points):
+    lats, lons = points
+    index = GridIndex(lats, lons)
+    queries = [(11.0, 77.0, 10, 5), (9.3, 78.1, 35, 1000), (13.4, 80.4, 3, 2), (0.0, 0.0, 50, 5), (11.0, 77.0, 10, 1)]
+    results = index.within_many(*zip(*queries))
+    assert len(results) == len(queries)
+    for (lat, lon, radius, limit), (positions, distances) in zip(queries, results):
+        expected_positions, expected_distances = index.within(lat, lon, radius, limit=limit)
+        assert positions.tolist() == expected_positions.tolist()
+        assert distances == pytest.approx(expected_distances)
+    assert [len(p) for p, _ in index.within_many([11.0], [77.0], [10])] == [len(index.within(11.0, 77.0, 10)[0])]
+    assert index.within_many([], [], []) == []
+
+
+def test_along_polyline_matches_densified_route(points):
+    lats, lons = points
+    index = GridIndex(lats, lons)
+    route = [(8.5, 76.5), (9.0, 77.2), (10.2, 77.3), (10.25, 78.9), (12.0, 79.5)]
+    positions, distances, along = index.along_polyline(*zip(*route), width_km=5)
+
+    # Brute force: distance to a route sampled every ~100 m, and the along-route position of the closest sample
+    samples, sample_along, covered = [], [], 0.0
+    for (lat1, lon1), (lat2, lon2) in zip(route, route[1:]):
+        length = haversine_km(lat1, lon1, lat2, lon2)
+        steps = np.linspace(0, 1, int(length * 10) + 2)
+        samples += [(lat1 + (lat2 - lat1) * f, lon1 + (lon2 - lon1) * f) for f in steps]
+        sample_along += list(covered + steps * length)
+        covered += length
+    sample_lats, sample_lons = np.array(samples).T
+    expected = {}
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        d = haversine_km_array(lat, lon, sample_lats, sample_lons)
+        if d.min() <= 5:
+            expected[i] = (d.min(), sample_along[int(d.argmin())])
+
+    assert set(positions.tolist()) <= set(expected) and len(expected) - len(positions) <= 2
+    assert along.tolist() == sorted(along.tolist()) and along[-1] <= covered
+    for position, distance, at in zip(positions, distances, along):
+        assert distance == pytest.approx(expected[position][0], abs=0.05)
+        assert at == pytest.approx(expected[position][1], abs=0.5)
+
+    assert len(index.along_polyline([], [], 5)[0]) == 0
+    single, _, single_along = index.along_polyline([11.0], [77.0], 5)
+    assert sorted(single.tolist()) == sorted(index.within(11.0, 77.0, 5)[0].tolist()) and not single_along.any()
+
+
+def test_nearest_is_exact(points):
+    lats, lons = points
+    index = GridIndex(lats, lons)
+    positions, distances = index.nearest(10.2, 77.7, 7)
+    expected = brute_force(lats, lons, 10.2, 77.7)
+    assert positions.tolist() == np.argsort(expected, kind="stable")[:7].tolist()
+
+    # Far from every point the search keeps widening until it finds them
+    positions, _ = index.nearest(-30.0, 150.0, 3)
+    assert len(positions) == 3
+    assert len(index.nearest(-30.0, 150.0, 3, max_radius_km=100)[0]) == 0
+    assert len(GridIndex([], []).within(11.0, 77.0, 10)[0]) == 0
+
+
+def test_catalog_applies_changes_and_notifies_listeners():
+    manager = LocalManager(":memory:")
+    try:
+        manager.upsert_stations([
+            {"ocm_id": i, "name": f"Station {i}", "latitude": 11.0 + i * 0.01, "longitude": 77.0}
+            for i in range(5)
+        ])
+        catalog = StationCatalog(manager)
+        changes = []
+        catalog.add_listener(lambda upserted, removed: changes.append(([s.ocm_id for s in upserted], removed)))
+
+        assert catalog.load() == 5 and catalog.ready
+        nearest = catalog.nearby(11.0, 77.0, 1.5)
+        assert [station.ocm_id for station, _ in nearest] == [0, 1]
+        assert catalog.refresh() == 0
+
+        manager.upsert_stations([
+            {"ocm_id": 1, "name": "Renamed", "latitude": 11.01, "longitude": 77.0},
+            {"ocm_id": 9, "name": "New", "latitude": 11.001, "longitude": 77.0},
+        ])
+        assert catalog.refresh() == 2
+        assert [station.name for station, _ in catalog.nearest(11.0, 77.0, 3)] == ["Station 0", "New", "Renamed"]
+        assert changes[-1] == ([1, 9], [])
+
+        removed_id = catalog.nearest(11.04, 77.0, 1)[0][0].id
+        manager.execute_query("DELETE FROM stations WHERE ocm_id = 4")
+        catalog.refresh()
+        assert len(catalog) == 5 and catalog.get(removed_id) is None
+        assert changes[-1][1] == [removed_id]
+    finally:
+        manager.close()
@@ -0,0 +1,112 @@
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from core.station_autocomplete import StationAutocomplete
+from core.station_catalog import StationCatalog
+from db.local_backend import LocalManager
+
+Row = namedtuple("Row", "id name town")
+
+STATIONS = [
+    Row(1, "Tata Power EZ Charge", "Coimbatore"),
+    Row(2, "Tata Power Hub", "Chennai"),
+    Row(3, "Power Grid Charger", "Coimbatore"),
+    Row(4, "Statiq Charger", "Chennai"),
+    Row(5, "Café Électrique", "Pondicherry"),
+]
+
+
+def build(popularity=None):
+    index = StationAutocomplete(popularity=lambda: popularity or {})
+    index.rebuild(STATIONS)
+    return index
+
+
+def test_completes_any_word_by_popularity():
+    index = build({2: 10, 3: 4})
+
+    assert [s["station_id"] for s in index.complete("power") if s["type"] == "station"] == [2, 3, 1]
+    assert [s["text"] for s in index.complete("tata p")] == ["Tata Power Hub", "Tata Power EZ Charge"]
+    assert index.complete("ele")[0]["text"] == "Café Électrique"
+    # Chennai: 1 + 11 + 1; Coimbatore: 1 + 1 + 5
+    towns = [s for s in index.complete("c") if s["type"] == "town"]
+    assert [(s["text"], s["stations"], s["weight"]) for s in towns] == [("Chennai", 2, 12), ("Coimbatore", 2, 6)]
+    assert index.complete("xyz") == [] and index.complete("  ") == []
+
+
+def test_limit_and_memoized_short_prefixes_agree():
+    index = build({4: 3})
+    assert index.complete("ch", limit=2) == index.complete("ch")[:2]
+    assert len(index.complete("ch", limit=2)) == 2
+    # Same answer whether or not the prefix is memoized
+    assert index.complete("ch") == index._build.complete("ch", 10)
+
+
+def test_rebuilds_when_catalog_changes():
+    manager = LocalManager(":memory:")
+    manager.upsert_stations([{"ocm_id": 1, "name": "Kochi Fast Charge", "latitude": 10.0, "longitude": 76.3,
+                              "town": "Kochi"}])
+    catalog = StationCatalog(manager)
+    index = StationAutocomplete(popularity=manager.get_station_popularity)
+    index.attach(catalog)
+    catalog.load()
+    assert sorted(s["text"] for s in index.complete("ko")) == ["Kochi", "Kochi Fast Charge"]
+
+    manager.upsert_stations([{"ocm_id": 2, "name": "Kottayam Charger", "latitude": 9.6, "longitude": 76.5,
+                              "town": "Kottayam"}])
+    catalog.refresh()
+    assert "Kottayam Charger" in [s["text"] for s in index.complete("kot")]
+    manager.close()
+
+
+def test_skips_rebuild_when_indexed_fields_are_unchanged():
+    manager = LocalManager(":memory:")
+    station = {"ocm_id": 1, "name": "Kochi Fast Charge", "latitude": 10.0, "longitude": 76.3, "town": "Kochi"}
+    manager.upsert_stations([station])
+    catalog = StationCatalog(manager)
+    index = StationAutocomplete(popularity=manager.get_station_popularity)
+    index.attach(catalog)
+    catalog.load()
+    current = index._build
+
+    # A power or address change does not reach the index
+    manager.upsert_stations([dict(station, max_power_kw=60.0, address_line1="MG Road")])
+    assert catalog.refresh() == 1
+    assert index._build is current
+
+    manager.upsert_stations([dict(station, name="Kochi Hub")])
+    catalog.refresh()
+    assert index._build is not current
+    assert [s["text"] for s in index.complete("hub")] == ["Kochi Hub"]
+    assert not index.needs_rebuild([], [99])
+    assert index.needs_rebuild([], [catalog.stations[0].id])
+    manager.close()
+
+
+def test_database_fallback_matches_index_suggestions():
+    manager = LocalManager(":memory:")
+    manager.upsert_stations([{"ocm_id": row.id, "name": row.name, "town": row.town, "latitude": 11.0,
+                              "longitude": 77.0} for row in STATIONS])
+    ids = {row["name"]: row["id"] for row in manager.execute_query("SELECT id, name FROM stations")}
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for _ in range(3):
+        manager.log_session(1, ids["Tata Power Hub"], now, now)
+    catalog = StationCatalog(manager)
+    index = StationAutocomplete(popularity=manager.get_station_popularity)
+    index.attach(catalog)
+    catalog.load()
+
+    def key(s):
+        return s["type"], s["text"], s.get("station_id"), s.get("town"), s.get("stations"), s["weight"]
+
+    for prefix in ("power", "c", "tata p", "chennai"):
+        fallback = manager.get_autocomplete_suggestions(prefix, 10)
+        assert sorted(map(key, fallback)) == sorted(map(key, index.complete(prefix)))
+        assert [s["weight"] for s in fallback] == sorted((s["weight"] for s in fallback), reverse=True)
+    # LIKE wildcards typed by the user are literal
+    assert manager.get_autocomplete_suggestions("%", 10) == []
+    assert manager.get_autocomplete_suggestions("t_ta", 10) == []
+    manager.close()
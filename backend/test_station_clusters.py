@@ -0,0 +1,88 @@
+import os
+import sys
+from collections import namedtuple
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import core.station_clusters as station_clusters
+from core.station_clusters import MAX_CLUSTER_ZOOM, StationClusterIndex, mercator_xy
+
+Row = namedtuple("Row", "id latitude longitude available")
+
+
+@pytest.fixture(autouse=True)
+def whole_world_views(monkeypatch):
+    # The tests look at every cluster of a zoom level at once
+    monkeypatch.setattr(station_clusters, "MAX_VIEW_CELLS", 2 ** 40)
+
+
+def _stations(n, seed=5):
+    rng = np.random.default_rng(seed)
+    return [Row(i, float(lat), float(lon), bool(i % 3)) for i, (lat, lon)
+            in enumerate(zip(rng.uniform(8.0, 13.5, n), rng.uniform(76.0, 80.5, n)), start=1)]
+
+
+def _snapshot(index, zoom):
+    return sorted((c["count"], c["available"], c["lat"], c["lon"]) for c in index.clusters(-180, -85, 180, 85, zoom))
+
+
+def test_mercator_corners():
+    assert mercator_xy(0.0, 0.0) == (0.5, 0.5)
+    assert mercator_xy(89.9, -180.0) == (0.0, 0.0)
+    assert mercator_xy(-89.9, 180.0) == (1.0, 1.0)
+
+
+def test_views_too_large_for_their_zoom_are_refused(monkeypatch):
+    monkeypatch.setattr(station_clusters, "MAX_VIEW_CELLS", 16384)
+    index = StationClusterIndex()
+    index.rebuild(_stations(10))
+    assert index.clusters(-180, -85, 180, 85, 4)
+    with pytest.raises(ValueError):
+        index.clusters(-180, -85, 180, 85, 8)
+
+
+def test_clusters_merge_with_zoom_and_cover_the_view():
+    stations = _stations(2000)
+    index = StationClusterIndex()
+    index.rebuild(stations)
+
+    world = index.clusters(-180, -85, 180, 85, 0)
+    assert len(world) == 1 and world[0]["count"] == 2000
+    assert world[0]["available"] == sum(s.available for s in stations)
+    assert world[0]["lat"] == round(np.mean([s.latitude for s in stations]), 6)
+
+    sizes = [len(index.clusters(-180, -85, 180, 85, zoom)) for zoom in range(0, MAX_CLUSTER_ZOOM + 1)]
+    assert sizes == sorted(sizes) and sizes[-1] == 2000
+
+    view = index.clusters(77.0, 10.0, 78.0, 11.0, 9)
+    inside = sum(1 for s in stations if 10.0 <= s.latitude <= 11.0 and 77.0 <= s.longitude <= 78.0)
+    assert sum(c["count"] for c in view) >= inside
+    assert all(76.8 < c["lon"] < 78.2 and 9.8 < c["lat"] < 11.2 for c in view)
+
+    singles = [c for c in index.clusters(-180, -85, 180, 85, MAX_CLUSTER_ZOOM) if c["count"] == 1]
+    by_id = {s.id: s for s in stations}
+    assert all(abs(by_id[c["station_id"]].latitude - c["lat"]) < 1e-6 for c in singles)
+
+
+def test_incremental_updates_match_a_rebuild():
+    stations = _stations(500)
+    index = StationClusterIndex()
+    index.rebuild(stations)
+
+    moved = [s._replace(latitude=s.latitude + 0.3, available=not s.available) for s in stations[:50]]
+    added = [Row(1000, 11.0, 77.0, True), Row(1001, 11.0, 77.0, False)]
+    removed = [s.id for s in stations[450:]]
+    index.update(moved + added, removed)
+
+    expected = StationClusterIndex()
+    expected.rebuild(moved + stations[50:450] + added)
+    for zoom in (0, 5, 10, MAX_CLUSTER_ZOOM):
+        assert _snapshot(index, zoom) == _snapshot(expected, zoom)
+    assert len(index) == 452
+
+
+def test_view_across_the_antimeridian():
+    index = StationClusterIndex()
+    index.rebuild([Row(1, -17.7, 178.4, True), Row(2, -17.8, -179.9, True), Row(3, -17.7, 170.0, True)])
+    assert sum(c["count"] for c in index.clusters(175.0, -20.0, -175.0, -15.0, 6)) == 2
@@ -0,0 +1,72 @@
+import os
+import sys
+from collections import namedtuple
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from core.station_catalog import StationCatalog
+from core.station_search import StationSearchIndex, normalize, trigrams
+from db.local_backend import LocalManager
+
+Row = namedtuple("Row", "id name town state address_line1")
+
+STATIONS = [
+    Row(1, "Tata Power EZ Charge", "Coimbatore", "Tamil Nadu", "Avinashi Road"),
+    Row(2, "Ather Grid", "Bengaluru", "Karnataka", "MG Road"),
+    Row(3, "Zeon Charging Hub", "Coimbatore", "Tamil Nadu", "Trichy Road"),
+    Row(4, "Statiq Charger", "Chennai", "Tamil Nadu", "Anna Salai"),
+    Row(5, "Café Électrique", "Pondicherry", "Puducherry", None),
+]
+
+
+def test_normalize_and_trigrams():
+    assert normalize("Café  Électrique!") == "cafe electrique"
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+
+
+def test_search_ranks_and_tolerates_typos():
+    index = StationSearchIndex()
+    index.rebuild(STATIONS)
+
+    assert [station_id for station_id, _ in index.search("Coimbatore")][:2] == [1, 3]
+    # Name matches outrank town/state matches
+    assert index.search("charg")[0][0] in (1, 3, 4)
+    assert index.search("Coimbatre")[0][0] in (1, 3)
+    assert index.search("ather grd")[0][0] == 2
+    assert index.search("electrique")[0][0] == 5
+    assert index.search("zzzz") == []
+    assert len(index.search("tamil", limit=2)) == 2
+
+
+def test_incremental_updates_match_rebuild():
+    index = StationSearchIndex()
+    index.rebuild(STATIONS)
+    index.update([Row(2, "Ather Grid", "Mysuru", "Karnataka", "MG Road"), Row(6, "Jio-bp Pulse", "Mumbai", "Maharashtra", "")],
+                 removed=[3])
+
+    assert index.search("Bengaluru") == []
+    assert index.search("mysuru")[0][0] == 2
+    assert index.search("jio bp")[0][0] == 6
+    assert [station_id for station_id, _ in index.search("Coimbatore")] == [1]
+
+    fresh = StationSearchIndex()
+    fresh.rebuild([STATIONS[0], Row(2, "Ather Grid", "Mysuru", "Karnataka", "MG Road")] + list(STATIONS[3:])
+                  + [Row(6, "Jio-bp Pulse", "Mumbai", "Maharashtra", "")])
+    for query in ("coimbatore", "mysuru", "ather", "tamil nadu", "road"):
+        assert index.search(query) == fresh.search(query)
+
+
+def test_index_follows_catalog():
+    manager = LocalManager(":memory:")
+    manager.upsert_stations([{"ocm_id": 1, "name": "Kochi Fast Charge", "latitude": 10.0, "longitude": 76.3,
+                              "town": "Kochi", "state": "Kerala"}])
+    catalog = StationCatalog(manager)
+    index = StationSearchIndex()
+    index.attach(catalog)
+    catalog.load()
+    assert index.ready and len(index.search("kochi")) == 1
+
+    manager.upsert_stations([{"ocm_id": 2, "name": "Kochi Metro Charger", "latitude": 10.01, "longitude": 76.3,
+                              "town": "Kochi", "state": "Kerala"}])
+    catalog.refresh()
+    assert len(index.search("kochi")) == 2
+    manager.close()
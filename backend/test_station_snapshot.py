@@ -0,0 +1,111 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from core.station_catalog import StationCatalog
+from db.connectors import StationFilter, parse_connectors
+from db.local_backend import LocalManager
+from db.station_snapshot import SNAPSHOT_STATIONS_SQL, StationSnapshot, export_station_snapshot, write_snapshot
+
+
+def _stations(n, **overrides):
+    rng = np.random.default_rng(n)
+    return [dict({"ocm_id": i, "name": f"Station {i} – Chennai", "latitude": float(lat),
+                  "longitude": float(lon), "energy_type": "CCS, Type 2" if i % 2 else "Type 2",
+                  "connector_mask": None if i % 5 == 0 else (5 if i % 2 else 4),
+                  "max_power_kw": None if i % 3 == 0 else 7.4 * (i % 4 + 1), "town": "Chennai" if i % 2 else None},
+                 **overrides)
+            for i, (lat, lon) in enumerate(zip(rng.uniform(12.8, 13.2, n), rng.uniform(80.0, 80.4, n)))]
+
+
+@pytest.fixture
+def manager():
+    manager = LocalManager(":memory:")
+    manager.upsert_stations(_stations(300))
+    manager.execute_query("UPDATE stations SET ocm_id = NULL WHERE ocm_id % 7 = 0")
+    yield manager
+    manager.close()
+
+
+def test_snapshot_round_trips_rows_as_read_only_views(manager, tmp_path):
+    path = str(tmp_path / "stations.snap")
+    header = export_station_snapshot(manager, path)
+    snapshot = StationSnapshot(path)
+
+    rows = manager.execute_query_rows(f"{SNAPSHOT_STATIONS_SQL} ORDER BY id")
+    assert header["version"] == snapshot.version == 1 and len(snapshot) == 300
+    assert list(snapshot.rows) == rows
+    assert snapshot.rows[-1] == rows[-1] and snapshot.rows[10:12] == tuple(rows[10:12])
+    assert snapshot.rows[0].ocm_id is None and snapshot.rows[0].town is None
+
+    for name in ("id", "latitude", "connector_mask", "grid.keys", "row_hash"):
+        array = snapshot.array(name)
+        assert not array.flags.owndata and not array.flags.writeable
+    assert export_station_snapshot(manager, path)["version"] == 2
+    assert [name for name in os.listdir(tmp_path)] == ["stations.snap"]
+
+
+def test_snapshot_catalog_answers_like_the_table_catalog(manager, tmp_path):
+    path = str(tmp_path / "stations.snap")
+    export_station_snapshot(manager, path)
+    from_table, from_snapshot = StationCatalog(manager), StationCatalog(manager, snapshot_path=path)
+    from_table.load()
+    from_snapshot.load()
+
+    assert from_snapshot.status()["snapshot"]["version"] == 1
+    station_filter = StationFilter(parse_connectors(["ccs"]), min_power_kw=10)
+    for kwargs in ({}, {"limit": 4}, {"station_filter": station_filter}):
+        assert from_snapshot.nearby(13.0, 80.2, 8, **kwargs) == from_table.nearby(13.0, 80.2, 8, **kwargs)
+    assert from_snapshot.page(after_id=20, limit=5) == (1, list(from_table.page(after_id=20, limit=5)[1]), True)
+    station = from_table.stations[42]
+    assert from_snapshot.get(station.id) == station and from_snapshot.get(-1) is None
+    assert from_snapshot.holds_ocm_id(8) and not from_snapshot.holds_ocm_id(7)
+
+
+def test_catalog_swaps_in_a_replaced_snapshot(manager, tmp_path):
+    path = str(tmp_path / "stations.snap")
+    export_station_snapshot(manager, path)
+    catalog = StationCatalog(manager, snapshot_path=path)
+    changes = []
+    catalog.add_listener(lambda upserted, removed: changes.append(([s.id for s in upserted], removed)))
+    catalog.load()
+    old_rows = catalog.stations
+    assert len(changes[0][0]) == 300 and catalog.refresh() == 0
+
+    rows = manager.execute_query_rows(SNAPSHOT_STATIONS_SQL)
+    moved = rows[3]._replace(latitude=13.19, available=False)
+    write_snapshot([moved] + rows[4:] + [rows[0]._replace(id=5000, ocm_id=5000)], path)
+    assert catalog.refresh() == 2
+    assert changes[-1] == ([moved.id, 5000], [rows[0].id, rows[1].id, rows[2].id])
+    assert catalog.get(moved.id).latitude == 13.19 and catalog.get(rows[1].id) is None
+    assert catalog.status()["snapshot"]["version"] == 2
+    # Readers holding the previous generation keep reading it
+    assert old_rows[3] == rows[3]
+
+    with pytest.raises(ValueError):
+        write_snapshot([rows[0]._replace(latitude="north")], path)
+    assert sorted(os.listdir(tmp_path)) == ["stations.snap"] and catalog.refresh() == 0
+
+
+def test_api_workers_serve_the_mapped_snapshot(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    import db.snowflake_connector as connector
+    from app import app
+    from core.config import settings
+
+    path = str(tmp_path / "stations.snap")
+    write_snapshot([dict(station, id=i + 1, available=True) for i, station in enumerate(_stations(20))], path)
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("LOCAL_DB_PATH", ":memory:")
+    monkeypatch.setattr(connector, "snowflake_manager", None)
+    monkeypatch.setattr(settings, "STATION_SNAPSHOT_PATH", path)
+    with TestClient(app) as client:
+        # The table is empty; everything below comes from the snapshot
+        app.state.station_catalog.load()
+        response = client.get("/stations/nearby", params={"lat": 13.0, "lon": 80.2, "radius": 50, "limit": 20,
+                                                          "use_ocm": False, "connector": "ccs"})
+        assert len(response.json()["stations"]) == 10
+        assert response.headers["X-DB-Query-Count"] == "0"
+        assert client.get("/health").json()["station_catalog"]["snapshot"]["version"] == 1
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+import pytest
+from fastapi import HTTPException
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.stations import get_station_statistics
+from core.station_catalog import StationCatalog
+from core.station_stats import StationStatistics
+from db.local_backend import LocalManager
+from db.station_stats import TOTAL, count_stations, summarize_station_stats
+
+
+def _stations(n, **overrides):
+    return [dict({"ocm_id": i, "name": f"Station {i}", "latitude": 11.0, "longitude": 77.0 + i * 0.01,
+                  "energy_type": "CCS" if i % 2 else "Type 2", "town": "Coimbatore" if i < 6 else "Salem",
+                  "state": "Tamil Nadu", "country": "India"}, **overrides) for i in range(n)]
+
+
+def test_upsert_keeps_station_stats_in_step():
+    manager = LocalManager(":memory:")
+    manager.upsert_stations(_stations(10))
+    assert manager.get_station_stats() == manager.compute_station_stats()
+    assert manager.get_station_stats()[("town", "Salem")] == 4
+
+    # Changed rows move between values, new rows add, unchanged rows leave the counts alone
+    changed = _stations(10)
+    changed[0] = dict(changed[0], town="Kochi", state="Kerala")
+    changed[7] = dict(changed[7], energy_type=None)
+    manager.upsert_stations(changed + [{"ocm_id": 50, "name": "New", "latitude": 12.0, "longitude": 78.0}])
+    stats = manager.get_station_stats()
+    assert stats == manager.compute_station_stats()
+    assert stats[TOTAL] == 11
+    assert stats[("state", "Kerala")] == 1 and stats[("state", "Tamil Nadu")] == 9
+    assert stats[("available", "true")] == 11
+
+    summary = summarize_station_stats(stats)
+    assert summary["total_stations"] == 11 and summary["countries"] == 1
+    assert summary["availability_percentage"] == 100.0
+    assert summary["by_city"][0] == {"town": "Coimbatore", "count": 5}
+    manager.close()
+
+
+def test_in_process_counts_follow_catalog_and_verify_repairs_drift():
+    manager = LocalManager(":memory:")
+    manager.upsert_stations(_stations(8))
+    catalog = StationCatalog(manager)
+    stats = StationStatistics(manager)
+    stats.attach(catalog)
+    catalog.load()
+    assert stats.ready and stats.counts() == manager.get_station_stats()
+
+    manager.upsert_stations(_stations(8, energy_type="CCS")[:3] + _stations(12)[8:])
+    catalog.refresh()
+    assert stats.counts() == count_stations(catalog.stations) == manager.get_station_stats()
+    assert stats.summary()["by_energy_type"][0] == {"energy_type": "CCS", "count": 8}
+
+    assert stats.verify() == {"in_process": 0, "warehouse": 0}
+    manager.execute_query("UPDATE station_stats SET station_count = 99 WHERE dimension = 'town'")
+    stats.update([], [catalog.stations[0].id])
+    assert stats.verify() == {"in_process": 6, "warehouse": 2}
+    assert stats.counts() == manager.get_station_stats() == manager.compute_station_stats()
+    manager.close()
+
+
+def test_rebuild_is_one_transaction():
+    manager = LocalManager(":memory:")
+    manager.upsert_stations(_stations(6))
+    before = manager.get_station_stats()
+
+    # A failing INSERT rolls the DELETE back instead of leaving station_stats empty
+    with pytest.raises(Exception):
+        manager.rebuild_station_stats({TOTAL: object()})
+    assert manager.get_station_stats() == before
+
+    assert manager.rebuild_station_stats() == before == manager.get_station_stats()
+    manager.close()
+
+
+def test_statistics_endpoint_does_not_rebuild_on_read():
+    manager = LocalManager(":memory:")
+    manager.upsert_stations(_stations(4))
+    manager.execute_query("DELETE FROM station_stats")
+
+    # Rebuilding is left to ingestion and the verifier
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_station_statistics(stats=None, snowflake_manager=manager))
+    assert error.value.status_code == 503
+    assert manager.get_station_stats() == {}
+
+    manager.rebuild_station_stats()
+    summary = asyncio.run(get_station_statistics(stats=None, snowflake_manager=manager))
+    assert summary["total_stations"] == 4
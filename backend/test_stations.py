@@ -13,4 +13,19 @@ def test_get_stations():
         assert 'id' in data[0]
         assert 'name' in data[0]
         assert 'latitude' in data[0]
-        assert 'longitude' in data[0]
\ No newline at end of file
+        assert 'longitude' in data[0]
+
+def test_merge_nearby_drops_ocm_duplicates():
+    from api.stations import merge_nearby
+    from models.schemas import NearbyStation
+
+    def station(id, source, distance, lat=11.0, ocm_id=None):
+        return NearbyStation(id=id, name=id, latitude=lat, longitude=77.0, energy_type="CCS", available=True,
+                             distance_km=distance, travel_time_minutes=0, source=source, ocm_id=ocm_id)
+
+    snowflake = [station("1", "snowflake", 0.5, lat=11.1, ocm_id=7), station("2", "snowflake", 3.0, lat=11.2)]
+    ocm = [station("ocm_7", "ocm", 0.5, lat=11.10001, ocm_id=7),
+           station("ocm_8", "ocm", 3.0, lat=11.20001, ocm_id=8),
+           station("ocm_9", "ocm", 1.0, lat=11.3, ocm_id=9),
+           station("ocm_10", "ocm", 9.0, lat=11.4, ocm_id=10)]
+    assert [s.id for s in merge_nearby(snowflake, ocm, 3)] == ["1", "ocm_9", "2"]
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark /stations/autocomplete lookups and memory.
+
+Builds StationAutocomplete from synthetic stations (see bench_search.py) with
+random session counts as popularity, then times prefix lookups of every
+length from 1 to 8 characters and reports p50/p99 latency per length, the
+build time and the memory the index holds.
+
+Usage: python benchmarks/bench_autocomplete.py [--stations 100000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from benchmarks.bench_search import synthetic_stations  # noqa: E402
+from core.station_autocomplete import StationAutocomplete  # noqa: E402
+
+Row = namedtuple("Row", "id name town")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    rows = [Row(i, s["name"], s["town"]) for i, s in enumerate(synthetic_stations(args.stations))]
+    sessions = {i: int(rng.expovariate(1 / 20)) for i in range(len(rows))}
+
+    index = StationAutocomplete(popularity=lambda: sessions)
+    index.rebuild(rows)
+    status = index.status()
+    # A second build under tracemalloc (which slows it down) measures what the index retains
+    tracemalloc.start()
+    measured = StationAutocomplete(popularity=lambda: sessions)
+    measured.rebuild(rows)
+    memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    del measured
+    print(f"Autocomplete over {args.stations:,} stations: {status['suggestions']:,} suggestions, "
+          f"{status['keys']:,} keys, built in {status['last_build_seconds']}s, ~{memory_mb:.1f} MB")
+
+    words = [word.lower() for row in rows[:2000] for word in f"{row.name} {row.town}".split()]
+    print(f"{'prefix len':>10} {'p50 us':>9} {'p99 us':>9}")
+    for length in range(1, 9):
+        prefixes = [word[:length] for word in (rng.choice(words) for _ in range(args.queries)) if len(word) >= length]
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.complete(prefix, 10)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{length:>10} {statistics.median(timings):>9.1f} {p99:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark filtered /stations/nearby lookups (connector, min power, availability).
+
+Loads synthetic stations with a random mix of connectors and powers (see
+bench_nearby.py for the unfiltered lookups) and times the same filtered
+nearby lookups three ways: the radius query from the database with the
+filter applied per row, the catalog radius search with energy_type string
+matching per row (how a connector filter worked before connector masks),
+and StationCatalog.nearby with a StationFilter evaluated as vectorized
+masks over the columnar connector/power/availability arrays. It then times
+one filter over the whole catalog, string matching vs masks.
+
+Usage: python benchmarks/bench_filters.py [--stations 100000] [--queries 200]
+                                          [--radius 25] [--limit 5] [--connector ccs]
+                                          [--min-power 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from benchmarks.bench_nearby import time_calls  # noqa: E402
+from benchmarks.bench_radius_query import LAT_RANGE, LON_RANGE  # noqa: E402
+from core.station_catalog import StationCatalog  # noqa: E402
+from db.connectors import CONNECTOR_TYPES, StationFilter, connector_type, parse_connectors, summarize_connections  # noqa: E402
+
+TITLES = ["CCS (Type 2)", "CHAdeMO", "Type 2 (Socket Only)", "Type 1 (J1772)", "Bharat AC-001", "Bharat DC-001",
+          "GB-T DC - GB/T 20234.3", "BS1363 3 Pin 13 Amp"]
+POWERS_KW = [3.3, 7.4, 22, 25, 50, 60, 120, 150]
+
+
+def synthetic_stations(n):
+    rng = random.Random(n)
+    stations = []
+    for i in range(n):
+        summary = summarize_connections([{"ConnectionType": {"Title": title}, "PowerKW": rng.choice(POWERS_KW)}
+                                         for title in rng.sample(TITLES, rng.randint(1, 3))])
+        stations.append({"ocm_id": i, "name": f"Station {i}", "latitude": rng.uniform(*LAT_RANGE),
+                         "longitude": rng.uniform(*LON_RANGE), "energy_type": summary.energy_type,
+                         "connector_mask": summary.connector_mask, "max_power_kw": summary.max_power_kw})
+    return stations
+
+
+def string_match(stations, wanted, min_power_kw, available_only):
+    """The per-row filter without masks: connector types recovered from the energy_type text."""
+    return [station for station in stations
+            if any(connector_type(title) in wanted for title in (station.energy_type or "").split(","))
+            and (min_power_kw is None or (station.max_power_kw or 0) >= min_power_kw)
+            and (not available_only or station.available)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=25.0)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--connector", action="append", help="connector type to accept (repeatable; default ccs)")
+    parser.add_argument("--min-power", type=float, default=50.0)
+    args = parser.parse_args()
+
+    from db.local_backend import LocalManager
+    manager = LocalManager(os.path.join(tempfile.mkdtemp(), "bench_filters.db"))
+    manager.upsert_stations(synthetic_stations(args.stations))
+    manager.execute_query("UPDATE stations SET available = FALSE WHERE ocm_id % 4 = 0")
+
+    catalog = StationCatalog(manager)
+    n_loaded = catalog.load()
+    connectors = args.connector or ["ccs"]
+    station_filter = StationFilter(parse_connectors(connectors), args.min_power, True)
+    wanted = {name for name, _ in CONNECTOR_TYPES if parse_connectors([name]) & station_filter.connectors}
+    started = time.perf_counter()
+    columns = catalog._state.columns
+    print(f"Filtered nearby lookup, {n_loaded:,} stations, radius {args.radius:g} km, limit {args.limit}, "
+          f"connector {'/'.join(connectors)}, >= {args.min_power:g} kW, available only "
+          f"(columns built in {(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    rng = random.Random(1)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.queries)]
+    modes = {
+        "bbox query + rows": lambda lat, lon: [
+            s for s in manager.get_stations_by_location(lat, lon, args.radius) if station_filter.matches_row(s)
+        ][:args.limit],
+        "catalog + strings": lambda lat, lon: string_match(
+            [s for s, _ in catalog.nearby(lat, lon, args.radius)], wanted, args.min_power, True)[:args.limit],
+        "catalog + masks": lambda lat, lon: catalog.nearby(
+            lat, lon, args.radius, limit=args.limit, station_filter=station_filter),
+    }
+
+    print(f"{'mode':<18} {'calls':>6} {'p50 ms':>10} {'p99 ms':>10}")
+    try:
+        for name, fn in modes.items():
+            timings = sorted(time_calls(fn, points))
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            print(f"{name:<18} {len(timings):>6} {statistics.median(timings):>10.3f} {p99:>10.3f}")
+
+        stations = catalog.stations
+        everything = np.arange(len(stations))
+        whole = {
+            "strings": lambda: string_match(stations, wanted, args.min_power, True),
+            "masks": lambda: columns.matching(station_filter, everything),
+        }
+        print(f"\n{'whole catalog':<18} {'ms':>10} {'matches':>9}")
+        for name, fn in whole.items():
+            started = time.perf_counter()
+            result = fn()
+            matches = len(result) if isinstance(result, list) else int(result.sum())
+            print(f"{name:<18} {(time.perf_counter() - started) * 1000:>10.1f} {matches:>9,}")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark haversine distance computation.
+
+Compares the scalar math-module function called in a Python loop (as the
+/stations/nearby OCM path used to) against db.geo.haversine_km_array in
+float64 and float32, for one origin against N destinations, plus a
+distance matrix between two point sets.
+
+Usage: python benchmarks/bench_haversine.py [--sizes 50,1000,100000,1000000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.geo import haversine_km, haversine_km_array, haversine_matrix_km  # noqa: E402
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="50,1000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lat0, lon0 = 11.0, 77.0
+    print(f"One origin vs N destinations (best of {args.repeat})")
+    print(f"{'N':>10} {'scalar loop ms':>15} {'float64 ms':>11} {'float32 ms':>11} {'speedup':>8} {'max f32 err m':>14}")
+    for n in (int(size) for size in args.sizes.split(",")):
+        lats, lons = rng.uniform(8, 13.5, n), rng.uniform(76, 80.5, n)
+        lat_list, lon_list = lats.tolist(), lons.tolist()
+        lats32, lons32 = lats.astype(np.float32), lons.astype(np.float32)
+
+        scalar = best_of(lambda: [haversine_km(lat0, lon0, a, b) for a, b in zip(lat_list, lon_list)], args.repeat)
+        vec64 = best_of(lambda: haversine_km_array(lat0, lon0, lats, lons), args.repeat)
+        vec32 = best_of(lambda: haversine_km_array(lat0, lon0, lats32, lons32, float32=True), args.repeat)
+        error_m = np.max(np.abs(haversine_km_array(lat0, lon0, lats32, lons32, float32=True)
+                                - haversine_km_array(lat0, lon0, lats32, lons32))) * 1000
+        print(f"{n:>10,} {scalar * 1000:>15.3f} {vec64 * 1000:>11.3f} {vec32 * 1000:>11.3f} "
+              f"{scalar / vec64:>7.0f}x {error_m:>14.2f}")
+
+    print(f"\nDistance matrix, 1,000 origins x 10,000 destinations (best of {args.repeat})")
+    origins = rng.uniform(8, 13.5, 1000), rng.uniform(76, 80.5, 1000)
+    destinations = rng.uniform(8, 13.5, 10000), rng.uniform(76, 80.5, 10000)
+    for label, float32 in (("float64", False), ("float32", True)):
+        seconds = best_of(lambda: haversine_matrix_km(*origins, *destinations, float32=float32), args.repeat)
+        print(f"{label:<8} {seconds * 1000:>10.1f} ms  ({1e7 / seconds / 1e6:,.0f}M pairs/s)")
+
+
+if __name__ == "__main__":
+    main()
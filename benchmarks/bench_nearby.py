@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark /stations/nearby lookups: database round trip vs the in-process index.
+
+Loads synthetic stations into the embedded SQLite backend (or uses the
+configured Snowflake account with --snowflake), then times the same nearby
+lookups three ways: the original haversine full-scan query, the current
+bounding-box query (SnowflakeManager.get_stations_by_location), and
+StationCatalog.nearby answering from its in-memory grid index. It then
+times answering all the points as one fleet batch (/stations/nearby/batch):
+one call per point vs StationCatalog.nearby_many and the single-query
+SnowflakeManager.get_stations_near_points.
+
+Usage: python benchmarks/bench_nearby.py [--stations 100000] [--queries 200]
+                                         [--radius 10] [--limit 5] [--snowflake]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from benchmarks.bench_radius_query import LAT_RANGE, LON_RANGE, LEGACY_QUERY  # noqa: E402
+from core.station_catalog import StationCatalog  # noqa: E402
+
+
+def synthetic_stations(n):
+    rng = random.Random(n)
+    return [
+        {"ocm_id": i, "name": f"Station {i}", "latitude": rng.uniform(*LAT_RANGE),
+         "longitude": rng.uniform(*LON_RANGE), "energy_type": "CCS, Type 2"}
+        for i in range(n)
+    ]
+
+
+def time_calls(fn, points, max_seconds=20.0):
+    """Per-call latencies in ms; stops early once max_seconds are spent (full scans are slow)."""
+    timings = []
+    budget_end = time.perf_counter() + max_seconds
+    for lat, lon in points:
+        started = time.perf_counter()
+        fn(lat, lon)
+        timings.append((time.perf_counter() - started) * 1000)
+        if time.perf_counter() > budget_end:
+            break
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=10.0)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--snowflake", action="store_true", help="query the configured Snowflake account's stations table")
+    args = parser.parse_args()
+
+    if args.snowflake:
+        from db.snowflake_connector import SnowflakeManager
+        manager = SnowflakeManager()
+    else:
+        from db.local_backend import LocalManager
+        manager = LocalManager(os.path.join(tempfile.mkdtemp(), "bench_nearby.db"))
+        manager.upsert_stations(synthetic_stations(args.stations))
+
+    catalog = StationCatalog(manager)
+    n_loaded = catalog.load()
+    print(f"Nearby lookup, {n_loaded:,} stations, radius {args.radius:g} km, limit {args.limit} "
+          f"({'Snowflake' if args.snowflake else 'SQLite'}; catalog load took {catalog.last_load_seconds}s)")
+
+    rng = random.Random(1)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.queries)]
+    modes = {
+        "full-scan query": lambda lat, lon: manager.execute_query(
+            LEGACY_QUERY.format(table="stations"), (lat, lon, lat, args.radius)),
+        "bbox query": lambda lat, lon: manager.get_stations_by_location(lat, lon, args.radius),
+        "catalog index": lambda lat, lon: catalog.nearby(lat, lon, args.radius, limit=args.limit),
+    }
+
+    print(f"{'mode':<16} {'calls':>6} {'p50 ms':>10} {'p99 ms':>10}")
+    try:
+        for name, fn in modes.items():
+            timings = sorted(time_calls(fn, points))
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            print(f"{name:<16} {len(timings):>6} {statistics.median(timings):>10.3f} {p99:>10.3f}")
+
+        queries = [(lat, lon, args.radius, args.limit) for lat, lon in points]
+        batch_modes = {
+            "bbox query per point": lambda: [manager.get_stations_by_location(lat, lon, args.radius)
+                                             for lat, lon in points],
+            "batched query": lambda: manager.get_stations_near_points(queries),
+            "catalog per point": lambda: [catalog.nearby(lat, lon, args.radius, limit=args.limit)
+                                          for lat, lon in points],
+            "catalog batched": lambda: catalog.nearby_many(queries),
+        }
+        print(f"\n{'batch of ' + str(len(points)):<22} {'ms':>10}")
+        for name, fn in batch_modes.items():
+            started = time.perf_counter()
+            fn()
+            print(f"{name:<22} {(time.perf_counter() - started) * 1000:>10.1f}")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
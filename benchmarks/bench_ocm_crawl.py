@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark the OCM ingestion crawl: sequential sleep-paced fetching vs the concurrent crawler.
+
+Serves the Tamil Nadu crawl (eight center points and the India query, see
+OpenChargeMapFetcher.fetch_tamil_nadu_stations) from a simulated OCM: each
+request takes --latency seconds, and requests beyond a --quota requests/sec
+token bucket (burst --quota-burst) get 429 with Retry-After. It then times
+the crawl two ways: the previous fetcher's loop, one request at a time with
+0.5 s sleeps between pages and 1 s between center points, and OCMCrawler
+(db/ocm_crawler.py) with the given --rate, --burst and --concurrency.
+Running the crawler with --rate above --quota shows how it recovers from
+throttling.
+
+Usage: python benchmarks/bench_ocm_crawl.py [--stations 300] [--latency 0.2] [--quota 5]
+                                            [--quota-burst 10] [--rate 4] [--burst 8]
+                                            [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from db.ocm_crawler import OCM_API_URL, OCM_PAGE_SIZE, OCMCrawler  # noqa: E402
+
+CENTER_POINTS = [(11.0168, 76.9558), (13.0827, 80.2707), (9.9252, 78.1198), (10.7905, 78.7047),
+                 (11.2588, 75.7804), (8.0883, 77.5385), (12.9716, 79.1586), (11.6643, 78.1460)]
+
+
+class SimulatedOCM:
+    """MockTransport handler with a fixed latency and a token-bucket quota enforced with 429s."""
+
+    def __init__(self, stations, latency, quota, burst):
+        self.stations = stations
+        self.latency = latency
+        self.quota = quota
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+
+    async def __call__(self, request):
+        self.requests += 1
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.quota)
+        self.updated = now
+        await asyncio.sleep(self.latency)
+        if self.tokens < 1:
+            self.throttled += 1
+            return httpx.Response(429, headers={"Retry-After": f"{(1 - self.tokens) / self.quota:.3f}"})
+        self.tokens -= 1
+        params = request.url.params
+        total = self.stations * (3 if "countrycode" in params else 1)
+        offset, size = int(params["offset"]), int(params["maxresults"])
+        return httpx.Response(200, json=[{"ID": i} for i in range(offset, min(offset + size, total))])
+
+
+def queries():
+    points = [({"latitude": lat, "longitude": lon, "distance": 100, "distanceunit": "km"}, 500)
+              for lat, lon in CENTER_POINTS]
+    return points + [({"countrycode": "IN"}, 1000)]
+
+
+async def sequential(transport):
+    """The fetcher before the crawler: pages one by one, sleeping between pages and center points."""
+    fetched = 0
+    async with httpx.AsyncClient(transport=transport) as client:
+        for query, max_results in queries():
+            stations = []
+            while len(stations) < max_results:
+                params = dict(query, maxresults=min(OCM_PAGE_SIZE, max_results - len(stations)), offset=len(stations))
+                response = await client.get(OCM_API_URL, params=params)
+                if response.status_code != 200:
+                    break
+                page = response.json()
+                if not page:
+                    break
+                stations.extend(page)
+                await asyncio.sleep(0.5)
+            fetched += len(stations)
+            if "latitude" in query:
+                await asyncio.sleep(1)
+    return fetched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=300, help="stations per center point (x3 for India)")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--quota", type=float, default=5.0)
+    parser.add_argument("--quota-burst", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=4.0)
+    parser.add_argument("--burst", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"OCM crawl, {args.stations} stations per center point, {args.latency:g}s latency, "
+          f"quota {args.quota:g} requests/sec (burst {args.quota_burst})")
+    print(f"{'mode':<28} {'seconds':>8} {'stations':>9} {'requests':>9} {'429s':>5} {'req/s':>7}")
+
+    def report(name, seconds, stations, ocm):
+        print(f"{name:<28} {seconds:>8.2f} {stations:>9,} {ocm.requests:>9} {ocm.throttled:>5} "
+              f"{ocm.requests / seconds:>7.2f}")
+
+    ocm = SimulatedOCM(args.stations, args.latency, args.quota, args.quota_burst)
+    started = time.perf_counter()
+    stations = asyncio.run(sequential(httpx.MockTransport(ocm)))
+    report("sequential + sleeps", time.perf_counter() - started, stations, ocm)
+
+    runs = [(args.rate, args.burst), (args.quota * 2, args.quota_burst * 2)]
+    for rate, burst in runs:
+        ocm = SimulatedOCM(args.stations, args.latency, args.quota, args.quota_burst)
+        crawler = OCMCrawler("bench", rate=rate, burst=burst, concurrency=args.concurrency,
+                             transport=httpx.MockTransport(ocm))
+        results = crawler.crawl_sync(queries())
+        stats = crawler.stats()
+        report(f"crawler {rate:g}/s burst {burst} x{args.concurrency}", stats["seconds"],
+               sum(len(r) for r in results if r), ocm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark radius lookups as the stations table grows.
+
+Compares the original query (haversine over every row, filtered with HAVING)
+against the bounding-box prefilter plus ST_DWITHIN used by
+SnowflakeManager.get_stations_by_location, on synthetic station tables of
+increasing size.
+
+By default this runs on the embedded SQLite backend and reports latency and
+rows examined (the whole table for a scan, the bounding box for the prefilter).
+With --snowflake it builds clustered tables with GENERATOR in the configured
+account and also reports bytes and micro-partitions scanned from query history.
+
+Usage: python benchmarks/bench_radius_query.py [--sizes 10000,100000,300000]
+                                               [--radius 10] [--queries 5] [--snowflake]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.snowflake_connector import _radius_predicate  # noqa: E402
+
+# Synthetic stations spread over roughly the Tamil Nadu bounding box
+LAT_RANGE = (8.0, 13.6)
+LON_RANGE = (76.2, 80.4)
+
+LEGACY_QUERY = """
+    SELECT *,
+           (6371 * acos(cos(radians(%s)) * cos(radians(latitude)) *
+            cos(radians(longitude) - radians(%s)) +
+            sin(radians(%s)) * sin(radians(latitude)))) AS distance_km
+    FROM {table}
+    HAVING distance_km <= %s
+    ORDER BY distance_km
+"""
+
+PREFILTER_QUERY = """
+    SELECT * EXCLUDE (location),
+           ST_DISTANCE(location, ST_MAKEPOINT(%s, %s)) / 1000 AS distance_km
+    FROM {table}
+    WHERE {where}
+    ORDER BY distance_km
+"""
+
+
+def build_queries(table, lat, lon, radius_km):
+    where, params = _radius_predicate(lat, lon, radius_km)
+    return {
+        "full scan": (LEGACY_QUERY.format(table=table), (lat, lon, lat, radius_km)),
+        "bbox + dwithin": (PREFILTER_QUERY.format(table=table, where=where), (lon, lat) + params),
+    }
+
+
+def create_local_table(manager, table, n_rows):
+    manager.execute_query(f"DROP TABLE IF EXISTS {table}")
+    manager.execute_query(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, name STRING, "
+                          f"latitude FLOAT, longitude FLOAT, energy_type STRING)")
+    manager.execute_query(f"CREATE INDEX idx_{table}_location ON {table}(latitude, longitude)")
+    rng = random.Random(n_rows)
+    rows = [(i, f"Station {i}", rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE), "CCS")
+            for i in range(n_rows)]
+    manager.execute_many(f"INSERT INTO {table} VALUES (%s, %s, %s, %s, %s)", rows)
+
+
+def create_snowflake_table(manager, table, n_rows):
+    manager.execute_query(f"""
+        CREATE OR REPLACE TRANSIENT TABLE {table}
+        CLUSTER BY (ST_GEOHASH(ST_MAKEPOINT(longitude, latitude), 4)) AS
+        SELECT SEQ4() AS id, 'Station ' || SEQ4() AS name,
+               UNIFORM({LAT_RANGE[0]}::FLOAT, {LAT_RANGE[1]}::FLOAT, RANDOM()) AS latitude,
+               UNIFORM({LON_RANGE[0]}::FLOAT, {LON_RANGE[1]}::FLOAT, RANDOM()) AS longitude,
+               'CCS' AS energy_type
+        FROM TABLE(GENERATOR(ROWCOUNT => {n_rows}))
+        ORDER BY ST_GEOHASH(ST_MAKEPOINT(longitude, latitude), 4)
+    """)
+    manager.execute_query(f"ALTER TABLE {table} ADD COLUMN location GEOGRAPHY AS (ST_MAKEPOINT(longitude, latitude))")
+
+
+def run_query(manager, query, params, snowflake):
+    """Run one query; return (seconds, rows returned, scan stats)."""
+    with manager.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if snowflake:
+                # Measure the warehouse, not the result cache
+                cursor.execute("ALTER SESSION SET USE_CACHED_RESULT = FALSE")
+            started = time.perf_counter()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            seconds = time.perf_counter() - started
+            query_id = getattr(cursor, "sfqid", None)
+        finally:
+            cursor.close()
+
+    scan = {}
+    if snowflake and query_id:
+        # Query history lags slightly behind query completion
+        for _ in range(10):
+            history = manager.execute_query(
+                "SELECT bytes_scanned, partitions_scanned, partitions_total "
+                "FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION()) WHERE query_id = %s", (query_id,))
+            if history:
+                scan = {key.lower(): value for key, value in history[0].items()}
+                break
+            time.sleep(1)
+    return seconds, len(rows), scan
+
+
+def rows_examined(manager, table, n_rows, mode, lat, lon, radius_km):
+    if mode == "full scan":
+        return n_rows
+    where, params = _radius_predicate(lat, lon, radius_km)
+    bbox = where.split(" AND ST_DWITHIN")[0]
+    return manager.execute_query(f'SELECT COUNT(*) AS "n" FROM {table} WHERE {bbox}', params[:4])[0]["n"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,300000")
+    parser.add_argument("--radius", type=float, default=10.0)
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--snowflake", action="store_true", help="run against the configured Snowflake account")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    if args.snowflake:
+        from db.snowflake_connector import SnowflakeManager
+        manager = SnowflakeManager()
+        create_table = create_snowflake_table
+    else:
+        from db.local_backend import LocalManager
+        manager = LocalManager(os.path.join(tempfile.mkdtemp(), "bench_radius.db"))
+        create_table = create_local_table
+
+    rng = random.Random(42)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.queries)]
+
+    print(f"Radius query, {args.radius:g} km, median of {args.queries} points "
+          f"({'Snowflake' if args.snowflake else 'SQLite'})")
+    header = f"{'rows':>10} {'mode':<16} {'median ms':>10} {'results':>8} {'rows examined':>14}"
+    if args.snowflake:
+        header += f" {'MB scanned':>11} {'partitions':>12}"
+    print(header)
+
+    try:
+        for n_rows in sizes:
+            table = f"bench_stations_{n_rows}"
+            create_table(manager, table, n_rows)
+            for mode in ("full scan", "bbox + dwithin"):
+                timings, results, scans = [], [], []
+                for lat, lon in points:
+                    query, params = build_queries(table, lat, lon, args.radius)[mode]
+                    seconds, n_results, scan = run_query(manager, query, params, args.snowflake)
+                    timings.append(seconds)
+                    results.append(n_results)
+                    scans.append(scan)
+
+                line = f"{n_rows:>10,} {mode:<16} {statistics.median(timings) * 1000:>10.1f} {statistics.median(results):>8.0f}"
+                if args.snowflake:
+                    line += f" {'-':>14}"
+                    mb = statistics.median((scan.get("bytes_scanned") or 0) / 1e6 for scan in scans)
+                    parts = scans[-1]
+                    line += f" {mb:>11.2f} {parts.get('partitions_scanned', 0):>5}/{parts.get('partitions_total', 0):<6}"
+                else:
+                    examined = statistics.median(
+                        rows_examined(manager, table, n_rows, mode, lat, lon, args.radius) for lat, lon in points)
+                    line += f" {examined:>14,.0f}"
+                print(line)
+            manager.execute_query(f"DROP TABLE IF EXISTS {table}")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
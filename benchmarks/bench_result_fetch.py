@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark result materialisation in SnowflakeManager.
+
+Compares today's list-of-dicts (execute_query) against named-tuple rows
+(execute_query_rows) and NumPy columns (execute_query_columnar, both from
+fetched rows and from an Arrow result when pyarrow is installed) on a
+station-shaped result set. Each mode runs in a fresh process so that peak
+RSS is measured per mode rather than for the whole run.
+
+Usage: python benchmarks/bench_result_fetch.py [--rows 200000] [--repeat 3]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from multiprocessing import get_context
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLUMNS = ["ID", "OCM_ID", "NAME", "LATITUDE", "LONGITUDE", "ENERGY_TYPE", "AVAILABLE", "TOWN", "STATE", "COUNTRY"]
+
+
+class FakeCursor:
+    """Cursor that serves pre-built rows, so only materialisation cost is measured."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.description = [(name,) for name in COLUMNS]
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeArrowCursor(FakeCursor):
+    """Cursor whose result arrives as Arrow batches, as with the connector's Arrow format."""
+
+    def __init__(self, rows, table):
+        super().__init__(rows)
+        self.table = table
+
+    def fetch_arrow_all(self):
+        return self.table
+
+
+class FakeConnection:
+    def __init__(self, rows, table=None):
+        self.rows = rows
+        self.table = table
+
+    def cursor(self):
+        if self.table is not None:
+            return FakeArrowCursor(self.rows, self.table)
+        return FakeCursor(self.rows)
+
+    def commit(self):
+        pass
+
+
+def make_rows(n):
+    return [
+        (i, 100000 + i, f"Station {i}", 8.0 + (i % 5000) * 0.001, 76.0 + (i % 4000) * 0.001,
+         "CCS, Type 2", i % 7 != 0, f"Town {i % 300}", "Tamil Nadu", "India")
+        for i in range(n)
+    ]
+
+
+def run_mode(mode, n_rows, repeat, queue):
+    from db.snowflake_connector import SnowflakeManager
+
+    manager = SnowflakeManager.__new__(SnowflakeManager)
+    rows = make_rows(n_rows)
+    table = None
+    if mode == "arrow":
+        import pyarrow as pa
+        table = pa.table({name: list(values) for name, values in zip(COLUMNS, zip(*rows))})
+        rows = []
+
+    @contextmanager
+    def get_connection():
+        yield FakeConnection(rows, table)
+
+    manager.get_connection = get_connection
+    fetch = {
+        "dicts": manager.execute_query,
+        "rows": manager.execute_query_rows,
+        "columnar": manager.execute_query_columnar,
+        "arrow": manager.execute_query_columnar,
+    }[mode]
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fetch("SELECT * FROM stations")
+        # Touch every row/column the way an iterating caller would
+        if mode in ("columnar", "arrow"):
+            float(result["LATITUDE"].sum())
+        else:
+            for row in result:
+                pass
+        best = min(best, time.perf_counter() - started)
+        del result
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((mode, n_rows / best, (peak_rss - baseline_rss) / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ctx = get_context("spawn")
+    print(f"Result materialisation, {args.rows:,} rows x {len(COLUMNS)} columns (best of {args.repeat})")
+    print(f"{'mode':<10} {'rows/sec':>14} {'peak RSS delta (MB)':>20}")
+    modes = ["dicts", "rows", "columnar"]
+    try:
+        import pyarrow  # noqa: F401
+        modes.append("arrow")
+    except ImportError:
+        print("pyarrow not installed; skipping the Arrow mode")
+    for mode in modes:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_mode, args=(mode, args.rows, args.repeat, queue))
+        proc.start()
+        name, rate, rss_mb = queue.get()
+        proc.join()
+        print(f"{name:<10} {rate:>14,.0f} {rss_mb:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark /stations/along-route over long routes.
+
+Loads synthetic stations (see bench_nearby.py) into the station catalog and
+builds random-walk routes with thousands of vertices, about 150 m apart
+like a routing engine's polyline. Each route is answered three ways: a
+radius query per segment (catalog.nearby around each segment's midpoint,
+merged and deduplicated), the corridor search over segment bounding boxes
+(StationCatalog.along_route), and the database fallback the endpoint uses
+before the catalog has loaded (one corridor box query + along_polyline).
+
+Usage: python benchmarks/bench_route.py [--stations 100000] [--routes 10]
+                                        [--vertices 5000] [--width 2] [--snowflake]
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from api.stations import _along_route_from_snowflake  # noqa: E402
+from benchmarks.bench_nearby import synthetic_stations  # noqa: E402
+from benchmarks.bench_radius_query import LAT_RANGE, LON_RANGE  # noqa: E402
+from core.station_catalog import StationCatalog  # noqa: E402
+from db.geo import KM_PER_DEGREE_LAT, haversine_km  # noqa: E402
+
+STEP_KM = 0.15
+
+
+def random_route(rng, n_vertices):
+    """A meandering route inside the station area, one vertex every STEP_KM."""
+    lat, lon = rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)
+    heading = rng.uniform(0, 2 * math.pi)
+    lats, lons = [lat], [lon]
+    for _ in range(n_vertices - 1):
+        heading += rng.gauss(0, 0.15)
+        lat += STEP_KM / KM_PER_DEGREE_LAT * math.cos(heading)
+        lon += STEP_KM / (KM_PER_DEGREE_LAT * math.cos(math.radians(lat))) * math.sin(heading)
+        # Turn back at the edge of the station area
+        if not (LAT_RANGE[0] < lat < LAT_RANGE[1] and LON_RANGE[0] < lon < LON_RANGE[1]):
+            heading += math.pi
+        lats.append(lat)
+        lons.append(lon)
+    return lats, lons
+
+
+def per_segment_radius(catalog, lats, lons, width_km):
+    """The naive approach: a radius query around every segment, merged."""
+    found = {}
+    for i in range(len(lats) - 1):
+        half = haversine_km(lats[i], lons[i], lats[i + 1], lons[i + 1]) / 2
+        mid_lat, mid_lon = (lats[i] + lats[i + 1]) / 2, (lons[i] + lons[i + 1]) / 2
+        for station, _ in catalog.nearby(mid_lat, mid_lon, half + width_km):
+            found.setdefault(station.id, i)
+    return sorted(found, key=found.get)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=100000)
+    parser.add_argument("--routes", type=int, default=10)
+    parser.add_argument("--vertices", type=int, default=5000)
+    parser.add_argument("--width", type=float, default=2.0)
+    parser.add_argument("--snowflake", action="store_true", help="query the configured Snowflake account's stations table")
+    args = parser.parse_args()
+
+    if args.snowflake:
+        from db.snowflake_connector import SnowflakeManager
+        manager = SnowflakeManager()
+    else:
+        from db.local_backend import LocalManager
+        manager = LocalManager(os.path.join(tempfile.mkdtemp(), "bench_route.db"))
+        manager.upsert_stations(synthetic_stations(args.stations))
+
+    catalog = StationCatalog(manager)
+    n_loaded = catalog.load()
+    rng = random.Random(4)
+    routes = [random_route(rng, args.vertices) for _ in range(args.routes)]
+    print(f"Along-route search, {n_loaded:,} stations, {args.routes} routes x {args.vertices:,} vertices "
+          f"(~{args.vertices * STEP_KM:,.0f} km), corridor {args.width:g} km "
+          f"({'Snowflake' if args.snowflake else 'SQLite'})")
+
+    modes = {
+        "radius per segment": lambda lats, lons: per_segment_radius(catalog, lats, lons, args.width),
+        "corridor (catalog)": lambda lats, lons: catalog.along_route(lats, lons, args.width),
+        "corridor (database)": lambda lats, lons: _along_route_from_snowflake(manager, lats, lons, args.width),
+    }
+    print(f"{'mode':<22} {'routes':>6} {'p50 ms':>10} {'max ms':>10} {'stations':>9}")
+    try:
+        for name, fn in modes.items():
+            timings, counts = [], []
+            for lats, lons in routes:
+                started = time.perf_counter()
+                counts.append(len(fn(lats, lons)))
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{name:<22} {len(timings):>6} {statistics.median(timings):>10.2f} {max(timings):>10.2f} "
+                  f"{statistics.mean(counts):>9.0f}")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
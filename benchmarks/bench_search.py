@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark /stations/search: the LIKE query vs the in-memory trigram index.
+
+Loads synthetic stations with realistic names and towns into the embedded
+SQLite backend (or uses the configured Snowflake account with --snowflake),
+then times search terms two ways: the original three-column LIKE query, and
+StationSearchIndex.search. It also reports how many misspelled terms each
+approach still finds, since LIKE can't match typos at all.
+
+Usage: python benchmarks/bench_search.py [--stations 100000] [--queries 200] [--snowflake]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from benchmarks.bench_radius_query import LAT_RANGE, LON_RANGE  # noqa: E402
+from core.station_catalog import StationCatalog  # noqa: E402
+from core.station_search import StationSearchIndex  # noqa: E402
+
+OPERATORS = ["Tata Power", "Ather Grid", "Zeon", "Statiq", "ChargeZone", "Jio-bp Pulse", "Fortum", "Magenta"]
+KINDS = ["Charging Station", "EV Hub", "Fast Charger", "Supercharger", "Charge Point"]
+TOWNS = ["Coimbatore", "Bengaluru", "Chennai", "Madurai", "Mysuru", "Kochi", "Tiruppur", "Salem",
+         "Erode", "Hosur", "Mangaluru", "Thrissur", "Palakkad", "Vellore", "Ooty"]
+STATES = {"Coimbatore": "Tamil Nadu", "Chennai": "Tamil Nadu", "Madurai": "Tamil Nadu", "Tiruppur": "Tamil Nadu",
+          "Salem": "Tamil Nadu", "Erode": "Tamil Nadu", "Hosur": "Tamil Nadu", "Vellore": "Tamil Nadu",
+          "Ooty": "Tamil Nadu", "Bengaluru": "Karnataka", "Mysuru": "Karnataka", "Mangaluru": "Karnataka",
+          "Kochi": "Kerala", "Thrissur": "Kerala", "Palakkad": "Kerala"}
+ROADS = ["Avinashi Road", "MG Road", "Trichy Road", "Anna Salai", "Mettupalayam Road", "Ring Road"]
+SEARCH_TERMS = ["coimbatore", "tata power", "supercharger", "kerala", "zeon hub", "mysuru", "anna salai", "fortum"]
+
+
+def synthetic_stations(n):
+    rng = random.Random(n)
+    stations = []
+    for i in range(n):
+        town = rng.choice(TOWNS)
+        stations.append({
+            "ocm_id": i, "name": f"{rng.choice(OPERATORS)} {rng.choice(KINDS)} {i}",
+            "latitude": rng.uniform(*LAT_RANGE), "longitude": rng.uniform(*LON_RANGE),
+            "energy_type": "CCS", "town": town, "state": STATES[town],
+            "address_line1": f"{rng.randint(1, 400)} {rng.choice(ROADS)}",
+        })
+    return stations
+
+
+def misspell(term, rng):
+    i = rng.randrange(1, len(term) - 1)
+    return term[:i] + term[i + 1:] if rng.random() < 0.5 else term[:i] + term[i + 1] + term[i] + term[i + 2:]
+
+
+LIKE_QUERY = """
+    SELECT * EXCLUDE (location) FROM stations
+    WHERE LOWER(name) LIKE LOWER(%s) OR LOWER(town) LIKE LOWER(%s) OR LOWER(state) LIKE LOWER(%s)
+    ORDER BY name
+    LIMIT %s
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--snowflake", action="store_true", help="query the configured Snowflake account's stations table")
+    args = parser.parse_args()
+
+    if args.snowflake:
+        from db.snowflake_connector import SnowflakeManager
+        manager = SnowflakeManager()
+    else:
+        from db.local_backend import LocalManager
+        manager = LocalManager(os.path.join(tempfile.mkdtemp(), "bench_search.db"))
+        manager.upsert_stations(synthetic_stations(args.stations))
+
+    catalog = StationCatalog(manager)
+    index = StationSearchIndex()
+    index.attach(catalog)
+    started = time.perf_counter()
+    n_loaded = catalog.load()
+    print(f"Station search, {n_loaded:,} stations ({'Snowflake' if args.snowflake else 'SQLite'}); "
+          f"catalog load + index build {time.perf_counter() - started:.2f}s, {index.status()['trigrams']:,} trigrams")
+
+    rng = random.Random(2)
+    terms = [rng.choice(SEARCH_TERMS) for _ in range(args.queries)]
+    typos = [misspell(term, rng) for term in terms]
+
+    def like(term):
+        pattern = f"%{term}%"
+        return manager.execute_query(LIKE_QUERY, (pattern, pattern, pattern, args.limit))
+
+    def trigram(term):
+        return index.search(term, args.limit)
+
+    print(f"{'mode':<14} {'calls':>6} {'p50 ms':>10} {'p99 ms':>10} {'typo hits':>10}")
+    try:
+        for name, fn in (("LIKE query", like), ("trigram index", trigram)):
+            timings = []
+            for term in terms:
+                t0 = time.perf_counter()
+                fn(term)
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            found = sum(1 for term in typos if fn(term))
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            print(f"{name:<14} {len(timings):>6} {statistics.median(timings):>10.3f} {p99:>10.3f} "
+                  f"{found:>5}/{len(typos)}")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
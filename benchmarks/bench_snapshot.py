@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark the memory-mapped station snapshot against per-worker catalog loads.
+
+Loads synthetic stations (see bench_filters.py) into the embedded SQLite
+backend and writes a snapshot of them (db/station_snapshot.py). It then
+starts --workers processes, like uvicorn workers, that each build a station
+catalog either from the table or by mapping the snapshot, and reports each
+worker's load time and the memory it added: private memory (its own copy)
+and proportional set size (shared pages split between the workers mapping
+them), read from /proc/self/smaps_rollup. Finally it times nearby lookups
+against both catalogs, since snapshot rows are decoded on access.
+
+Usage: python benchmarks/bench_snapshot.py [--stations 100000] [--workers 4] [--queries 200]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from benchmarks.bench_filters import synthetic_stations  # noqa: E402
+from benchmarks.bench_nearby import time_calls  # noqa: E402
+from benchmarks.bench_radius_query import LAT_RANGE, LON_RANGE  # noqa: E402
+from core.station_catalog import StationCatalog  # noqa: E402
+from db.local_backend import LocalManager  # noqa: E402
+from db.station_snapshot import export_station_snapshot  # noqa: E402
+
+
+def memory_mb():
+    """(private, proportional) memory of this process in MB, from smaps_rollup (Linux)."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return (fields["Private_Clean"] + fields["Private_Dirty"]) / 1024, fields["Pss"] / 1024
+
+
+def worker(db_path, snapshot_path, ready, go, results):
+    manager = LocalManager(db_path)
+    catalog = StationCatalog(manager, snapshot_path=snapshot_path)
+    ready.wait()
+    before = memory_mb()
+    started = time.perf_counter()
+    catalog.load()
+    for lat in range(9, 14):
+        catalog.nearby(float(lat), 78.0, 10, limit=5)
+    seconds = time.perf_counter() - started
+    # Measure once every worker has loaded, so shared pages are counted against all of them
+    go.wait()
+    after = memory_mb()
+    results.put((seconds, after[0] - before[0], after[1] - before[1]))
+    go.wait()
+    manager.close()
+
+
+def run_workers(n, db_path, snapshot_path):
+    context = multiprocessing.get_context("spawn")
+    ready, go, results = context.Barrier(n + 1), context.Barrier(n + 1), context.Queue()
+    processes = [context.Process(target=worker, args=(db_path, snapshot_path, ready, go, results)) for _ in range(n)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    go.wait()
+    measured = [results.get() for _ in processes]
+    go.wait()
+    for process in processes:
+        process.join()
+    return measured
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    db_path, snapshot_path = os.path.join(directory, "bench_snapshot.db"), os.path.join(directory, "stations.snap")
+    manager = LocalManager(db_path)
+    manager.upsert_stations(synthetic_stations(args.stations))
+    header = export_station_snapshot(manager, snapshot_path)
+    print(f"Station snapshot, {header['count']:,} stations, {header['bytes'] / 2 ** 20:.1f} MB "
+          f"written in {header['seconds']}s; {args.workers} workers")
+
+    print(f"{'catalog source':<16} {'load s':>8} {'private MB':>11} {'PSS MB':>8}   (per worker, mean)")
+    for name, path in (("stations table", None), ("snapshot", snapshot_path)):
+        measured = run_workers(args.workers, db_path, path)
+        seconds, private, pss = (statistics.mean(values) for values in zip(*measured))
+        print(f"{name:<16} {seconds:>8.3f} {private:>11.1f} {pss:>8.1f}")
+
+    table, mapped = StationCatalog(manager), StationCatalog(manager, snapshot_path=snapshot_path)
+    table.load()
+    mapped.load()
+    rng = random.Random(1)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.queries)]
+    print(f"\n{'nearby lookup':<16} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for name, catalog in (("stations table", table), ("snapshot", mapped)):
+            timings = sorted(time_calls(lambda lat, lon: catalog.nearby(lat, lon, 10, limit=5), points))
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            print(f"{name:<16} {statistics.median(timings):>8.3f} {p99:>8.3f}")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out before the wait timeout."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of long-lived database connections.
+
+    Connections are created lazily up to ``max_size``. Idle connections are
+    reused most-recently-used first so the hot ones stay warm, checked for
+    liveness on checkout once they have been idle longer than
+    ``health_check_interval`` and closed after ``max_idle_seconds``.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = 5,
+        checkout_timeout: float = 30.0,
+        max_idle_seconds: float = 600.0,
+        health_check_interval: float = 60.0,
+        name: str = "pool",
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._connect = connect
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_interval = health_check_interval
+        self.name = name
+
+        self._lock = threading.Condition()
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._size = 0
+        self._closed = False
+
+        # Metrics
+        self._created = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._health_check_failures = 0
+
+    # --- checkout / checkin ---
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """Check out a healthy connection, waiting up to ``timeout`` seconds for one."""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            evicted = []
+            try:
+                with self._lock:
+                    if self._closed:
+                        raise RuntimeError(f"Connection pool '{self.name}' is closed")
+
+                    evicted = self._pop_expired_locked()
+
+                    conn, idle_since, create = None, None, False
+                    if self._idle:
+                        conn, idle_since = self._idle.pop()
+                    elif self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeoutError(
+                                f"Timed out after {timeout:.1f}s waiting for a connection from '{self.name}'"
+                            )
+                        waited = True
+                        self._lock.wait(remaining)
+                        continue
+            finally:
+                # Closing can block on the network; never do it while holding the lock
+                for expired in evicted:
+                    _close_quietly(expired)
+
+            # Connect and ping outside the lock so other threads are not blocked on I/O
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._created += 1
+            elif time.monotonic() - idle_since > self.health_check_interval and not self._is_healthy(conn):
+                with self._lock:
+                    self._health_check_failures += 1
+                self._discard(conn)
+                continue
+
+            wait = time.monotonic() - started
+            with self._lock:
+                self._checkouts += 1
+                if waited:
+                    self._waits += 1
+                    self._total_wait += wait
+                    self._max_wait = max(self._max_wait, wait)
+            return conn
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """Return a connection to the pool, or close it if it is no longer usable."""
+        if discard or self._closed or _is_closed(conn):
+            self._discard(conn)
+            return
+
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager that checks a connection out and always returns it."""
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except BaseException:
+            # Leave the connection clean for the next borrower; drop it if it died.
+            # BaseException also covers GeneratorExit from abandoned streaming reads.
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            discard = _is_closed(conn)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    # --- maintenance ---
+    def evict_idle(self) -> int:
+        """Close connections that have been idle longer than ``max_idle_seconds``."""
+        with self._lock:
+            evicted = self._pop_expired_locked()
+        for conn in evicted:
+            _close_quietly(conn)
+        return len(evicted)
+
+    def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+        logger.info(f"Connection pool '{self.name}' closed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool size and wait-time metrics."""
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                "name": self.name,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._size - idle,
+                "idle": idle,
+                "created": self._created,
+                "discarded": self._discarded,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "total_wait_ms": round(self._total_wait * 1000, 3),
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "avg_wait_ms": round(self._total_wait * 1000 / self._waits, 3) if self._waits else 0.0,
+                "health_check_failures": self._health_check_failures,
+            }
+
+    # --- internals ---
+    def _pop_expired_locked(self) -> List[Any]:
+        # Only unlinks the expired connections; callers close them once the lock is released.
+        # The left end of the deque holds the connections that have been idle longest
+        evicted = []
+        cutoff = time.monotonic() - self.max_idle_seconds
+        while self._idle and self._idle[0][1] < cutoff:
+            evicted.append(self._idle.popleft()[0])
+        if evicted:
+            self._size -= len(evicted)
+            self._discarded += len(evicted)
+            self._lock.notify(len(evicted))
+            logger.info(f"Evicted {len(evicted)} idle connection(s) from '{self.name}'")
+        return evicted
+
+    def _discard(self, conn: Any) -> None:
+        _close_quietly(conn)
+        with self._lock:
+            self._size -= 1
+            self._discarded += 1
+            self._lock.notify()
+
+    def _is_healthy(self, conn: Any) -> bool:
+        if _is_closed(conn):
+            return False
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            return True
+        except Exception as e:
+            logger.warning(f"Health check failed for pooled connection in '{self.name}': {e}")
+            return False
+        finally:
+            if cursor is not None:
+                _close_quietly(cursor)
+
+
+def _is_closed(conn: Any) -> bool:
+    is_closed = getattr(conn, "is_closed", None)
+    if callable(is_closed):
+        try:
+            return bool(is_closed())
+        except Exception:
+            return True
+    return False
+
+
+def _close_quietly(resource: Any) -> None:
+    try:
+        resource.close()
+    except Exception:
+        pass
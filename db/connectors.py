@@ -0,0 +1,140 @@
+"""Charging connector types as bits of a station's connector mask.
+
+Open Charge Map names connector types in free text ("CCS (Type 2)", "Type 2
+(Socket Only)", "Bharat DC-001"); ingestion folds each title into one of
+CONNECTOR_TYPES and stores the station's set of types as an integer bitmask
+next to its highest connection power, so "has CCS or CHAdeMO" is one AND
+instead of string matching on ``energy_type``.
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+# Canonical connector types, in bit order, and lowercase title fragments
+# identifying them. Matched in order, so CCS claims "CCS (Type 2)" before
+# Type 2 does; titles matching nothing count as "other".
+CONNECTOR_TYPES = (
+    ('ccs', ('ccs', 'combo')),
+    ('chademo', ('chademo',)),
+    ('type2', ('type 2', 'mennekes', 'iec 62196-2')),
+    ('type1', ('type 1', 'j1772')),
+    ('tesla', ('tesla', 'nacs')),
+    ('gbt', ('gb-t', 'gb/t')),
+    ('bharat_ac', ('bharat ac',)),
+    ('bharat_dc', ('bharat dc',)),
+    ('domestic', ('bs1363', '3 pin', '3-pin', 'type d', 'type i ', 'schuko', 'europlug', 'cee 7', 'nema')),
+    ('other', ()),
+)
+CONNECTOR_BITS = {name: 1 << bit for bit, (name, _) in enumerate(CONNECTOR_TYPES)}
+
+# Titles OCM uses when the connection type is not known
+_UNKNOWN_TITLES = ('', 'unknown', 'not specified')
+
+
+def connector_type(title: Optional[str]) -> Optional[str]:
+    """The canonical type of an OCM connection title, or None for an unknown connection."""
+    title = (title or '').strip().lower()
+    if title in _UNKNOWN_TITLES:
+        return None
+    padded = f"{title} "
+    for name, fragments in CONNECTOR_TYPES:
+        if any(fragment in padded for fragment in fragments):
+            return name
+    return 'other'
+
+
+def connector_mask(titles: Iterable[Optional[str]]) -> int:
+    """Bitmask of the connector types among connection titles."""
+    mask = 0
+    for title in titles:
+        name = connector_type(title)
+        if name is not None:
+            mask |= CONNECTOR_BITS[name]
+    return mask
+
+
+def connector_names(mask: int) -> List[str]:
+    """The canonical connector types set in a mask, in bit order."""
+    return [name for name, bit in CONNECTOR_BITS.items() if mask & bit]
+
+
+def mask_from_energy_type(energy_type: Optional[str]) -> int:
+    """Connector mask recovered from a comma-joined ``energy_type``, for rows ingested without one."""
+    return connector_mask((energy_type or '').split(','))
+
+
+def parse_connectors(values: Iterable[str]) -> int:
+    """Mask of the connector types a client asked for.
+
+    Each value may hold several comma-separated types, given as canonical
+    names ("ccs", "type2") or OCM titles ("Type 2 (Socket Only)"). Raises
+    ValueError for a value naming no known type.
+    """
+    mask = 0
+    for value in values:
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            key = part.lower().replace(' ', '_')
+            name = key if key in CONNECTOR_BITS else connector_type(part)
+            if name is None or (name == 'other' and key != 'other'):
+                raise ValueError(f"Unknown connector type: {part!r} (known: {', '.join(CONNECTOR_BITS)})")
+            mask |= CONNECTOR_BITS[name]
+    return mask
+
+
+class ConnectionSummary(NamedTuple):
+    energy_type: str
+    connector_mask: int
+    max_power_kw: Optional[float]
+
+
+def summarize_connections(connections: Optional[List[Dict[str, Any]]]) -> ConnectionSummary:
+    """energy_type, connector mask and highest power (kW) of an OCM station's ``Connections``.
+
+    Power is the connection's PowerKW or, failing that, amps x volts; it is
+    None when no connection states either.
+    """
+    titles: List[str] = []
+    max_power_kw = None
+    for connection in connections or []:
+        title = (connection.get("ConnectionType") or {}).get("Title") or ""
+        if title and title not in titles:
+            titles.append(title)
+        power = connection.get("PowerKW")
+        if not power and connection.get("Amps") and connection.get("Voltage"):
+            power = connection["Amps"] * connection["Voltage"] / 1000
+        if power and (max_power_kw is None or power > max_power_kw):
+            max_power_kw = float(power)
+    return ConnectionSummary(", ".join(titles) if titles else "Unknown", connector_mask(titles), max_power_kw)
+
+
+def station_connector_mask(station: Any) -> int:
+    """A station row's connector mask, derived from ``energy_type`` when the row has none."""
+    get = station.get if isinstance(station, dict) else lambda column: getattr(station, column, None)
+    mask = get('connector_mask')
+    return int(mask) if mask is not None else mask_from_energy_type(get('energy_type'))
+
+
+class StationFilter(NamedTuple):
+    """Attribute filters of a nearby search; the defaults accept every station."""
+    connectors: int = 0
+    min_power_kw: Optional[float] = None
+    available_only: bool = False
+
+    @property
+    def active(self) -> bool:
+        return bool(self.connectors) or self.min_power_kw is not None or self.available_only
+
+    def matches(self, connectors: int, max_power_kw: Optional[float], available: Any) -> bool:
+        """Whether one station passes; stations of unknown power fail a power filter."""
+        if self.connectors and not connectors & self.connectors:
+            return False
+        if self.min_power_kw is not None and (max_power_kw is None or max_power_kw < self.min_power_kw):
+            return False
+        return not self.available_only or bool(available)
+
+    def matches_row(self, station: Any) -> bool:
+        """``matches`` for a station row dict or named tuple."""
+        get = station.get if isinstance(station, dict) else lambda column: getattr(station, column, None)
+        return self.matches(station_connector_mask(station), get('max_power_kw'), get('available'))
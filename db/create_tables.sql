@@ -6,7 +6,7 @@
 -- =====================================================
 CREATE TABLE IF NOT EXISTS stations (
     id INTEGER PRIMARY KEY,
-    ocm_id INTEGER,  -- Open Charge Map ID for reference
+    ocm_id INTEGER,  -- Open Charge Map ID; natural key for ingestion upserts
     name STRING NOT NULL,
     latitude FLOAT NOT NULL,
     longitude FLOAT NOT NULL,
@@ -26,11 +26,17 @@ CREATE TABLE IF NOT EXISTS stations (
     operator_info STRING,
     usage_type STRING,
     status_type STRING,
+    connector_mask INTEGER,  -- bit per connector type (see db/connectors.py), for filtered nearby search
+    max_power_kw FLOAT,  -- highest connection power; NULL when OCM does not state it
+    content_hash STRING,  -- hash of source fields, unchanged rows are skipped on re-ingestion
+    location GEOGRAPHY AS (ST_MAKEPOINT(longitude, latitude)),  -- virtual, for ST_DWITHIN/ST_DISTANCE
     
     -- Timestamps
     created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
     updated_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
-);
+)
+-- Keep nearby stations in the same micro-partitions so lat/lon range filters prune well
+CLUSTER BY (ST_GEOHASH(ST_MAKEPOINT(longitude, latitude), 4));
 
 -- Indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_stations_location ON stations(latitude, longitude);
@@ -38,6 +44,9 @@ CREATE INDEX IF NOT EXISTS idx_stations_country ON stations(country);
 CREATE INDEX IF NOT EXISTS idx_stations_energy_type ON stations(energy_type);
 CREATE INDEX IF NOT EXISTS idx_stations_ocm_id ON stations(ocm_id);
 
+-- Surrogate ids for newly ingested stations (see SnowflakeManager.upsert_stations)
+CREATE SEQUENCE IF NOT EXISTS stations_id_seq START = 1000;
+
 -- =====================================================
 -- USERS TABLE - Enhanced user management
 -- =====================================================
@@ -322,6 +331,7 @@ CREATE TABLE IF NOT EXISTS user_locations (
     status STRING DEFAULT 'active', -- active, hidden, offline
     message STRING, -- Optional help/status message
     contact_method STRING, -- phone/email/in-app
+    location GEOGRAPHY AS (ST_MAKEPOINT(longitude, latitude)),
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
 CREATE INDEX IF NOT EXISTS idx_user_locations_user_id ON user_locations(user_id);
@@ -341,6 +351,7 @@ CREATE TABLE IF NOT EXISTS ev_stores (
     hours STRING,
     services STRING, -- comma-separated list
     website STRING,
+    location GEOGRAPHY AS (ST_MAKEPOINT(longitude, latitude)),
     created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
 );
 CREATE INDEX IF NOT EXISTS idx_ev_stores_location ON ev_stores(latitude, longitude);
@@ -358,6 +369,7 @@ CREATE TABLE IF NOT EXISTS floating_services (
     hours STRING,
     description STRING,
     website STRING,
+    location GEOGRAPHY AS (ST_MAKEPOINT(longitude, latitude)),
     created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
 );
 CREATE INDEX IF NOT EXISTS idx_floating_services_location ON floating_services(latitude, longitude);
@@ -1,11 +1,13 @@
 import os
-import requests
-import time
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import json
-from .snowflake_connector import SnowflakeManager
+from .connectors import summarize_connections
+from .ocm_crawler import OCMCrawler
+from .snowflake_connector import get_snowflake_manager, station_content_hash
+from .station_snapshot import export_station_snapshot
+from .station_stats import summarize_station_stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,7 +17,12 @@ class OpenChargeMapFetcher:
     def __init__(self):
         self.api_key = os.getenv("OCM_API_KEY")
         self.base_url = "https://api.openchargemap.io/v3/poi"
-        self.snowflake_manager = SnowflakeManager()
+        # Concurrent, rate-limited OCM client shared by every fetch
+        self.crawler = OCMCrawler.from_env(self.api_key, base_url=self.base_url)
+        self.crawl_stats: Dict[str, Any] = {}
+        self.snowflake_manager = get_snowflake_manager()
+        # Snapshot the API workers map (see db/station_snapshot.py); rewritten after each ingestion
+        self.snapshot_path = os.getenv("STATION_SNAPSHOT_PATH", "")
         
         # Tamil Nadu bounding box coordinates (approximate)
         self.tamil_nadu_bounds = {
@@ -57,11 +64,29 @@ class OpenChargeMapFetcher:
         
         return False
     
+    @staticmethod
+    def country_query(country_code: str) -> Dict[str, Any]:
+        """OCM query params for every station in a country."""
+        return {"countrycode": country_code}
+
+    @staticmethod
+    def location_query(lat: float, lon: float, radius_km: float = 50) -> Dict[str, Any]:
+        """OCM query params for the stations within a radius of a point."""
+        return {"latitude": lat, "longitude": lon, "distance": radius_km, "distanceunit": "km"}
+
+    def crawl(self, queries: List[tuple]) -> List[List[Dict[str, Any]]]:
+        """Fetch (query params, max results) pairs concurrently; a failed query yields no stations.
+
+        The request rate, burst, concurrency and retries of the crawler come from
+        OCM_CRAWL_* (see db/ocm_crawler.py); its stats are kept in ``self.crawl_stats``.
+        """
+        results = self.crawler.crawl_sync(queries)
+        self.crawl_stats = self.crawler.stats()
+        return [stations or [] for stations in results]
+
     def fetch_tamil_nadu_stations(self, max_results: int = 2000) -> List[Dict[str, Any]]:
         """Fetch stations specifically from Tamil Nadu using multiple approaches."""
-        all_stations = []
-        
-        # Approach 1: Fetch by bounding box (multiple center points)
+        # Approach 1: stations around multiple center points
         center_points = [
             (11.0168, 76.9558),  # Coimbatore
             (13.0827, 80.2707),  # Chennai
@@ -70,28 +95,18 @@ class OpenChargeMapFetcher:
             (11.2588, 75.7804),  # Calicut (nearby)
             (8.0883, 77.5385),   # Kanyakumari
             (12.9716, 79.1586),  # Vellore
-            (10.7905, 78.7047),  # Salem
+            (11.6643, 78.1460),  # Salem
         ]
+        queries = [(self.location_query(lat, lon, radius_km=100), 500) for lat, lon in center_points]
+        # Approach 2: Indian stations, filtered below
+        queries.append((self.country_query("IN"), 1000))
         
-        logger.info("Fetching Tamil Nadu stations using multiple center points...")
-        
-        for lat, lon in center_points:
-            try:
-                stations = self.fetch_stations_by_location(lat, lon, radius_km=100, max_results=500)
-                all_stations.extend(stations)
-                logger.info(f"Fetched {len(stations)} stations from center point ({lat}, {lon})")
-                time.sleep(1)  # Rate limiting
-            except Exception as e:
-                logger.error(f"Error fetching from center point ({lat}, {lon}): {e}")
-        
-        # Approach 2: Fetch by country and filter
-        logger.info("Fetching Indian stations and filtering for Tamil Nadu...")
-        try:
-            indian_stations = self.fetch_stations_by_country("IN", max_results=1000)
-            all_stations.extend(indian_stations)
-            logger.info(f"Fetched {len(indian_stations)} stations from India")
-        except Exception as e:
-            logger.error(f"Error fetching Indian stations: {e}")
+        logger.info("Fetching Tamil Nadu stations from multiple center points and India...")
+        results = self.crawl(queries)
+        for (lat, lon), stations in zip(center_points, results):
+            logger.info(f"Fetched {len(stations)} stations from center point ({lat}, {lon})")
+        logger.info(f"Fetched {len(results[-1])} stations from India")
+        all_stations = [station for stations in results for station in stations]
         
         # Remove duplicates based on OCM ID
         unique_stations = {}
@@ -113,108 +128,23 @@ class OpenChargeMapFetcher:
 
     def fetch_stations_by_country(self, country_code: str = "US", max_results: int = 1000) -> List[Dict[str, Any]]:
         """Fetch stations by country code with pagination."""
-        all_stations = []
-        offset = 0
-        limit = 100  # OCM API limit per request
-        
         logger.info(f"Starting to fetch stations for country: {country_code}")
-        
-        while len(all_stations) < max_results:
-            try:
-                params = {
-                    "key": self.api_key,
-                    "output": "json",
-                    "countrycode": country_code,
-                    "maxresults": min(limit, max_results - len(all_stations)),
-                    "compact": "true",
-                    "verbose": "false",
-                    "offset": offset
-                }
-                
-                logger.info(f"Fetching stations with offset {offset}, limit {params['maxresults']}")
-                
-                response = requests.get(self.base_url, params=params, timeout=30)
-                response.raise_for_status()
-                
-                stations = response.json()
-                
-                if not stations:
-                    logger.info("No more stations to fetch")
-                    break
-                
-                all_stations.extend(stations)
-                logger.info(f"Fetched {len(stations)} stations, total: {len(all_stations)}")
-                
-                offset += len(stations)
-                
-                # Rate limiting - OCM has rate limits
-                time.sleep(0.5)
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching stations: {e}")
-                break
-            except Exception as e:
-                logger.error(f"Unexpected error: {e}")
-                break
-        
-        logger.info(f"Total stations fetched: {len(all_stations)}")
-        return all_stations
+        stations = self.crawl([(self.country_query(country_code), max_results)])[0]
+        logger.info(f"Total stations fetched: {len(stations)}")
+        return stations
     
     def fetch_stations_by_location(self, lat: float, lon: float, radius_km: float = 50, max_results: int = 500) -> List[Dict[str, Any]]:
         """Fetch stations within a radius of a specific location."""
-        all_stations = []
-        offset = 0
-        limit = 100
-        
         logger.info(f"Fetching stations near ({lat}, {lon}) within {radius_km}km")
-        
-        while len(all_stations) < max_results:
-            try:
-                params = {
-                    "key": self.api_key,
-                    "output": "json",
-                    "latitude": lat,
-                    "longitude": lon,
-                    "distance": radius_km,
-                    "distanceunit": "km",
-                    "maxresults": min(limit, max_results - len(all_stations)),
-                    "compact": "true",
-                    "verbose": "false",
-                    "offset": offset
-                }
-                
-                response = requests.get(self.base_url, params=params, timeout=30)
-                response.raise_for_status()
-                
-                stations = response.json()
-                
-                if not stations:
-                    break
-                
-                all_stations.extend(stations)
-                logger.info(f"Fetched {len(stations)} stations, total: {len(all_stations)}")
-                
-                offset += len(stations)
-                time.sleep(0.5)
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching stations: {e}")
-                break
-        
-        return all_stations
+        return self.crawl([(self.location_query(lat, lon, radius_km), max_results)])[0]
     
     def parse_station_data(self, ocm_station: Dict[str, Any]) -> Dict[str, Any]:
         """Parse and clean station data from OCM API response."""
         try:
             address_info = ocm_station.get("AddressInfo", {})
-            connections = ocm_station.get("Connections", [])
             
-            # Extract energy types from connections
-            energy_types = []
-            for conn in connections:
-                connection_type = conn.get("ConnectionType", {}).get("Title", "")
-                if connection_type and connection_type not in energy_types:
-                    energy_types.append(connection_type)
+            # Connection types and power, also as a connector bitmask for filtering
+            connections = summarize_connections(ocm_station.get("Connections", []))
             
             # Get station name
             station_name = address_info.get("Title", "")
@@ -242,12 +172,13 @@ class OpenChargeMapFetcher:
                 return None
             
             parsed_station = {
-                "id": len(energy_types) + 1000,  # Generate unique ID
                 "ocm_id": ocm_station.get("ID"),
                 "name": station_name,
                 "latitude": float(latitude),
                 "longitude": float(longitude),
-                "energy_type": ", ".join(energy_types) if energy_types else "Unknown",
+                "energy_type": connections.energy_type,
+                "connector_mask": connections.connector_mask,
+                "max_power_kw": connections.max_power_kw,
                 "address_line1": address_line1,
                 "address_line2": address_line2,
                 "town": town,
@@ -259,6 +190,8 @@ class OpenChargeMapFetcher:
                 "created_at": datetime.now().isoformat(),
                 "updated_at": datetime.now().isoformat()
             }
+            # ids are assigned by the database on first insert; the hash lets re-runs skip unchanged rows
+            parsed_station["content_hash"] = station_content_hash(parsed_station)
             
             return parsed_station
             
@@ -276,73 +209,41 @@ class OpenChargeMapFetcher:
             # Create tables if they don't exist
             self.snowflake_manager.create_tables()
             
-            # Insert stations in batches
-            batch_size = 100
-            total_inserted = 0
+            # Stage and MERGE on ocm_id so re-running ingestion never duplicates stations
+            report = self.snowflake_manager.upsert_stations(stations)
+            total_inserted = report["inserted"] + report["updated"]
+            if report["rows_rejected"]:
+                logger.warning(f"Rejected {report['rows_rejected']} stations: {report['rejected']}")
+            logger.info(f"Load throughput: {report['rows_per_sec']} rows/sec")
             
-            for i in range(0, len(stations), batch_size):
-                batch = stations[i:i + batch_size]
-                try:
-                    self.snowflake_manager.insert_stations_batch(batch)
-                    total_inserted += len(batch)
-                    logger.info(f"Inserted batch {i//batch_size + 1}: {len(batch)} stations")
-                except Exception as e:
-                    logger.error(f"Error inserting batch {i//batch_size + 1}: {e}")
-                    # Try inserting one by one for this batch
-                    for station in batch:
-                        try:
-                            self.snowflake_manager.insert_station(station)
-                            total_inserted += 1
-                        except Exception as single_error:
-                            logger.error(f"Error inserting station {station.get('ocm_id')}: {single_error}")
-            
-            logger.info(f"Successfully stored {total_inserted} stations in Snowflake")
+            logger.info(f"Successfully stored {total_inserted} stations in Snowflake "
+                        f"({report['inserted']} new, {report['updated']} updated, {report['unchanged']} unchanged)")
             return total_inserted
             
         except Exception as e:
             logger.error(f"Error storing stations in Snowflake: {e}")
             raise
     
+    def write_station_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Rewrite the station snapshot from the stations table, if STATION_SNAPSHOT_PATH is set."""
+        if not self.snapshot_path:
+            return None
+        try:
+            header = export_station_snapshot(self.snowflake_manager, self.snapshot_path)
+            return {"version": header["version"], "stations": header["count"], "bytes": header["bytes"]}
+        except Exception as e:
+            # API workers keep serving the previous snapshot
+            logger.error(f"Error writing station snapshot: {e}")
+            return None
+    
     def get_station_statistics(self) -> Dict[str, Any]:
-        """Get statistics about stored stations."""
+        """Get statistics about stored stations from the materialized station_stats counts."""
         try:
-            total_stations = self.snowflake_manager.get_station_count()
-            
-            # Get stations by state (should be mostly Tamil Nadu)
-            query = """
-                SELECT state, COUNT(*) as count 
-                FROM stations 
-                GROUP BY state 
-                ORDER BY count DESC
-            """
-            state_stats = self.snowflake_manager.execute_query(query)
-            
-            # Get stations by energy type
-            query = """
-                SELECT energy_type, COUNT(*) as count 
-                FROM stations 
-                GROUP BY energy_type 
-                ORDER BY count DESC
-            """
-            energy_type_stats = self.snowflake_manager.execute_query(query)
-            
-            # Get stations by city/town
-            query = """
-                SELECT town, COUNT(*) as count 
-                FROM stations 
-                WHERE town IS NOT NULL AND town != ''
-                GROUP BY town 
-                ORDER BY count DESC
-                LIMIT 10
-            """
-            city_stats = self.snowflake_manager.execute_query(query)
-            
-            return {
-                "total_stations": total_stations,
-                "by_state": state_stats,
-                "by_energy_type": energy_type_stats,
-                "by_city": city_stats
-            }
+            counts = self.snowflake_manager.get_station_stats()
+            if not counts:
+                # First run against an existing stations table: materialize the counts once
+                counts = self.snowflake_manager.rebuild_station_stats()
+            return summarize_station_stats(counts)
             
         except Exception as e:
             logger.error(f"Error getting statistics: {e}")
@@ -368,6 +269,7 @@ class OpenChargeMapFetcher:
             
             # Store in Snowflake
             stored_count = self.store_stations_in_snowflake(parsed_stations)
+            snapshot = self.write_station_snapshot()
             
             # Get statistics
             stats = self.get_station_statistics()
@@ -379,7 +281,9 @@ class OpenChargeMapFetcher:
                     "total_stored": stored_count,
                     "region": "Tamil Nadu, India"
                 },
-                "statistics": stats
+                "statistics": stats,
+                "snapshot": snapshot,
+                "crawl": self.crawl_stats
             }
             
             logger.info(f"Tamil Nadu ingestion complete: {len(stations)} fetched, {len(parsed_stations)} parsed, {stored_count} stored")
@@ -400,12 +304,12 @@ class OpenChargeMapFetcher:
         
         logger.info(f"Starting full ingestion for countries: {countries}")
         
-        for country in countries:
+        # Fetch every country in one concurrent crawl; the crawler paces requests
+        fetched = self.crawl([(self.country_query(country), max_stations_per_country) for country in countries])
+        
+        for country, stations in zip(countries, fetched):
             try:
                 logger.info(f"Processing country: {country}")
-                
-                # Fetch stations for this country
-                stations = self.fetch_stations_by_country(country, max_stations_per_country)
                 total_stations_fetched += len(stations)
                 
                 # Parse station data
@@ -427,13 +331,12 @@ class OpenChargeMapFetcher:
                 
                 logger.info(f"Country {country}: {len(stations)} fetched, {len(parsed_stations)} parsed, {stored_count} stored")
                 
-                # Rate limiting between countries
-                time.sleep(2)
-                
             except Exception as e:
                 logger.error(f"Error processing country {country}: {e}")
                 results[country] = {"error": str(e)}
         
+        snapshot = self.write_station_snapshot()
+        
         # Get final statistics
         stats = self.get_station_statistics()
         
@@ -444,7 +347,9 @@ class OpenChargeMapFetcher:
                 "countries_processed": len(countries)
             },
             "by_country": results,
-            "statistics": stats
+            "statistics": stats,
+            "snapshot": snapshot,
+            "crawl": self.crawl_stats
         }
         
         logger.info(f"Ingestion complete: {total_stations_fetched} fetched, {total_stations_stored} stored")
@@ -468,6 +373,9 @@ def main():
         print(f"Total stations parsed: {results['summary']['total_parsed']}")
         print(f"Total stations stored: {results['summary']['total_stored']}")
         print(f"Region: {results['summary']['region']}")
+        crawl = results.get('crawl') or {}
+        print(f"OCM requests: {crawl.get('requests', 0)} in {crawl.get('seconds', 0)}s "
+              f"({crawl.get('requests_per_sec', 0)} requests/sec, {crawl.get('retries', 0)} retries)")
         print("\nResults saved to: tamil_nadu_ocm_ingestion_results.json")
         
         # Print statistics
@@ -0,0 +1,220 @@
+import math
+from typing import Dict, List, Tuple
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometers."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_array(lat1, lon1, lat2, lon2, float32: bool = False) -> np.ndarray:
+    """Element-wise great-circle distances in kilometers between arrays of points, in degrees.
+
+    Inputs broadcast like any NumPy operation: one origin against many
+    destinations, matching arrays of origin/destination pairs, or a full
+    distance matrix from ``lat1[:, None]`` against ``lat2[None, :]`` (see
+    haversine_matrix_km). ``float32`` halves memory traffic at roughly
+    metre-level accuracy, which is plenty for ranking stations.
+    """
+    dtype = np.float32 if float32 else np.float64
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=dtype)) for v in (lat1, lon1, lat2, lon2))
+    return haversine_km_radians(lat1, lon1, lat2, lon2)
+
+
+def haversine_km_radians(lat1, lon1, lat2, lon2, cos_lat1=None, cos_lat2=None) -> np.ndarray:
+    """haversine_km_array for coordinates already in radians.
+
+    Callers that query the same points repeatedly (like the spatial index) can
+    keep radians and ``cos(lat)`` precomputed and pass them in.
+    """
+    cos_lat1 = np.cos(lat1) if cos_lat1 is None else cos_lat1
+    cos_lat2 = np.cos(lat2) if cos_lat2 is None else cos_lat2
+    a = np.sin((lat2 - lat1) * 0.5) ** 2 + cos_lat1 * cos_lat2 * np.sin((lon2 - lon1) * 0.5) ** 2
+    # Rounding can push a just past 1 for antipodal points
+    return (2 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def haversine_matrix_km(lats1, lons1, lats2, lons2, float32: bool = False) -> np.ndarray:
+    """Distance matrix in kilometers: row i holds the distances from point i of the first set."""
+    return haversine_km_array(np.asarray(lats1)[:, None], np.asarray(lons1)[:, None],
+                              np.asarray(lats2)[None, :], np.asarray(lons2)[None, :], float32=float32)
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) enclosing every point within ``radius_km``.
+
+    Used as a cheap, index- and pruning-friendly prefilter ahead of the exact
+    distance test. Near the poles, or when the box would cross the antimeridian,
+    the longitude range widens to the whole globe so nothing is missed.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = max(-90.0, lat - delta_lat), min(90.0, lat + delta_lat)
+
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    # Longitude degrees shrink with latitude; use the box edge nearest a pole
+    widest = max(abs(min_lat), abs(max_lat))
+    delta_lon = radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(widest)))
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180.0 or max_lon > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def bounding_boxes(lats, lons, radii_km) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """bounding_box for arrays of points and radii, as (min_lats, max_lats, min_lons, max_lons)."""
+    lats, lons, radii_km = np.broadcast_arrays(np.asarray(lats, dtype=np.float64),
+                                               np.asarray(lons, dtype=np.float64),
+                                               np.asarray(radii_km, dtype=np.float64))
+    delta_lat = radii_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = np.maximum(-90.0, lats - delta_lat), np.minimum(90.0, lats + delta_lat)
+    widest = np.maximum(np.abs(min_lat), np.abs(max_lat))
+    with np.errstate(divide="ignore"):
+        delta_lon = radii_km / (KM_PER_DEGREE_LAT * np.cos(np.radians(widest)))
+    min_lon, max_lon = lons - delta_lon, lons + delta_lon
+    whole = (min_lat <= -90.0) | (max_lat >= 90.0) | (min_lon < -180.0) | (max_lon > 180.0)
+    return min_lat, max_lat, np.where(whole, -180.0, min_lon), np.where(whole, 180.0, max_lon)
+
+
+# Arrays of a built lat/lon grid index (see core/spatial_index.GridIndex), by name
+GRID_INDEX_ARRAYS = ('keys', 'positions', 'lat', 'lon', 'cos_lat')
+
+
+def grid_shape(cell_deg: float) -> Tuple[int, int]:
+    """(rows, columns) of a ``cell_deg`` grid over the globe."""
+    return int(math.ceil(180 / cell_deg)), int(math.ceil(360 / cell_deg))
+
+
+def grid_cell_keys(lats, lons, cell_deg: float) -> np.ndarray:
+    """Row-major ids of the ``cell_deg`` grid cells holding each point."""
+    n_rows, n_cols = grid_shape(cell_deg)
+    rows = np.clip(((np.asarray(lats) + 90) // cell_deg).astype(np.int64), 0, n_rows - 1)
+    cols = np.clip(((np.asarray(lons) + 180) // cell_deg).astype(np.int64), 0, n_cols - 1)
+    return rows * n_cols + cols
+
+
+def grid_index_arrays(lats, lons, cell_deg: float) -> Dict[str, np.ndarray]:
+    """The GRID_INDEX_ARRAYS of points sorted by cell: cell ids, original positions, radians and cos(lat)."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if lats.shape != lons.shape:
+        raise ValueError("lats and lons must have the same length")
+    keys = grid_cell_keys(lats, lons, cell_deg)
+    order = np.argsort(keys, kind="stable")
+    lat = np.radians(lats[order])
+    return dict(zip(GRID_INDEX_ARRAYS, (keys[order], order, lat, np.radians(lons[order]), np.cos(lat))))
+
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    """Standard base-32 geohash of a point."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """(lat_degrees, lon_degrees) spanned by one geohash cell of this precision."""
+    n_bits = 5 * precision
+    return 180.0 / 2 ** (n_bits // 2), 360.0 / 2 ** ((n_bits + 1) // 2)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def geohashes_in_box(min_lat: float, max_lat: float, min_lon: float, max_lon: float, precision: int) -> List[str]:
+    """Geohash cells of one precision that intersect a lat/lon box."""
+    lat_step, lon_step = geohash_cell_size(precision)
+    first_lat = math.floor((min_lat + 90) / lat_step) * lat_step - 90
+    first_lon = math.floor((min_lon + 180) / lon_step) * lon_step - 180
+    cells = []
+    lat = first_lat
+    while lat <= max_lat and lat < 90:
+        lon = first_lon
+        while lon <= max_lon and lon < 180:
+            cells.append(geohash_encode(lat + lat_step / 2, lon + lon_step / 2, precision))
+            lon += lon_step
+        lat += lat_step
+    return cells
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    """(lat, lon) vertices of an encoded polyline (Google's format; precision 6 for OSRM/Valhalla).
+
+    Raises ValueError for strings that are not valid polylines.
+    """
+    factor = 10 ** precision
+    points, index, lat, lon = [], 0, 0, 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            result, shift = 0, 0
+            while True:
+                if index >= length:
+                    raise ValueError("Truncated polyline")
+                byte = ord(encoded[index]) - 63
+                index += 1
+                if not 0 <= byte < 64:
+                    raise ValueError(f"Invalid polyline character at position {index - 1}")
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+def encode_polyline(points: List[Tuple[float, float]], precision: int = 5) -> str:
+    """Encode (lat, lon) vertices as a polyline; the inverse of decode_polyline."""
+    factor = 10 ** precision
+    chars, last_lat, last_lon = [], 0, 0
+    for lat, lon in points:
+        lat, lon = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (lat - last_lat, lon - last_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chars.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chars.append(chr(value + 63))
+        last_lat, last_lon = lat, lon
+    return "".join(chars)
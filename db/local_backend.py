@@ -0,0 +1,321 @@
+import os
+import re
+import math
+import time
+import sqlite3
+import logging
+from typing import Any, Dict, List, Optional
+from .connection_pool import ConnectionPool
+from .geo import haversine_km
+from .query_stats import record_query
+from .snowflake_connector import SnowflakeManager, STATION_ADDED_COLUMNS, STATION_LOAD_COLUMNS, _split_valid_stations, _station_row, _load_report
+
+logger = logging.getLogger(__name__)
+
+# Snowflake-only syntax rewritten for SQLite, applied in order
+_DIALECT_REWRITES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bTIMESTAMP_NTZ\b", re.I), "TIMESTAMP"),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bCURRENT_DATE\(\)", re.I), "CURRENT_DATE"),
+    (re.compile(r"\bINTEGER\s+AUTOINCREMENT\s+PRIMARY\s+KEY\b", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bTO_DATE\(", re.I), "date("),
+    # INTEGER PRIMARY KEY columns take the next rowid when given NULL
+    (re.compile(r"\b\w+\.NEXTVAL\b", re.I), "NULL"),
+    # There is no GEOGRAPHY column locally: points are built from latitude/longitude,
+    # and distance functions over two points become plain lon/lat functions.
+    (re.compile(r"((?:\w+\.)?\*)\s+EXCLUDE\s*\(\s*location\s*\)", re.I), r"\1"),
+    (re.compile(r"\b(ST_DWITHIN|ST_DISTANCE)\(\s*((?:\w+\.)?)location\s*,", re.I),
+     r"\1(ST_MAKEPOINT(\2longitude, \2latitude),"),
+    (re.compile(r"\b(ST_DWITHIN|ST_DISTANCE)\(\s*ST_MAKEPOINT\(([^()]*)\)\s*,\s*ST_MAKEPOINT\(([^()]*)\)", re.I),
+     r"\1_LONLAT(\2, \3"),
+]
+
+_DATEADD = re.compile(r"\bDATEADD\(\s*(\w+)\s*,\s*([-+]?\d+)\s*,\s*([^,()]+?)\s*\)", re.I)
+
+_MERGE = re.compile(
+    r"^\s*MERGE\s+INTO\s+(?P<table>\w+)(?:\s+AS)?\s+(?P<target>\w+)\s+"
+    r"USING\s+(?P<source>.+?)\s+(?:AS\s+)?(?P<alias>\w+)\s+"
+    r"ON\s+(?P<on>.+?)\s+"
+    r"WHEN\s+MATCHED(?:\s+AND\s+(?P<condition>.+?))?\s+THEN\s+UPDATE\s+SET\s+(?P<set>.+?)\s+"
+    r"WHEN\s+NOT\s+MATCHED\s+THEN\s+INSERT\s*\((?P<columns>.+?)\)\s*VALUES\s*\((?P<values>.+)\)\s*;?\s*$",
+    re.I | re.S,
+)
+
+
+def translate_sql(query: str) -> str:
+    """Rewrite the Snowflake constructs this codebase uses into SQLite syntax.
+
+    Covers MERGE (as INSERT ... ON CONFLICT), DATEADD, TO_DATE, TIMESTAMP_NTZ,
+    AUTOINCREMENT column definitions, HAVING without GROUP BY, %s parameters,
+    sequences, and the ST_DWITHIN/ST_DISTANCE radius queries on ``location``.
+    """
+    merge = _MERGE.match(query)
+    if merge:
+        query = _translate_merge(merge)
+
+    for pattern, replacement in _DIALECT_REWRITES:
+        query = pattern.sub(replacement, query)
+    query = _DATEADD.sub(_translate_dateadd, query)
+
+    # Snowflake accepts HAVING on a non-aggregate query as a filter on select aliases;
+    # SQLite resolves aliases in WHERE, so that is the equivalent there.
+    if re.search(r"\bHAVING\b", query, re.I) and not re.search(r"\bGROUP\s+BY\b", query, re.I):
+        query = re.sub(r"\bHAVING\b", "WHERE", query, flags=re.I)
+    return query
+
+
+def _translate_dateadd(match: re.Match) -> str:
+    unit, amount, expr = match.group(1).lower(), int(match.group(2)), match.group(3)
+    return f"datetime({expr}, '{amount:+d} {unit}')"
+
+
+def _translate_merge(match: re.Match) -> str:
+    table, target, alias = match.group("table"), match.group("target"), match.group("alias")
+    source = match.group("source").strip()
+
+    on = re.match(r"(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)$", match.group("on").strip())
+    if not on:
+        raise ValueError(f"Unsupported MERGE condition for SQLite: {match.group('on')}")
+    key = on.group(2) if on.group(1) == target else on.group(4)
+
+    def to_upsert(expr: str) -> str:
+        expr = re.sub(rf"\b{alias}\.", "excluded.", expr)
+        return re.sub(rf"\b{target}\.", f"{table}.", expr)
+
+    sql = (
+        f"INSERT INTO {table} ({match.group('columns')}) "
+        f"SELECT {match.group('values')} FROM {source} AS {alias} WHERE true "
+        f"ON CONFLICT({key}) DO UPDATE SET {to_upsert(match.group('set'))}"
+    )
+    if match.group("condition"):
+        sql += f" WHERE {to_upsert(match.group('condition'))}"
+    return sql
+
+
+def _register_functions(conn: sqlite3.Connection) -> None:
+    """Register the scalar SQL functions Snowflake provides and SQLite may lack."""
+    def unary(fn):
+        return lambda x: None if x is None else fn(x)
+
+    conn.create_function("radians", 1, unary(math.radians), deterministic=True)
+    conn.create_function("degrees", 1, unary(math.degrees), deterministic=True)
+    conn.create_function("sin", 1, unary(math.sin), deterministic=True)
+    conn.create_function("cos", 1, unary(math.cos), deterministic=True)
+    conn.create_function("sqrt", 1, unary(math.sqrt), deterministic=True)
+    # Rounding can push the haversine cosine term just past 1.0; clamp like Snowflake does
+    conn.create_function("acos", 1, unary(lambda x: math.acos(max(-1.0, min(1.0, x)))), deterministic=True)
+
+    # Geography functions over (lon, lat) pairs, distances in meters like Snowflake's
+    def distance_m(lon1, lat1, lon2, lat2):
+        if None in (lon1, lat1, lon2, lat2):
+            return None
+        return haversine_km(lat1, lon1, lat2, lon2) * 1000
+
+    def dwithin(lon1, lat1, lon2, lat2, meters):
+        distance = distance_m(lon1, lat1, lon2, lat2)
+        return None if distance is None or meters is None else int(distance <= meters)
+
+    conn.create_function("st_distance_lonlat", 4, distance_m, deterministic=True)
+    conn.create_function("st_dwithin_lonlat", 5, dwithin, deterministic=True)
+
+
+class _CursorAdapter:
+    """Cursor wrapper that translates Snowflake SQL before handing it to SQLite."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, query: str, params: Optional[tuple] = None):
+        return self._cursor.execute(translate_sql(query), params or ())
+
+    def executemany(self, query: str, params_list: List[tuple]):
+        conn = self._cursor.connection
+        if conn.in_transaction:
+            return self._cursor.executemany(translate_sql(query), params_list)
+        # Connections run in autocommit mode; one transaction per batch instead of per row
+        conn.execute("BEGIN")
+        try:
+            result = self._cursor.executemany(translate_sql(query), params_list)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _ConnectionAdapter:
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self) -> _CursorAdapter:
+        return _CursorAdapter(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class LocalManager(SnowflakeManager):
+    """SnowflakeManager running on an embedded SQLite database.
+
+    Exposes the same methods (execute_query, get_stations_by_location,
+    upsert_user_location, log_session, ...) so the API can run and be
+    benchmarked offline. Select it with DB_BACKEND=sqlite; LOCAL_DB_PATH sets
+    the database file (":memory:" for a throwaway in-process database).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("LOCAL_DB_PATH", "ev_local.db")
+        self.connection_params = {'database': self.path}
+
+        self._uri = self.path == ":memory:"
+        if self._uri:
+            # Give every pooled connection the same named in-memory database and
+            # keep one connection open so it outlives individual checkouts.
+            self._target = f"file:ev_local_{id(self)}?mode=memory&cache=shared"
+        else:
+            self._target = self.path
+        self._anchor = self._connect() if self._uri else None
+
+        self.pool = ConnectionPool(
+            self._connect,
+            max_size=int(os.getenv("LOCAL_DB_POOL_SIZE", "8")),
+            max_idle_seconds=float(os.getenv("SNOWFLAKE_POOL_MAX_IDLE_SECONDS", "600")),
+            health_check_interval=float(os.getenv("SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS", "60")),
+            name="sqlite",
+        )
+        self._init_executors()
+        self.create_tables()
+        logger.info(f"Using local SQLite backend at {self.path}")
+
+    def _connect(self) -> _ConnectionAdapter:
+        conn = sqlite3.connect(self._target, uri=self._uri, check_same_thread=False, isolation_level=None)
+        if not self._uri:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _register_functions(conn)
+        return _ConnectionAdapter(conn)
+
+    def close(self) -> None:
+        super().close()
+        if self._anchor is not None:
+            self._anchor.close()
+            self._anchor = None
+
+    def create_tables(self) -> None:
+        """Create the Snowflake schema in SQLite plus the indexes the local planner needs."""
+        super().create_tables()
+        for statement in [
+            "CREATE INDEX IF NOT EXISTS idx_stations_location ON stations(latitude, longitude)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_stations_ocm_id ON stations(ocm_id)",
+            "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_user_locations_location ON user_locations(latitude, longitude)",
+            "CREATE INDEX IF NOT EXISTS idx_ev_stores_location ON ev_stores(latitude, longitude)",
+            "CREATE INDEX IF NOT EXISTS idx_floating_services_location ON floating_services(latitude, longitude)",
+        ]:
+            self.execute_query(statement)
+
+    def _statement_kwargs(self) -> Dict[str, Any]:
+        # SQLite has no query tag; queries are still timed and attributed in query_stats
+        return {}
+
+    def _ensure_column(self, table: str, column: str, column_type: str) -> None:
+        columns = [row['name'] for row in self.execute_query(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            self.execute_query(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def _create_sequence(self, name: str, start: int = 1) -> None:
+        # Ids come from INTEGER PRIMARY KEY rowids instead of a sequence
+        pass
+
+    def _ensure_spatial_columns(self) -> None:
+        # translate_sql derives points from latitude/longitude; the (latitude, longitude)
+        # indexes serve the bounding-box prefilter instead of clustering
+        pass
+
+    def _prepare_station_staging(self) -> None:
+        self.execute_query("CREATE TABLE IF NOT EXISTS stations_staging AS SELECT * FROM stations WHERE 1 = 0")
+        for column, column_type in STATION_ADDED_COLUMNS.items():
+            self._ensure_column('stations_staging', column, column_type)
+        self.execute_query("DELETE FROM stations_staging")
+
+    def _merge_staged_stations(self) -> tuple:
+        # SQLite reports one combined change count for an upsert; split it using the row count
+        before = self.get_station_count()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            query = self._station_merge_sql()
+            started, failed, changed = time.perf_counter(), True, 0
+            try:
+                cursor.execute(query)
+                changed = cursor.rowcount
+                failed = False
+            finally:
+                record_query(query, started, max(changed, 0), 0, error=failed)
+                cursor.close()
+        inserted = self.get_station_count() - before
+        return inserted, changed - inserted
+
+    def apply_station_stats_delta(self, delta: Dict[Any, int]) -> None:
+        # No MERGE from a VALUES list here; the upsert form adds to existing counts
+        if not delta:
+            return
+        self.execute_many(
+            "INSERT INTO station_stats (dimension, value, station_count) VALUES (%s, %s, %s) "
+            "ON CONFLICT(dimension, value) DO UPDATE SET "
+            "station_count = station_count + excluded.station_count, updated_at = CURRENT_TIMESTAMP",
+            [(dimension, value, n) for (dimension, value), n in delta.items()])
+
+    def bulk_load_stations(self, stations: List[Dict[str, Any]], table: str = 'stations') -> Dict[str, Any]:
+        """Load stations in a single executemany transaction; SQLite has no stage to COPY from.
+
+        Rows that fail validation or collide with an existing key are rejected
+        individually and listed in ``rejected``, matching COPY INTO ... ON_ERROR = CONTINUE.
+        """
+        started = time.perf_counter()
+        valid, rejected = _split_valid_stations(stations)
+        loaded = 0
+        if valid:
+            query = translate_sql(
+                f"INSERT OR IGNORE INTO {table} ({', '.join(STATION_LOAD_COLUMNS)}) "
+                f"VALUES ({', '.join(['%s'] * len(STATION_LOAD_COLUMNS))})"
+            )
+            params_list = [_station_row(station) for station in valid]
+            with self.get_connection() as conn:
+                conn.execute("BEGIN")
+                try:
+                    started_batch, failed = time.perf_counter(), True
+                    try:
+                        loaded = conn.executemany(query, params_list).rowcount
+                        failed = False
+                    finally:
+                        record_query(query, started_batch, len(params_list), 0, error=failed)
+                    if loaded < len(valid):
+                        # Some rows were skipped; redo the batch row by row to report which
+                        conn.execute("ROLLBACK")
+                        conn.execute("BEGIN")
+                        loaded = 0
+                        started_batch, failed = time.perf_counter(), True
+                        try:
+                            for station, params in zip(valid, params_list):
+                                if conn.execute(query, params).rowcount:
+                                    loaded += 1
+                                else:
+                                    rejected.append({"ocm_id": station.get('ocm_id'),
+                                                     "error": "conflicts with an existing id or ocm_id"})
+                            failed = False
+                        finally:
+                            # Recorded as one statement, like an executemany batch
+                            record_query(query, started_batch, len(params_list), 0, error=failed)
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+        
+        report = _load_report(loaded, len(stations) - loaded, rejected, started)
+        logger.info(f"Bulk loaded {loaded} rows into {table} in {report['seconds']}s "
+                    f"({report['rows_per_sec']} rows/sec), {report['rows_rejected']} rejected")
+        return report
@@ -0,0 +1,205 @@
+"""Concurrent Open Charge Map crawler for station ingestion.
+
+Queries (center points, countries) run concurrently over one pooled HTTP
+client, with pages of one query fetched in order. Every request first takes
+a token from a shared TokenBucket, so the crawl runs at the configured rate
+however many requests are in flight, and 429 and 5xx responses are retried
+with jittered exponential backoff. OCM does not publish a fixed quota, so a
+429 carrying Retry-After also pauses the bucket for every request, letting
+the crawl settle at whatever rate the key is actually allowed.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OCM_API_URL = "https://api.openchargemap.io/v3/poi"
+# Results per request; OCM pages with offset
+OCM_PAGE_SIZE = 100
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` requests per second on average, bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait for a token. Waiters are served in arrival order."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for ``seconds`` (the server asked us to back off); the burst is spent."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+
+class OCMRequestError(Exception):
+    """An OCM request that failed for good: a non-retryable status or retries exhausted."""
+
+
+class OCMCrawler:
+    """Fetches OCM POIs for many queries concurrently within a request rate.
+
+    ``concurrency`` caps requests in flight (and pooled connections);
+    ``rate``/``burst`` configure the token bucket. Retries wait a random time
+    up to ``backoff_base * 2 ** attempt`` seconds (capped at ``backoff_max``),
+    or Retry-After when the server sends one. Pass ``transport`` to talk to
+    something other than the network (tests, benchmarks).
+    """
+
+    def __init__(self, api_key: str, rate: float = 2.0, burst: int = 5, concurrency: int = 4,
+                 max_retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 timeout: float = 30.0, base_url: str = OCM_API_URL,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = api_key
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.base_url = base_url
+        self.transport = transport
+        self._reset_stats()
+
+    @classmethod
+    def from_env(cls, api_key: str, **overrides) -> "OCMCrawler":
+        """A crawler configured from the OCM_CRAWL_* environment variables (see env_template.txt)."""
+        settings = {
+            "rate": float(os.getenv("OCM_CRAWL_RATE_PER_SECOND", "2")),
+            "burst": int(os.getenv("OCM_CRAWL_BURST", "5")),
+            "concurrency": int(os.getenv("OCM_CRAWL_CONCURRENCY", "4")),
+            "max_retries": int(os.getenv("OCM_CRAWL_MAX_RETRIES", "5")),
+        }
+        settings.update(overrides)
+        return cls(api_key, **settings)
+
+    def _reset_stats(self) -> None:
+        self._stats = {"requests": 0, "retries": 0, "throttled": 0, "failed_queries": 0, "stations": 0, "seconds": 0.0}
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts of the last crawl, with the request rate achieved over its wall clock."""
+        seconds = self._stats["seconds"]
+        return dict(self._stats, seconds=round(seconds, 3),
+                    requests_per_sec=round(self._stats["requests"] / seconds, 2) if seconds else 0.0)
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # "Full jitter": spreads retries of concurrent requests instead of retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _get(self, client: httpx.AsyncClient, bucket: TokenBucket, semaphore: asyncio.Semaphore,
+                   params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            response, error = None, None
+            async with semaphore:
+                self._stats["requests"] += 1
+                try:
+                    response = await client.get(self.base_url, params=params)
+                except httpx.TransportError as e:
+                    error = e
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                if response.status_code >= 400:
+                    raise OCMRequestError(f"OCM returned {response.status_code} for {params}")
+                return response.json()
+
+            if attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt, response)
+            if response is not None and response.status_code == 429:
+                self._stats["throttled"] += 1
+                if "Retry-After" in response.headers:
+                    bucket.pause(delay)
+            self._stats["retries"] += 1
+            logger.info(f"Retrying OCM request in {delay:.2f}s after "
+                        f"{response.status_code if response is not None else repr(error)}")
+            await asyncio.sleep(delay)
+        raise OCMRequestError(f"OCM request failed after {self.max_retries + 1} attempts: "
+                              f"{response.status_code if response is not None else repr(error)}")
+
+    async def _fetch_query(self, client, bucket, semaphore, query: Dict[str, Any],
+                           max_results: int) -> List[Dict[str, Any]]:
+        stations: List[Dict[str, Any]] = []
+        while len(stations) < max_results:
+            page_size = min(OCM_PAGE_SIZE, max_results - len(stations))
+            params = dict(query, key=self.api_key, output="json", compact="true", verbose="false",
+                          maxresults=page_size, offset=len(stations))
+            try:
+                page = await self._get(client, bucket, semaphore, params)
+            except OCMRequestError as e:
+                if not stations:
+                    raise
+                # Keep the pages already fetched
+                logger.error(f"Stopping OCM query {query} after {len(stations)} stations: {e}")
+                self._stats["failed_queries"] += 1
+                break
+            stations.extend(page)
+            if len(page) < page_size:
+                break
+        return stations
+
+    async def crawl(self, queries: List[Tuple[Dict[str, Any], int]]) -> List[Optional[List[Dict[str, Any]]]]:
+        """POIs for each (OCM query params, max results) pair, in order; None for a query that failed.
+
+        A failed query is logged and leaves the others running; one failing
+        after its first page keeps the pages it already has.
+        """
+        self._reset_stats()
+        started = time.perf_counter()
+        bucket = TokenBucket(self.rate, self.burst)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits, transport=self.transport) as client:
+            results = await asyncio.gather(*(self._fetch_query(client, bucket, semaphore, query, max_results)
+                                             for query, max_results in queries), return_exceptions=True)
+
+        for (query, _), result in zip(queries, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Error fetching OCM stations for {query}: {result}")
+                self._stats["failed_queries"] += 1
+        results = [None if isinstance(result, BaseException) else result for result in results]
+        self._stats["stations"] = sum(len(result) for result in results if result)
+        self._stats["seconds"] = time.perf_counter() - started
+        stats = self.stats()
+        logger.info(f"Crawled {stats['stations']} OCM stations with {stats['requests']} requests "
+                    f"in {stats['seconds']}s ({stats['requests_per_sec']} requests/sec, {stats['retries']} retries)")
+        return results
+
+    def crawl_sync(self, queries: List[Tuple[Dict[str, Any], int]]) -> List[Optional[List[Dict[str, Any]]]]:
+        """``crawl`` from synchronous code such as the ingestion job."""
+        return asyncio.run(self.crawl(queries))
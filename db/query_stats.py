@@ -0,0 +1,159 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("db.slow_queries")
+
+SLOW_QUERY_MS = float(os.getenv("SNOWFLAKE_SLOW_QUERY_MS", "1000"))
+
+# Set per request by the API so queries carry the calling route; copied into executor threads
+_query_tag: ContextVar[Optional[str]] = ContextVar("query_tag", default=None)
+_request_stats: ContextVar[Optional["RequestQueryStats"]] = ContextVar("request_query_stats", default=None)
+
+
+class RequestQueryStats:
+    """Query count and DB time accumulated over one request (or any other unit of work)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_query_id: Optional[str] = None
+
+    def add(self, elapsed_ms: float, rows: int, nbytes: int, query_id: Optional[str], error: bool) -> None:
+        # Queries of one request may run concurrently on several executor threads
+        with self._lock:
+            self.queries += 1
+            self.errors += int(error)
+            self.rows += rows
+            self.bytes += nbytes
+            self.total_ms += elapsed_ms
+            if elapsed_ms > self.slowest_ms:
+                self.slowest_ms = elapsed_ms
+                self.slowest_query_id = query_id
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "errors": self.errors,
+                "rows": self.rows,
+                "bytes": self.bytes,
+                "total_ms": round(self.total_ms, 3),
+                "slowest_ms": round(self.slowest_ms, 3),
+                "slowest_query_id": self.slowest_query_id,
+            }
+
+
+class QueryMetrics:
+    """Process-wide query totals per query tag, plus per-route request summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_tag: Dict[str, Dict[str, float]] = {}
+        self._by_route: Dict[str, Dict[str, float]] = {}
+
+    def record_query(self, tag: Optional[str], elapsed_ms: float, rows: int, nbytes: int,
+                     slow: bool, error: bool) -> None:
+        with self._lock:
+            entry = self._by_tag.setdefault(tag or "untagged", {
+                "queries": 0, "errors": 0, "slow_queries": 0, "rows": 0, "bytes": 0,
+                "total_ms": 0.0, "max_ms": 0.0,
+            })
+            entry["queries"] += 1
+            entry["errors"] += int(error)
+            entry["slow_queries"] += int(slow)
+            entry["rows"] += rows
+            entry["bytes"] += nbytes
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+    def record_request(self, route: str, stats: RequestQueryStats) -> None:
+        summary = stats.as_dict()
+        with self._lock:
+            entry = self._by_route.setdefault(route, {
+                "requests": 0, "queries": 0, "db_ms": 0.0, "max_db_ms": 0.0, "max_queries": 0,
+            })
+            entry["requests"] += 1
+            entry["queries"] += summary["queries"]
+            entry["db_ms"] += summary["total_ms"]
+            entry["max_db_ms"] = max(entry["max_db_ms"], summary["total_ms"])
+            entry["max_queries"] = max(entry["max_queries"], summary["queries"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            queries = {
+                tag: dict(entry, total_ms=round(entry["total_ms"], 3), max_ms=round(entry["max_ms"], 3),
+                          avg_ms=round(entry["total_ms"] / entry["queries"], 3))
+                for tag, entry in self._by_tag.items()
+            }
+            routes = {
+                route: dict(entry, db_ms=round(entry["db_ms"], 3), max_db_ms=round(entry["max_db_ms"], 3),
+                            avg_db_ms=round(entry["db_ms"] / entry["requests"], 3),
+                            avg_queries=round(entry["queries"] / entry["requests"], 2))
+                for route, entry in self._by_route.items()
+            }
+        return {"slow_query_ms": SLOW_QUERY_MS, "queries": queries, "routes": routes}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_tag.clear()
+            self._by_route.clear()
+
+
+query_metrics = QueryMetrics()
+
+
+def current_query_tag() -> Optional[str]:
+    return _query_tag.get()
+
+
+def current_request_stats() -> Optional[RequestQueryStats]:
+    return _request_stats.get()
+
+
+@contextmanager
+def track_queries(tag: Optional[str] = None):
+    """Tag every query run inside the block and collect their totals.
+
+    Yields the RequestQueryStats for the block. Work handed to executors via
+    ``contextvars.copy_context`` (as SnowflakeManager.arun does) is included.
+    """
+    stats = RequestQueryStats()
+    stats_token = _request_stats.set(stats)
+    tag_token = _query_tag.set(tag) if tag is not None else None
+    try:
+        yield stats
+    finally:
+        if tag_token is not None:
+            _query_tag.reset(tag_token)
+        _request_stats.reset(stats_token)
+
+
+def record_query(query: str, started: float, rows: int = 0, nbytes: int = 0,
+                 query_id: Optional[str] = None, error: bool = False) -> float:
+    """Record one finished statement; ``started`` is its time.perf_counter() start. Returns elapsed ms."""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    tag = _query_tag.get()
+    slow = elapsed_ms >= SLOW_QUERY_MS
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add(elapsed_ms, rows, nbytes, query_id, error)
+    query_metrics.record_query(tag, elapsed_ms, rows, nbytes, slow, error)
+
+    if slow:
+        slow_query_logger.warning(
+            f"Slow query ({elapsed_ms:.1f}ms, {rows} rows, {nbytes} bytes) tag={tag} "
+            f"query_id={query_id}: {' '.join(query.split())[:500]}"
+        )
+    return elapsed_ms
@@ -1,14 +1,202 @@
 import os
+import csv
+import gzip
+import json
+import hashlib
+import time
+import uuid
+import asyncio
+import functools
+import contextvars
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import snowflake.connector
 from snowflake.connector import Error as SnowflakeError
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
 import logging
+from collections import namedtuple
 from contextlib import contextmanager
+from .connection_pool import ConnectionPool
+from .geo import bounding_box
+from .query_stats import current_query_tag, record_query
+from .station_stats import STATION_STATS_DIMENSIONS, TOTAL, StatsKey, stats_value
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connection pools are shared per process and keyed by connection parameters, so
+# every SnowflakeManager pointing at the same account reuses the same sessions.
+_pools: Dict[tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def _get_shared_pool(connection_params: Dict[str, Any]) -> ConnectionPool:
+    """Get or create the process-wide pool for a set of connection parameters."""
+    key = tuple(sorted(connection_params.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            def connect():
+                conn = snowflake.connector.connect(**connection_params)
+                logger.info("Successfully connected to Snowflake")
+                return conn
+
+            pool = ConnectionPool(
+                connect,
+                max_size=int(os.getenv("SNOWFLAKE_POOL_SIZE", "8")),
+                checkout_timeout=float(os.getenv("SNOWFLAKE_POOL_TIMEOUT", "30")),
+                max_idle_seconds=float(os.getenv("SNOWFLAKE_POOL_MAX_IDLE_SECONDS", "600")),
+                health_check_interval=float(os.getenv("SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS", "60")),
+                name="snowflake",
+            )
+            _pools[key] = pool
+        return pool
+
+# --- Result fetchers ---
+def _fetch_dicts(cursor) -> List[Dict[str, Any]]:
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def _fetch_load_results(cursor) -> List[Dict[str, Any]]:
+    # COPY INTO reports one row per file; column names are upper case in Snowflake
+    columns = [desc[0].lower() for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+@functools.lru_cache(maxsize=256)
+def _row_class(columns: tuple):
+    """Named tuple class for a column set; invalid identifiers are renamed to _0, _1, ..."""
+    return namedtuple('Row', [column.lower() for column in columns], rename=True)
+
+def _fetch_rows(cursor) -> List[tuple]:
+    row_class = _row_class(tuple(desc[0] for desc in cursor.description))
+    return [row_class._make(row) for row in cursor.fetchall()]
+
+def _fetch_columnar(cursor) -> Dict[str, np.ndarray]:
+    columns = [desc[0] for desc in cursor.description]
+    fetch_arrow_all = getattr(cursor, 'fetch_arrow_all', None)
+    if fetch_arrow_all is not None:
+        try:
+            table = fetch_arrow_all()
+        except Exception as e:
+            # The connector raises when pyarrow is missing; use the row path instead
+            logger.debug(f"Arrow fetch unavailable, falling back to rows: {e}")
+        else:
+            if table is None:
+                return {column: np.array([]) for column in columns}
+            return {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+    
+    rows = cursor.fetchall()
+    if not rows:
+        return {column: np.array([]) for column in columns}
+    return {column: _to_array(values) for column, values in zip(columns, zip(*rows))}
+
+def _result_size(cursor: Any, result: Any) -> tuple:
+    """(rows, bytes) for a finished statement, as far as the connector reports them."""
+    if isinstance(result, list):
+        rows = len(result)
+    elif isinstance(result, dict):
+        rows = len(next(iter(result.values()), ()))
+    else:
+        rows = max(getattr(cursor, 'rowcount', 0) or 0, 0)
+    
+    nbytes = 0
+    try:
+        # Result chunks know their decoded size; the first, inline chunk may not
+        batches = cursor.get_result_batches() if hasattr(cursor, 'get_result_batches') else None
+        nbytes = sum(batch.uncompressed_size or 0 for batch in batches or [])
+    except Exception:
+        pass
+    if not nbytes and isinstance(result, dict):
+        nbytes = sum(getattr(array, 'nbytes', 0) for array in result.values())
+    return rows, nbytes
+
+def _radius_predicate(lat: float, lon: float, radius_km: float, prefix: str = '') -> tuple:
+    """WHERE clause (and params) selecting rows within ``radius_km`` of a point.
+
+    The lat/lon BETWEEN box lets Snowflake prune micro-partitions (and SQLite use
+    idx_stations_location) before the exact ST_DWITHIN test on the location column.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    sql = (f"{prefix}latitude BETWEEN %s AND %s AND {prefix}longitude BETWEEN %s AND %s "
+           f"AND ST_DWITHIN({prefix}location, ST_MAKEPOINT(%s, %s), %s)")
+    return sql, (min_lat, max_lat, min_lon, max_lon, lon, lat, radius_km * 1000)
+
+def _to_array(values: tuple) -> np.ndarray:
+    # Numeric columns become typed arrays; anything else (strings, NULLs, timestamps)
+    # stays as object references instead of being copied into fixed-width buffers.
+    if all(type(value) in (int, float, bool) for value in values):
+        return np.array(values)
+    return np.array(values, dtype=object)
+
+# Columns written by the station loaders, in file/parameter order
+STATION_LOAD_COLUMNS = [
+    'id', 'ocm_id', 'name', 'latitude', 'longitude', 'energy_type',
+    'address_line1', 'address_line2', 'town', 'state', 'country', 'postcode', 'access_comments',
+    'connector_mask', 'max_power_kw', 'content_hash'
+]
+
+# Columns added after the original stations schema, for tables created by older versions
+STATION_ADDED_COLUMNS = {'content_hash': 'STRING', 'connector_mask': 'INTEGER', 'max_power_kw': 'FLOAT'}
+
+# Source fields that define a station's content; ids and timestamps are excluded
+STATION_CONTENT_COLUMNS = [column for column in STATION_LOAD_COLUMNS if column not in ('id', 'content_hash')]
+
+# Defaults of stations columns that statistics count but the MERGE doesn't load
+STATION_STATS_INSERT_DEFAULTS = {'available': 'TRUE'}
+
+def station_content_hash(station: Dict[str, Any]) -> str:
+    """Stable hash of a station's source fields, used to skip unchanged rows on re-ingestion."""
+    content = [station.get(column) for column in STATION_CONTENT_COLUMNS]
+    return hashlib.sha1(json.dumps(content, default=str).encode('utf-8')).hexdigest()
+
+def validate_station(station: Dict[str, Any]) -> Optional[str]:
+    """Return why a station row cannot be loaded, or None if it is valid."""
+    if not station.get('name'):
+        return "missing name"
+    try:
+        latitude = float(station.get('latitude'))
+        longitude = float(station.get('longitude'))
+    except (TypeError, ValueError):
+        return "non-numeric coordinates"
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return "coordinates out of range"
+    return None
+
+def _split_valid_stations(stations: List[Dict[str, Any]]):
+    valid, rejected = [], []
+    for station in stations:
+        reason = validate_station(station)
+        if reason:
+            rejected.append({"ocm_id": station.get('ocm_id'), "error": reason})
+        else:
+            valid.append(station)
+    return valid, rejected
+
+def _station_row(station: Dict[str, Any]) -> tuple:
+    """Station values in STATION_LOAD_COLUMNS order, hashing the content if not done yet."""
+    content_hash = station.get('content_hash') or station_content_hash(station)
+    return tuple(content_hash if column == 'content_hash' else station.get(column)
+                 for column in STATION_LOAD_COLUMNS)
+
+def _load_report(loaded: int, rejected_count: int, rejected: List[Dict[str, Any]], started: float) -> Dict[str, Any]:
+    seconds = time.perf_counter() - started
+    return {
+        "rows_loaded": loaded,
+        "rows_rejected": rejected_count,
+        "rejected": rejected[:20],
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(loaded / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+# Worker threads per async workload. Each workload gets its own executor so slow
+# analytics queries queue behind each other instead of starving interactive lookups.
+ASYNC_WORKLOADS = {
+    'interactive': int(os.getenv("SNOWFLAKE_INTERACTIVE_WORKERS", "4")),
+    'analytics': int(os.getenv("SNOWFLAKE_ANALYTICS_WORKERS", "2")),
+}
+
 class SnowflakeManager:
     def __init__(self):
         self.connection_params = {
@@ -24,67 +212,239 @@ class SnowflakeManager:
         missing_params = [k for k, v in self.connection_params.items() if not v]
         if missing_params:
             raise ValueError(f"Missing Snowflake configuration: {missing_params}")
+        
+        # Keep pooled sessions alive between requests instead of letting them expire
+        self.connection_params['client_session_keep_alive'] = os.getenv("SNOWFLAKE_KEEP_ALIVE", "true").lower() == "true"
+        self.pool = _get_shared_pool(self.connection_params)
+        self._init_executors()
+    
+    def _init_executors(self) -> None:
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._executors_lock = threading.Lock()
     
     @contextmanager
     def get_connection(self):
-        """Context manager for Snowflake connections with automatic cleanup."""
-        conn = None
+        """Context manager that checks a pooled Snowflake connection out and returns it."""
         try:
-            conn = snowflake.connector.connect(**self.connection_params)
-            logger.info("Successfully connected to Snowflake")
-            yield conn
+            with self.pool.connection() as conn:
+                yield conn
         except SnowflakeError as e:
             logger.error(f"Snowflake connection error: {e}")
             raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
-                logger.info("Snowflake connection closed")
     
-    def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
-        """Execute a query and return results as a list of dictionaries."""
+    def ping(self) -> None:
+        """Run a trivial query to verify the warehouse is reachable."""
+        self.execute_query("SELECT 1")
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool size and wait-time metrics."""
+        return self.pool.stats()
+    
+    def close(self) -> None:
+        """Close the pooled connections held by this manager."""
+        global snowflake_manager
+        with self._executors_lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=True)
+        self.pool.close()
+        with _pools_lock:
+            for key, pool in list(_pools.items()):
+                if pool is self.pool:
+                    del _pools[key]
+        if snowflake_manager is self:
+            snowflake_manager = None
+    
+    def _execute(self, query: str, params: Optional[tuple], fetch: Callable[[Any], Any]) -> Any:
+        """Run a single statement on a pooled connection and hand the cursor to ``fetch``.
+
+        Returns None for statements that produce no result set (after committing them).
+        """
         with self.get_connection() as conn:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            result, failed = None, True
             try:
-                cursor = conn.cursor()
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
-                
-                # Fetch results
+                self._run_statement(conn, cursor, query, params)
                 if cursor.description:
-                    columns = [desc[0] for desc in cursor.description]
-                    results = []
-                    for row in cursor.fetchall():
-                        results.append(dict(zip(columns, row)))
-                    return results
+                    result = fetch(cursor)
                 else:
                     conn.commit()
-                    return []
+                failed = False
+                return result
                     
             except SnowflakeError as e:
                 logger.error(f"Query execution error: {e}")
                 raise
+            finally:
+                rows, nbytes = _result_size(cursor, result)
+                record_query(query, started, rows, nbytes, getattr(cursor, 'sfqid', None), error=failed)
+                cursor.close()
+    
+    def _run_statement(self, conn: Any, cursor: Any, query: str, params: Optional[tuple]) -> None:
+        """Execute ``query`` on ``cursor`` tagged with the caller's QUERY_TAG."""
+        if params:
+            cursor.execute(query, params, **self._statement_kwargs())
+        else:
+            cursor.execute(query, **self._statement_kwargs())
+    
+    def _statement_kwargs(self) -> Dict[str, Any]:
+        # QUERY_TAG travels with each statement rather than as a session setting,
+        # so pooled sessions shared across routes never need an ALTER SESSION first
+        tag = current_query_tag()
+        return {'_statement_params': {'QUERY_TAG': tag}} if tag is not None else {}
+    
+    def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """Execute a query and return results as a list of dictionaries."""
+        return self._execute(query, params, _fetch_dicts) or []
+    
+    def execute_query_rows(self, query: str, params: Optional[tuple] = None) -> List[tuple]:
+        """Execute a query and return results as lightweight named tuples.
+
+        Rows share one generated class per column set, so they cost about as much
+        as a plain tuple and support both ``row.name`` and ``row[i]`` access.
+        """
+        return self._execute(query, params, _fetch_rows) or []
+    
+    def execute_query_columnar(self, query: str, params: Optional[tuple] = None) -> Dict[str, np.ndarray]:
+        """Execute a query and return one NumPy array per column.
+
+        Uses the connector's Arrow result format when pyarrow is installed, and
+        falls back to transposing the fetched rows otherwise.
+        """
+        return self._execute(query, params, _fetch_columnar) or {}
+    
+    def iter_query(self, query: str, params: Optional[tuple] = None, batch_size: int = 1000,
+                   row_type: str = 'dict') -> Iterator[List[Any]]:
+        """Stream a query's results in batches of at most ``batch_size`` rows.
+
+        Rows are fetched with ``fetchmany`` so memory stays constant regardless of
+        result size. The pooled connection is held only while the generator is
+        live and is returned as soon as it is exhausted or closed.
+        ``row_type`` is 'dict' (like execute_query) or 'row' (like execute_query_rows).
+        """
+        if row_type not in ('dict', 'row'):
+            raise ValueError(f"Unknown row_type '{row_type}', expected 'dict' or 'row'")
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            total_rows, failed = 0, True
+            try:
+                self._run_statement(conn, cursor, query, params)
+                
+                if not cursor.description:
+                    failed = False
+                    return
+                columns = tuple(desc[0] for desc in cursor.description)
+                row_class = _row_class(columns) if row_type == 'row' else None
+                
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    total_rows += len(rows)
+                    if row_class is not None:
+                        yield [row_class._make(row) for row in rows]
+                    else:
+                        yield [dict(zip(columns, row)) for row in rows]
+                failed = False
+                        
+            except SnowflakeError as e:
+                logger.error(f"Streaming query error: {e}")
+                raise
+            finally:
+                # Timed from execute to the last batch, so it includes time the consumer held the stream
+                record_query(query, started, total_rows, _result_size(cursor, None)[1],
+                             getattr(cursor, 'sfqid', None), error=failed)
+                cursor.close()
+    
+    def execute_transaction(self, statements: List[Tuple[str, Optional[List[tuple]]]]) -> None:
+        """Run ``(query, params_list)`` statements on one connection as a single transaction.
+
+        ``params_list`` is executed with executemany, or None for a statement
+        without parameters. Everything is rolled back if a statement fails.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._run_statement(conn, cursor, "BEGIN", None)
+                for query, params_list in statements:
+                    started = time.perf_counter()
+                    failed = True
+                    try:
+                        if params_list is None:
+                            self._run_statement(conn, cursor, query, None)
+                        elif params_list:
+                            cursor.executemany(query, params_list, **self._statement_kwargs())
+                        failed = False
+                    finally:
+                        record_query(query, started, len(params_list or ()), 0, getattr(cursor, 'sfqid', None),
+                                     error=failed)
+                self._run_statement(conn, cursor, "COMMIT", None)
+            except BaseException as e:
+                logger.error(f"Transaction error, rolling back: {e}")
+                try:
+                    cursor.execute("ROLLBACK")
+                except Exception:
+                    pass
+                raise
             finally:
                 cursor.close()
     
     def execute_many(self, query: str, params_list: List[tuple]) -> None:
         """Execute a query with multiple parameter sets."""
         with self.get_connection() as conn:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            failed = True
             try:
-                cursor = conn.cursor()
-                cursor.executemany(query, params_list)
+                cursor.executemany(query, params_list, **self._statement_kwargs())
                 conn.commit()
+                failed = False
                 logger.info(f"Executed {len(params_list)} operations successfully")
             except SnowflakeError as e:
                 logger.error(f"Batch execution error: {e}")
                 raise
             finally:
+                record_query(query, started, len(params_list), 0, getattr(cursor, 'sfqid', None), error=failed)
                 cursor.close()
     
+    # --- ASYNC API ---
+    def _get_executor(self, workload: str) -> ThreadPoolExecutor:
+        """Get the dedicated executor for a workload, creating it on first use."""
+        if workload not in ASYNC_WORKLOADS:
+            raise ValueError(f"Unknown workload '{workload}', expected one of {list(ASYNC_WORKLOADS)}")
+        with self._executors_lock:
+            executor = self._executors.get(workload)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=ASYNC_WORKLOADS[workload],
+                    thread_name_prefix=f"snowflake-{workload}",
+                )
+                self._executors[workload] = executor
+            return executor
+    
+    async def arun(self, func: Callable[..., Any], *args, workload: str = 'interactive', **kwargs) -> Any:
+        """Run a blocking manager call on the workload's executor without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context (query tag, request stats) into the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._get_executor(workload),
+                                          functools.partial(context.run, func, *args, **kwargs))
+    
+    async def aexecute_query(self, query: str, params: Optional[tuple] = None, workload: str = 'interactive') -> List[Dict[str, Any]]:
+        """Async variant of execute_query, bounded by the workload's executor."""
+        return await self.arun(self.execute_query, query, params, workload=workload)
+    
+    async def aexecute_many(self, query: str, params_list: List[tuple], workload: str = 'interactive') -> None:
+        """Async variant of execute_many, bounded by the workload's executor."""
+        return await self.arun(self.execute_many, query, params_list, workload=workload)
+    
     def create_tables(self) -> None:
         """Create all necessary tables for the EV User Intelligence."""
         tables = {
@@ -104,6 +464,9 @@ class SnowflakeManager:
                     country STRING,
                     postcode STRING,
                     access_comments STRING,
+                    connector_mask INTEGER,
+                    max_power_kw FLOAT,
+                    content_hash STRING,
                     created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
                     updated_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
                 )
@@ -148,6 +511,15 @@ class SnowflakeManager:
                     FOREIGN KEY (station_id) REFERENCES stations(id)
                 )
             """,
+            'station_stats': """
+                CREATE TABLE IF NOT EXISTS station_stats (
+                    dimension STRING,
+                    value STRING,
+                    station_count INTEGER DEFAULT 0,
+                    updated_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+                    PRIMARY KEY (dimension, value)
+                )
+            """,
             'user_locations': """
                 CREATE TABLE IF NOT EXISTS user_locations (
                     user_id INTEGER PRIMARY KEY,
@@ -198,6 +570,32 @@ class SnowflakeManager:
             except Exception as e:
                 logger.error(f"Error creating table '{table_name}': {e}")
                 raise
+        
+        # Columns added after the original schema, for tables created by older versions
+        for column, column_type in STATION_ADDED_COLUMNS.items():
+            self._ensure_column('stations', column, column_type)
+        self._create_sequence('stations_id_seq', start=1000)
+        self._ensure_spatial_columns()
+    
+    def _ensure_column(self, table: str, column: str, column_type: str) -> None:
+        """Add a column to an existing table if it is missing."""
+        self.execute_query(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type}")
+    
+    def _create_sequence(self, name: str, start: int = 1) -> None:
+        """Create the sequence used to assign surrogate ids."""
+        self.execute_query(f"CREATE SEQUENCE IF NOT EXISTS {name} START = {start}")
+    
+    def _ensure_spatial_columns(self) -> None:
+        """Add the GEOGRAPHY ``location`` column to every table queried by radius.
+
+        The column is virtual, derived from latitude/longitude, so no write path
+        has to maintain it. Stations are clustered on a geohash of the point so
+        that nearby stations share micro-partitions and the bounding-box prefilter
+        prunes most of the table.
+        """
+        for table in ('stations', 'user_locations', 'ev_stores', 'floating_services'):
+            self._ensure_column(table, 'location', 'GEOGRAPHY AS (ST_MAKEPOINT(longitude, latitude))')
+        self.execute_query("ALTER TABLE stations CLUSTER BY (ST_GEOHASH(ST_MAKEPOINT(longitude, latitude), 4))")
     
     def insert_station(self, station_data: Dict[str, Any]) -> None:
         """Insert a single station into the database."""
@@ -260,28 +658,376 @@ class SnowflakeManager:
         
         self.execute_many(query, params_list)
     
+    def bulk_load_stations(self, stations: List[Dict[str, Any]], table: str = 'stations') -> Dict[str, Any]:
+        """Bulk load stations with PUT + COPY INTO instead of row-by-row INSERTs.
+
+        Rows are validated locally, written to a gzip-compressed CSV, uploaded to
+        the table stage and loaded with ON_ERROR=CONTINUE, so rows Snowflake cannot
+        parse are rejected individually instead of failing the whole load.
+        Returns rows loaded/rejected and the achieved rows/sec.
+        """
+        started = time.perf_counter()
+        valid, rejected = _split_valid_stations(stations)
+        if not valid:
+            return _load_report(0, len(rejected), rejected, started)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = f"{table}_{uuid.uuid4().hex}.csv.gz"
+            path = os.path.join(tmp_dir, file_name)
+            with gzip.open(path, 'wt', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                for station in valid:
+                    row = _station_row(station)
+                    writer.writerow(['' if value is None else value for value in row])
+            
+            # Both statements go through _execute so they are tagged, timed and counted like any other query
+            stage_path = path.replace(os.sep, '/')
+            self._execute(f"PUT 'file://{stage_path}' @%{table} AUTO_COMPRESS=FALSE OVERWRITE=TRUE", None,
+                          lambda cursor: cursor.fetchall())
+            results = self._execute(f"""
+                COPY INTO {table} ({', '.join(STATION_LOAD_COLUMNS)})
+                FROM @%{table}
+                FILES = ('{file_name}')
+                FILE_FORMAT = (TYPE = CSV COMPRESSION = GZIP FIELD_OPTIONALLY_ENCLOSED_BY = '"'
+                               EMPTY_FIELD_AS_NULL = TRUE)
+                ON_ERROR = CONTINUE
+                PURGE = TRUE
+            """, None, _fetch_load_results) or []
+        
+        loaded = sum(int(result.get('rows_loaded') or 0) for result in results)
+        rejected.extend(
+            {"line": result.get('first_error_line'), "error": result.get('first_error')}
+            for result in results if int(result.get('errors_seen') or 0)
+        )
+        report = _load_report(loaded, len(stations) - loaded, rejected, started)
+        logger.info(f"Bulk loaded {loaded} rows into {table} in {report['seconds']}s "
+                    f"({report['rows_per_sec']} rows/sec), {report['rows_rejected']} rejected")
+        return report
+    
+    def upsert_stations(self, stations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Idempotently upsert stations keyed on ocm_id.
+
+        Stations are bulk loaded into a staging table and MERGEd into ``stations``:
+        new ocm_ids get an id from stations_id_seq, existing rows keep theirs and
+        are only rewritten when their content hash changed. Re-running ingestion
+        therefore touches only what changed and never duplicates rows.
+        """
+        started = time.perf_counter()
+        
+        # MERGE needs one source row per key; the last occurrence wins
+        by_ocm_id: Dict[Any, Dict[str, Any]] = {}
+        missing_key = []
+        for station in stations:
+            if station.get('ocm_id') is None:
+                missing_key.append({"ocm_id": None, "error": "missing ocm_id"})
+            else:
+                by_ocm_id[station['ocm_id']] = station
+        
+        self._prepare_station_staging()
+        load = self.bulk_load_stations(list(by_ocm_id.values()), table='stations_staging')
+        stats_delta = self._staged_station_stats_delta()
+        inserted, updated = self._merge_staged_stations()
+        try:
+            self.apply_station_stats_delta(stats_delta)
+        except Exception as e:
+            # The periodic verification recomputes the statistics, so ingestion carries on
+            logger.warning(f"Could not update station_stats incrementally: {e}")
+        
+        seconds = time.perf_counter() - started
+        report = {
+            "staged": load["rows_loaded"],
+            "inserted": inserted,
+            "updated": updated,
+            "unchanged": load["rows_loaded"] - inserted - updated,
+            "rows_rejected": load["rows_rejected"] + len(missing_key),
+            "rejected": load["rejected"] + missing_key,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(load["rows_loaded"] / seconds, 1) if seconds > 0 else 0.0,
+        }
+        logger.info(f"Upserted stations: {inserted} inserted, {updated} updated, "
+                    f"{report['unchanged']} unchanged in {report['seconds']}s")
+        return report
+    
+    def _prepare_station_staging(self) -> None:
+        # CTAS copies the columns but not the primary key, so staged rows can leave id NULL
+        self.execute_query("CREATE TRANSIENT TABLE IF NOT EXISTS stations_staging AS "
+                           "SELECT * EXCLUDE (location) FROM stations WHERE 1 = 0")
+        for column, column_type in STATION_ADDED_COLUMNS.items():
+            self._ensure_column('stations_staging', column, column_type)
+        self.execute_query("TRUNCATE TABLE stations_staging")
+    
+    def _merge_staged_stations(self) -> tuple:
+        """MERGE stations_staging into stations and return (inserted, updated) counts."""
+        result = self.execute_query(self._station_merge_sql())
+        counts = {key.lower(): value for key, value in result[0].items()} if result else {}
+        return int(counts.get('number of rows inserted', 0)), int(counts.get('number of rows updated', 0))
+    
+    @staticmethod
+    def _station_merge_sql() -> str:
+        updates = ', '.join(f"{column} = s.{column}" for column in STATION_CONTENT_COLUMNS + ['content_hash'])
+        columns = STATION_LOAD_COLUMNS
+        values = ', '.join('stations_id_seq.NEXTVAL' if column == 'id' else f"s.{column}" for column in columns)
+        return f"""
+            MERGE INTO stations AS t
+            USING stations_staging AS s
+            ON t.ocm_id = s.ocm_id
+            WHEN MATCHED AND (t.content_hash IS NULL OR t.content_hash <> s.content_hash)
+                THEN UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP()
+            WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) VALUES ({values})
+        """
+    
+    # --- materialized statistics (see db/station_stats.py) ---
+    def _staged_station_stats_delta(self) -> Dict[StatsKey, int]:
+        """How the pending MERGE of stations_staging will change station_stats.
+
+        Rows the MERGE will rewrite stop counting under their old values and
+        start counting under their staged ones; new rows only add. Both sides
+        are aggregated in the warehouse, so only distinct value combinations
+        come back.
+        """
+        changed = "t.content_hash IS NULL OR t.content_hash <> s.content_hash"
+        # Columns the MERGE doesn't load keep their current value, or the column default on insert
+        after = [f"s.{c}" if c in STATION_CONTENT_COLUMNS
+                 else f"CASE WHEN t.ocm_id IS NULL THEN {STATION_STATS_INSERT_DEFAULTS.get(c, 'NULL')} ELSE t.{c} END"
+                 for c in STATION_STATS_DIMENSIONS]
+        old = self.execute_query(f"""
+            SELECT {', '.join(f't.{c} AS {c}' for c in STATION_STATS_DIMENSIONS)}, COUNT(*) AS n
+            FROM stations t JOIN stations_staging s ON t.ocm_id = s.ocm_id
+            WHERE {changed}
+            GROUP BY {', '.join(f't.{c}' for c in STATION_STATS_DIMENSIONS)}
+        """)
+        new = self.execute_query(f"""
+            SELECT {', '.join(f'{e} AS {c}' for e, c in zip(after, STATION_STATS_DIMENSIONS))}, COUNT(*) AS n
+            FROM stations_staging s LEFT JOIN stations t ON t.ocm_id = s.ocm_id
+            WHERE t.ocm_id IS NULL OR {changed}
+            GROUP BY {', '.join(after)}
+        """)
+        delta: Dict[StatsKey, int] = {}
+        for rows, sign in ((old, -1), (new, 1)):
+            for row in rows:
+                n = sign * int(row['n'])
+                delta[TOTAL] = delta.get(TOTAL, 0) + n
+                for dimension in STATION_STATS_DIMENSIONS:
+                    key = (dimension, stats_value(dimension, row[dimension]))
+                    delta[key] = delta.get(key, 0) + n
+        return {key: n for key, n in delta.items() if n}
+    
+    def apply_station_stats_delta(self, delta: Dict[StatsKey, int]) -> None:
+        """Add ``delta`` to the materialized counts in station_stats."""
+        if not delta:
+            return
+        values = ', '.join(['(%s, %s, %s)'] * len(delta))
+        params = tuple(item for (dimension, value), n in delta.items() for item in (dimension, value, n))
+        self.execute_query(f"""
+            MERGE INTO station_stats AS t
+            USING (SELECT column1 AS dimension, column2 AS value, column3 AS delta FROM VALUES {values}) AS s
+            ON t.dimension = s.dimension AND t.value = s.value
+            WHEN MATCHED THEN UPDATE SET station_count = t.station_count + s.delta, updated_at = CURRENT_TIMESTAMP()
+            WHEN NOT MATCHED THEN INSERT (dimension, value, station_count) VALUES (s.dimension, s.value, s.delta)
+        """, params)
+    
+    def get_station_stats(self) -> Dict[StatsKey, int]:
+        """The materialized station counts; a small table read instead of a full aggregation.
+
+        Snowflake does not enforce the (dimension, value) key, so duplicate rows
+        are summed: they show up as drift in verification instead of hiding it.
+        """
+        rows = self.execute_query("""
+            SELECT dimension, value, SUM(station_count) AS station_count
+            FROM station_stats
+            GROUP BY dimension, value
+            HAVING SUM(station_count) <> 0
+        """)
+        return {(row['dimension'], row['value']): int(row['station_count']) for row in rows}
+    
+    def compute_station_stats(self) -> Dict[StatsKey, int]:
+        """Aggregate the stations table from scratch, for verifying and rebuilding station_stats."""
+        branches = ["SELECT 'total' AS dimension, NULL AS value, COUNT(*) AS n FROM stations"] + [
+            f"SELECT '{dimension}' AS dimension, CAST({dimension} AS VARCHAR) AS value, COUNT(*) AS n "
+            f"FROM stations GROUP BY {dimension}"
+            for dimension in STATION_STATS_DIMENSIONS
+        ]
+        counts: Dict[StatsKey, int] = {}
+        for row in self.execute_query(" UNION ALL ".join(branches)):
+            if row['dimension'] == 'total':
+                key = TOTAL
+            else:
+                key = (row['dimension'], stats_value(row['dimension'], row['value']))
+            if int(row['n']):
+                counts[key] = counts.get(key, 0) + int(row['n'])
+        return counts
+    
+    def rebuild_station_stats(self, counts: Optional[Dict[StatsKey, int]] = None) -> Dict[StatsKey, int]:
+        """Replace station_stats with ``counts`` (recomputed when not given) and return them.
+
+        The DELETE and INSERT run as one transaction, so workers rebuilding at
+        the same time cannot interleave into duplicate rows, and an incremental
+        delta either lands before the rebuild or after it, never in between.
+        """
+        counts = self.compute_station_stats() if counts is None else counts
+        self.execute_transaction([
+            ("DELETE FROM station_stats", None),
+            ("INSERT INTO station_stats (dimension, value, station_count) VALUES (%s, %s, %s)",
+             [(dimension, value, n) for (dimension, value), n in counts.items()]),
+        ])
+        return counts
+    
     def get_stations(self, limit: int = 1000) -> List[Dict[str, Any]]:
         """Retrieve stations from the database."""
         query = f"""
-            SELECT * FROM stations 
+            SELECT * EXCLUDE (location) FROM stations 
             ORDER BY created_at DESC 
             LIMIT {limit}
         """
         return self.execute_query(query)
     
+    def iter_stations(self, batch_size: int = 5000, after_id: Optional[int] = None,
+                      limit: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Stream the station catalogue in batches, ordered by id.
+
+        ``after_id`` and ``limit`` select one keyset page: the next ``limit``
+        stations with an id greater than ``after_id``. Each batch is its own
+        keyset query, so a pooled connection is held only while a batch is
+        fetched, not while the consumer (e.g. a slow client download) works
+        through it.
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            rows = self.get_stations_page(after_id, size)
+            if rows:
+                yield rows
+            if len(rows) < size:
+                return
+            after_id = rows[-1]['id']
+            if remaining is not None:
+                remaining -= len(rows)
+    
+    def get_stations_page(self, after_id: Optional[int] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """One keyset page of stations ordered by id; pass the last id seen as ``after_id`` for the next."""
+        query, params = self._station_page_query(after_id, limit)
+        return self.execute_query(query, params)
+    
+    @staticmethod
+    def _station_page_query(after_id: Optional[int], limit: Optional[int]) -> Tuple[str, Optional[tuple]]:
+        # Seeks on the primary key instead of OFFSET, so late pages cost the same as the first
+        where, params = ("WHERE id > %s", (after_id,)) if after_id is not None else ("", None)
+        limit_sql = f"LIMIT {int(limit)}" if limit is not None else ""
+        return f"SELECT * EXCLUDE (location) FROM stations {where} ORDER BY id {limit_sql}", params
+    
     def get_stations_by_location(self, lat: float, lon: float, radius_km: float = 10) -> List[Dict[str, Any]]:
-        """Get stations within a specified radius of a location."""
-        # Using Haversine formula in SQL
-        query = """
-            SELECT *, 
-                   (6371 * acos(cos(radians(%s)) * cos(radians(latitude)) * 
-                    cos(radians(longitude) - radians(%s)) + 
-                    sin(radians(%s)) * sin(radians(latitude)))) AS distance_km
-            FROM stations 
-            HAVING distance_km <= %s
+        """Get stations within a specified radius of a location, nearest first."""
+        return self._query_within_radius('stations', lat, lon, radius_km)
+    
+    def _query_within_radius(self, table: str, lat: float, lon: float, radius_km: float) -> List[Dict[str, Any]]:
+        """Rows of ``table`` within ``radius_km`` of a point, with distance_km, nearest first."""
+        where, params = _radius_predicate(lat, lon, radius_km)
+        query = f"""
+            SELECT * EXCLUDE (location),
+                   ST_DISTANCE(location, ST_MAKEPOINT(%s, %s)) / 1000 AS distance_km
+            FROM {table}
+            WHERE {where}
             ORDER BY distance_km
         """
-        return self.execute_query(query, (lat, lon, lat, radius_km))
+        return self.execute_query(query, (lon, lat) + params)
+    
+    def get_stations_near_points(self, points: List[Tuple[float, float, float, int]]) -> List[List[Dict[str, Any]]]:
+        """Nearest stations for many (lat, lon, radius_km, limit) points in one query, nearest first per point.
+
+        Each point is its own pruned radius branch of a UNION ALL, so the
+        warehouse is visited once however many points are asked about.
+        """
+        if not points:
+            return []
+        branches, params = [], []
+        for i, (lat, lon, radius_km, limit) in enumerate(points):
+            where, where_params = _radius_predicate(lat, lon, radius_km)
+            branches.append(f"""
+                SELECT * FROM (
+                    SELECT {i} AS query_index, * EXCLUDE (location),
+                           ST_DISTANCE(location, ST_MAKEPOINT(%s, %s)) / 1000 AS distance_km
+                    FROM stations
+                    WHERE {where}
+                    ORDER BY distance_km
+                    LIMIT {int(limit)}
+                )""")
+            params.extend((lon, lat) + where_params)
+        results: List[List[Dict[str, Any]]] = [[] for _ in points]
+        for row in self.execute_query(" UNION ALL ".join(branches), tuple(params)):
+            results[row.pop('query_index')].append(row)
+        for rows in results:
+            # UNION ALL does not keep the branches' order
+            rows.sort(key=lambda row: row['distance_km'])
+        return results
+    
+    def get_stations_in_boxes(self, boxes: List[Tuple[float, float, float, float]],
+                              row_type: str = 'dict') -> List[Any]:
+        """Stations inside any of the (min_lat, max_lat, min_lon, max_lon) boxes, in one pruned query.
+
+        ``row_type`` is 'dict' (like execute_query) or 'row' (like execute_query_rows).
+        """
+        if row_type not in ('dict', 'row'):
+            raise ValueError(f"Unknown row_type '{row_type}', expected 'dict' or 'row'")
+        if not boxes:
+            return []
+        where = " OR ".join(["(latitude BETWEEN %s AND %s AND longitude BETWEEN %s AND %s)"] * len(boxes))
+        params = tuple(float(value) for box in boxes for value in box)
+        query = f"SELECT * EXCLUDE (location) FROM stations WHERE {where}"
+        return self.execute_query(query, params) if row_type == 'dict' else self.execute_query_rows(query, params)
+    
+    def get_station_popularity(self, days: int = 90) -> Dict[Any, int]:
+        """Charging sessions per station over the last ``days`` days, for ranking suggestions."""
+        query = f"""
+            SELECT station_id, COUNT(*) AS sessions
+            FROM sessions
+            WHERE start_time >= DATEADD(day, -{int(days)}, CURRENT_DATE())
+            GROUP BY station_id
+        """
+        return {row["station_id"]: row["sessions"] for row in self.execute_query(query)}
+    
+    def get_autocomplete_suggestions(self, prefix: str, limit: int = 10, days: int = 90) -> List[Dict[str, Any]]:
+        """Stations and towns with a word starting with ``prefix``, heaviest first.
+
+        Database fallback for the in-memory autocomplete index, returning the same
+        suggestion dicts: a station weighs one plus its charging sessions over the
+        last ``days`` days, a town the sum over its stations.
+        """
+        # LIKE wildcards typed by the user match literally
+        escaped = prefix.lower().replace('!', '!!').replace('%', '!%').replace('_', '!_')
+        starts, word_starts = f"{escaped}%", f"% {escaped}%"
+        query = f"""
+            WITH popularity AS (
+                SELECT station_id, COUNT(*) AS sessions
+                FROM sessions
+                WHERE start_time >= DATEADD(day, -{int(days)}, CURRENT_DATE())
+                GROUP BY station_id
+            ),
+            weighted AS (
+                SELECT s.id, s.name, s.town, 1 + COALESCE(p.sessions, 0) AS weight
+                FROM stations s LEFT JOIN popularity p ON p.station_id = s.id
+            )
+            SELECT 'station' AS kind, name AS text, id AS station_id, town, 1 AS stations, weight
+            FROM weighted
+            WHERE LOWER(name) LIKE %s ESCAPE '!' OR LOWER(name) LIKE %s ESCAPE '!'
+            UNION ALL
+            SELECT 'town' AS kind, MIN(town) AS text, NULL AS station_id, NULL AS town,
+                   COUNT(*) AS stations, SUM(weight) AS weight
+            FROM weighted
+            WHERE LOWER(town) LIKE %s ESCAPE '!' OR LOWER(town) LIKE %s ESCAPE '!'
+            GROUP BY LOWER(town)
+            ORDER BY weight DESC, text
+            LIMIT %s
+        """
+        suggestions = []
+        for row in self.execute_query(query, (starts, word_starts, starts, word_starts, int(limit))):
+            row = {key.lower(): value for key, value in row.items()}
+            if row['kind'] == 'town':
+                suggestions.append({"text": row['text'], "type": "town", "stations": int(row['stations']),
+                                    "weight": float(row['weight'])})
+            else:
+                suggestions.append({"text": row['text'], "type": "station", "station_id": int(row['station_id']),
+                                    "town": row['town'], "weight": float(row['weight'])})
+        return suggestions
     
     def get_station_count(self) -> int:
         """Get total number of stations in the database."""
@@ -355,35 +1101,24 @@ class SnowflakeManager:
 
     def get_nearby_users(self, latitude: float, longitude: float, radius_km: float = 10) -> list:
         """Get users within a radius (km) of a location."""
-        query = '''
-            SELECT ul.*, u.email, u.eco_score
+        where, params = _radius_predicate(latitude, longitude, radius_km, prefix='ul.')
+        query = f'''
+            SELECT ul.* EXCLUDE (location), u.email, u.eco_score
             FROM user_locations ul
             JOIN users u ON ul.user_id = u.id
             WHERE ul.status = 'active'
-            AND (6371 * acos(cos(radians(%s)) * cos(radians(ul.latitude)) * cos(radians(ul.longitude) - radians(%s)) + sin(radians(%s)) * sin(radians(ul.latitude)))) <= %s
+            AND {where}
             ORDER BY ul.last_updated DESC
         '''
-        return self.execute_query(query, (latitude, longitude, latitude, radius_km))
+        return self.execute_query(query, params)
 
     # --- EV STORES ---
     def get_nearby_ev_stores(self, latitude: float, longitude: float, radius_km: float = 10) -> list:
-        query = '''
-            SELECT *, (6371 * acos(cos(radians(%s)) * cos(radians(latitude)) * cos(radians(longitude) - radians(%s)) + sin(radians(%s)) * sin(radians(latitude)))) AS distance_km
-            FROM ev_stores
-            HAVING distance_km <= %s
-            ORDER BY distance_km
-        '''
-        return self.execute_query(query, (latitude, longitude, latitude, radius_km))
+        return self._query_within_radius('ev_stores', latitude, longitude, radius_km)
 
     # --- FLOATING SERVICES ---
     def get_nearby_floating_services(self, latitude: float, longitude: float, radius_km: float = 10) -> list:
-        query = '''
-            SELECT *, (6371 * acos(cos(radians(%s)) * cos(radians(latitude)) * cos(radians(longitude) - radians(%s)) + sin(radians(%s)) * sin(radians(latitude)))) AS distance_km
-            FROM floating_services
-            HAVING distance_km <= %s
-            ORDER BY distance_km
-        '''
-        return self.execute_query(query, (latitude, longitude, latitude, radius_km))
+        return self._query_within_radius('floating_services', latitude, longitude, radius_km)
 
     # --- SESSION MANAGEMENT ---
     def log_session(self, user_id: int, station_id: int, start_time: str, end_time: str, energy_consumed: float = 0.0, cost: float = 0.0) -> bool:
@@ -420,16 +1155,29 @@ class SnowflakeManager:
 
 # Legacy function for backward compatibility
 def get_snowflake_connection():
-    """Legacy function - use SnowflakeManager instead."""
+    """Legacy function - use SnowflakeManager instead.
+
+    Returns a dedicated, unpooled connection; the caller is responsible for closing it.
+    """
     manager = SnowflakeManager()
-    return manager.get_connection().__enter__()
+    return snowflake.connector.connect(**manager.connection_params)
 
 # Global instance for easy access (lazy initialization)
 snowflake_manager = None
 
 def get_snowflake_manager():
-    """Get or create the global SnowflakeManager instance."""
+    """Get or create the global SnowflakeManager instance.
+
+    Set DB_BACKEND=sqlite to run against the embedded local backend instead of Snowflake.
+    """
     global snowflake_manager
     if snowflake_manager is None:
-        snowflake_manager = SnowflakeManager()
+        backend = os.getenv("DB_BACKEND", "snowflake").lower()
+        if backend in ("sqlite", "local"):
+            from .local_backend import LocalManager
+            snowflake_manager = LocalManager()
+        elif backend == "snowflake":
+            snowflake_manager = SnowflakeManager()
+        else:
+            raise ValueError(f"Unknown DB_BACKEND '{backend}', expected 'snowflake' or 'sqlite'")
     return snowflake_manager
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""Binary station snapshot, memory-mapped read-only by every API worker.
+
+Without it each uvicorn worker loads the stations table into its own station
+catalog. The ingestion job instead writes the table once to a file that
+workers map with mmap, so the station data sits once in the page cache
+however many workers share it, and a worker "loads" by mapping the file.
+
+Layout: an 8-byte magic, a 4-byte header length and a JSON header, then
+64-byte aligned sections listed in the header by name, dtype, offset and
+length:
+
+- one fixed-width array per numeric column (SNAPSHOT_FIXED_COLUMNS), plus a
+  ``<column>.valid`` byte array for columns holding NULLs;
+- one ``<column>.offsets`` array per text column into a shared UTF-8 string
+  table (``strings``), NULLs again marked in ``<column>.valid``;
+- ``row_hash``, a 64-bit digest of each row, so the next snapshot's changed
+  rows are found by comparing arrays;
+- ``ocm_ids``, the sorted Open Charge Map ids, and ``grid.*``, the station
+  catalog's spatial index (db/geo.grid_index_arrays) prebuilt for
+  ``cell_deg``.
+
+Rows are in id order. Other column types (timestamps) are stored as their
+text. Snapshots are written to a temporary file and renamed over the old one,
+so a reader maps either the old or the new file, never a partial one; a
+mapping stays valid after its file is replaced.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import namedtuple
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from .geo import grid_index_arrays
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"EVSNAP1\n"
+SNAPSHOT_ALIGN = 64
+
+# Numeric station columns stored as fixed-width arrays; every other column is text
+SNAPSHOT_FIXED_COLUMNS = {
+    'id': '<i8',
+    'ocm_id': '<i8',
+    'latitude': '<f8',
+    'longitude': '<f8',
+    'available': '|b1',
+    'connector_mask': '<u4',
+    'max_power_kw': '<f8',
+}
+
+SNAPSHOT_STATIONS_SQL = "SELECT * EXCLUDE (location) FROM stations"
+
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+
+def _row_hash(values: tuple) -> int:
+    digest = hashlib.blake2b(json.dumps(values, default=str).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _columns_of(row: Any) -> List[str]:
+    return list(row.keys()) if isinstance(row, dict) else list(row._fields)
+
+
+def _fixed_array(values: List[Any], dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    valid = np.array([value is not None for value in values], dtype=bool)
+    array = np.array([0 if value is None else value for value in values], dtype=dtype)
+    return array, (None if valid.all() else valid)
+
+
+def _text_arrays(values: List[Any], table: bytearray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    offsets = np.empty(len(values) + 1, dtype='<u8')
+    offsets[0] = len(table)
+    for i, value in enumerate(values):
+        if value is not None:
+            table += str(value).encode('utf-8')
+        offsets[i + 1] = len(table)
+    valid = np.array([value is not None for value in values], dtype=bool)
+    return offsets, (None if valid.all() else valid)
+
+
+def write_snapshot(rows: Iterable[Any], path: str, version: Optional[int] = None,
+                   cell_deg: float = 0.1) -> Dict[str, Any]:
+    """Write station rows (dicts or named tuples of one shape) to ``path`` atomically. Returns the header.
+
+    ``version`` defaults to one more than the snapshot being replaced.
+    """
+    started = time.perf_counter()
+    rows = sorted(rows, key=lambda row: row['id'] if isinstance(row, dict) else row.id)
+    if rows:
+        columns = _columns_of(rows[0])
+        values = [tuple(row[column] for column in columns) if isinstance(row, dict) else tuple(row) for row in rows]
+    else:
+        columns, values = list(SNAPSHOT_FIXED_COLUMNS), []
+    by_column = dict(zip(columns, zip(*values))) if values else {column: () for column in columns}
+    if version is None:
+        version = read_snapshot_version(path) + 1
+
+    sections: Dict[str, np.ndarray] = {}
+    table = bytearray()
+    for column in columns:
+        column_values = list(by_column[column])
+        if column in SNAPSHOT_FIXED_COLUMNS:
+            array, valid = _fixed_array(column_values, SNAPSHOT_FIXED_COLUMNS[column])
+            sections[column] = array
+        else:
+            sections[f"{column}.offsets"], valid = _text_arrays(column_values, table)
+        if valid is not None:
+            sections[f"{column}.valid"] = valid
+    sections['strings'] = np.frombuffer(bytes(table), dtype=np.uint8)
+    sections['row_hash'] = np.array([_row_hash(row) for row in values], dtype='<u8')
+    if 'ocm_id' in sections:
+        held = sections.get('ocm_id.valid')
+        sections['ocm_ids'] = np.sort(sections['ocm_id'] if held is None else sections['ocm_id'][held])
+    else:
+        sections['ocm_ids'] = np.empty(0, dtype='<i8')
+    for name, array in grid_index_arrays(sections['latitude'], sections['longitude'], cell_deg).items():
+        sections[f"grid.{name}"] = array
+
+    header: Dict[str, Any] = {
+        "version": version,
+        "written_at": time.time(),
+        "count": len(rows),
+        "columns": columns,
+        "cell_deg": cell_deg,
+        "sections": {},
+    }
+    offset = 0
+    for name, array in sections.items():
+        header["sections"][name] = {"dtype": array.dtype.str, "offset": offset, "length": len(array)}
+        offset = _aligned(offset + array.nbytes)
+
+    # Section offsets are relative to the data start, which depends on the header's own length
+    encoded = json.dumps(header).encode('utf-8')
+    data_start = _aligned(len(SNAPSHOT_MAGIC) + _HEADER_LENGTH.size + len(encoded))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".station_snapshot.", dir=directory)
+    try:
+        # Readable by workers running as other users, like a file written with open()
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC + _HEADER_LENGTH.pack(len(encoded)) + encoded)
+            for name, array in sections.items():
+                f.seek(data_start + header["sections"][name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    # Persist the rename itself
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+    header["bytes"] = data_start + offset
+    header["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Wrote station snapshot v{version}: {len(rows)} stations, {header['bytes']} bytes "
+                f"in {header['seconds']}s to {path}")
+    return header
+
+
+def export_station_snapshot(manager, path: str, cell_deg: float = 0.1, batch_size: int = 5000) -> Dict[str, Any]:
+    """Write the stations table to a snapshot at ``path`` (see write_snapshot)."""
+    rows: List[tuple] = []
+    for batch in manager.iter_query(SNAPSHOT_STATIONS_SQL, batch_size=batch_size, row_type='row'):
+        rows.extend(batch)
+    return write_snapshot(rows, path, cell_deg=cell_deg)
+
+
+def _read_header(f) -> Tuple[Dict[str, Any], int]:
+    prefix = f.read(len(SNAPSHOT_MAGIC) + _HEADER_LENGTH.size)
+    if prefix[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f"Not a station snapshot: {getattr(f, 'name', f)}")
+    (length,) = _HEADER_LENGTH.unpack(prefix[len(SNAPSHOT_MAGIC):])
+    header = json.loads(f.read(length))
+    return header, _aligned(len(prefix) + length)
+
+
+def read_snapshot_version(path: str) -> int:
+    """Version of the snapshot at ``path``, or 0 if there is none."""
+    try:
+        with open(path, 'rb') as f:
+            return int(_read_header(f)[0]["version"])
+    except FileNotFoundError:
+        return 0
+
+
+def snapshot_identity(path: str) -> Optional[Tuple[int, int, int]]:
+    """(inode, mtime, size) of the file at ``path``; changes whenever a new snapshot replaces it."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class SnapshotRows(Sequence):
+    """Read-only sequence of a snapshot's rows, each decoded into a named tuple when accessed."""
+
+    def __init__(self, snapshot: "StationSnapshot"):
+        self._snapshot = snapshot
+        self._row = namedtuple('Row', snapshot.columns)
+        self._decoders = [snapshot._decoder(column) for column in snapshot.columns]
+
+    def __len__(self) -> int:
+        return self._snapshot.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self[j] for j in range(*i.indices(len(self))))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._row(*(decode(i) for decode in self._decoders))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class StationSnapshot:
+    """A station snapshot file mapped read-only; every array is a view of the mapping.
+
+    The mapping is released once the snapshot and all arrays taken from it
+    are no longer referenced.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self.header, self._data_start = _read_header(f)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.version: int = self.header["version"]
+        self.count: int = self.header["count"]
+        self.columns: List[str] = self.header["columns"]
+        self.cell_deg: float = self.header["cell_deg"]
+        self._sections = {
+            name: np.frombuffer(self._map, dtype=np.dtype(section["dtype"]), count=section["length"],
+                                offset=self._data_start + section["offset"])
+            for name, section in self.header["sections"].items()
+        }
+        self.rows = SnapshotRows(self)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._map)
+
+    def array(self, name: str) -> np.ndarray:
+        """A section (column name, ``<column>.valid``, ``row_hash``, ``ocm_ids``, ``grid.*``)."""
+        return self._sections[name]
+
+    def has(self, name: str) -> bool:
+        return name in self._sections
+
+    def valid(self, column: str) -> np.ndarray:
+        """Which rows hold a value for ``column``."""
+        if f"{column}.valid" in self._sections:
+            return self._sections[f"{column}.valid"]
+        return np.ones(self.count, dtype=bool)
+
+    def grid_arrays(self) -> Dict[str, np.ndarray]:
+        """The prebuilt spatial index arrays, for GridIndex.from_arrays."""
+        return {name[len("grid."):]: array for name, array in self._sections.items() if name.startswith("grid.")}
+
+    def _decoder(self, column: str):
+        # Indexing memoryviews yields plain Python ints, floats and bools, several times faster than NumPy scalars
+        valid = self._sections.get(f"{column}.valid")
+        valid = None if valid is None else memoryview(valid)
+        if column in self._sections:
+            values = memoryview(self._sections[column])
+            if valid is None:
+                return values.__getitem__
+            return lambda i: values[i] if valid[i] else None
+
+        offsets, strings = memoryview(self._sections[f"{column}.offsets"]), self._map
+        base = self._data_start + self.header["sections"]["strings"]["offset"]
+
+        def text(i):
+            if valid is not None and not valid[i]:
+                return None
+            return str(strings[base + offsets[i]:base + offsets[i + 1]], 'utf-8')
+        return text
+
+    def positions_of(self, ids) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, found) of station ids; rows are in id order, so this is a binary search."""
+        station_ids = self._sections['id']
+        ids = np.asarray(ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(station_ids, ids), max(self.count - 1, 0))
+        found = station_ids[positions] == ids if self.count else np.zeros(len(ids), dtype=bool)
+        return positions, found
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "stations": self.count,
+            "bytes": self.nbytes,
+            "written_at": self.header["written_at"],
+        }
@@ -0,0 +1,69 @@
+"""Materialized station statistics.
+
+Station counts are kept per (dimension, value) pair, e.g. ("state", "Tamil
+Nadu") -> 812, plus ("total", "") for the station count. Every summary the
+API serves (distinct countries, stations per state, availability share, top
+towns) derives from these counts, so they can be maintained incrementally
+instead of re-aggregating the stations table on each request.
+"""
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Columns statistics are broken down by
+STATION_STATS_DIMENSIONS = ('state', 'energy_type', 'town', 'country', 'available')
+TOTAL = ('total', '')
+
+StatsKey = Tuple[str, str]
+
+
+def stats_value(dimension: str, value: Any) -> str:
+    """Canonical string for a dimension value; '' stands for NULL or empty."""
+    if dimension == 'available':
+        if value is None or value == '':
+            return ''
+        return 'true' if value in (True, 1, '1') or str(value).lower() == 'true' else 'false'
+    return '' if value is None else str(value)
+
+
+def station_stats_keys(station: Any) -> List[StatsKey]:
+    """The keys one station counts towards; ``station`` is a row dict or named tuple."""
+    get = station.get if isinstance(station, dict) else lambda column: getattr(station, column, None)
+    return [TOTAL] + [(dimension, stats_value(dimension, get(dimension))) for dimension in STATION_STATS_DIMENSIONS]
+
+
+def count_stations(stations: Iterable[Any]) -> Counter:
+    """Full recomputation of the counts from station rows."""
+    counts: Counter = Counter()
+    for station in stations:
+        counts.update(station_stats_keys(station))
+    return counts
+
+
+def diff_stats(expected: Dict[StatsKey, int], actual: Dict[StatsKey, int]) -> Dict[StatsKey, int]:
+    """Non-zero ``expected - actual`` per key; empty when the two agree."""
+    keys = set(expected) | set(actual)
+    return {key: expected.get(key, 0) - actual.get(key, 0) for key in keys
+            if expected.get(key, 0) != actual.get(key, 0)}
+
+
+def summarize_station_stats(counts: Dict[StatsKey, int], top_towns: int = 10) -> Dict[str, Any]:
+    """The statistics payload served by /stations/statistics and the ingestion report."""
+    by_dimension: Dict[str, List[Dict[str, Any]]] = {dimension: [] for dimension in STATION_STATS_DIMENSIONS}
+    for (dimension, value), count in counts.items():
+        if dimension in by_dimension and count > 0:
+            by_dimension[dimension].append({dimension: value or None, "count": count})
+    for rows in by_dimension.values():
+        rows.sort(key=lambda row: (-row["count"], str(next(iter(row.values())))))
+
+    total = counts.get(TOTAL, 0)
+    available = counts.get(('available', 'true'), 0)
+    return {
+        "total_stations": total,
+        "countries": sum(1 for row in by_dimension['country'] if row['country']),
+        "energy_types": sum(1 for row in by_dimension['energy_type'] if row['energy_type']),
+        "availability_percentage": round(available * 100 / total, 2) if total else 0.0,
+        "by_state": by_dimension['state'],
+        "by_energy_type": by_dimension['energy_type'],
+        "by_city": [{"town": row['town'], "count": row['count']} for row in by_dimension['town'] if row['town']][:top_towns],
+    }
@@ -54,7 +54,8 @@ const MapPage = ({ user }) => {
       );
       if (response.ok) {
         const data = await response.json();
-        setNearbyStations(data);
+        // { stations, sources, sources_answered }: stations from whichever sources answered in time
+        setNearbyStations(data.stations);
       }
     } catch (error) {
       console.error('Error fetching nearby stations:', error);
@@ -1,38 +1,60 @@
-import React, { useEffect, useState } from "react";
-import { MapContainer, TileLayer, Marker, Popup } from "react-leaflet";
+import React, { useCallback, useEffect, useState } from "react";
+import { MapContainer, TileLayer, Marker, Popup, CircleMarker, Tooltip, useMapEvents } from "react-leaflet";
 import "leaflet/dist/leaflet.css";
 
-const API_URL = "http://localhost:8000/stations";
+const API_URL = "http://localhost:8000/stations/clusters";
 
-const MapView = () => {
-  const [stations, setStations] = useState([]);
+// Clusters come from the server per view and zoom, so only a few hundred markers are ever sent
+const ClusterLayer = () => {
+  const [clusters, setClusters] = useState([]);
 
-  useEffect(() => {
-    fetch(API_URL)
+  const load = useCallback((map) => {
+    const bounds = map.getBounds();
+    const bbox = [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+      .map((value) => Math.max(-180, Math.min(180, value)).toFixed(5))
+      .join(",");
+    fetch(`${API_URL}?bbox=${bbox}&zoom=${map.getZoom()}`)
       .then((res) => res.json())
-      .then(setStations)
+      .then((body) => setClusters(body.clusters || []))
       .catch(console.error);
   }, []);
 
-  return (
-    <MapContainer center={[10.877185, 77.005055]} zoom={12} style={{ height: "80vh", width: "100%" }}>
-      <TileLayer
-        attribution='&copy; OpenStreetMap contributors'
-        url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png" 
-      />
-      {stations
-        .filter(station => station.latitude !== undefined && station.longitude !== undefined)
-        .map((station) => (
-          <Marker key={station.id} position={[station.latitude, station.longitude]}>
-            <Popup>
-              <b>{station.name}</b><br />
-              Energy: {station.energy_type}<br />
-              {station.available ? "Available" : "Occupied"}
-            </Popup>
-          </Marker>
-        ))}
-    </MapContainer>
+  const map = useMapEvents({ moveend: () => load(map) });
+  useEffect(() => load(map), [load, map]);
+
+  return clusters.map((cluster) =>
+    cluster.count === 1 ? (
+      <Marker key={`s${cluster.station_id}`} position={[cluster.lat, cluster.lon]}>
+        <Popup>
+          <b>{cluster.name}</b><br />
+          Energy: {cluster.energy_type}<br />
+          {cluster.available ? "Available" : "Occupied"}
+        </Popup>
+      </Marker>
+    ) : (
+      <CircleMarker
+        key={`c${cluster.lat},${cluster.lon}`}
+        center={[cluster.lat, cluster.lon]}
+        radius={Math.min(12 + Math.log2(cluster.count) * 3, 36)}
+        pathOptions={{ color: "#2e7d32", fillOpacity: 0.6 }}
+        eventHandlers={{ click: () => map.setView([cluster.lat, cluster.lon], map.getZoom() + 2) }}
+      >
+        <Tooltip direction="center" permanent className="cluster-count">
+          {cluster.count}
+        </Tooltip>
+      </CircleMarker>
+    )
   );
 };
 
-export default MapView;
\ No newline at end of file
+const MapView = () => (
+  <MapContainer center={[10.877185, 77.005055]} zoom={12} style={{ height: "80vh", width: "100%" }}>
+    <TileLayer
+      attribution='&copy; OpenStreetMap contributors'
+      url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
+    />
+    <ClusterLayer />
+  </MapContainer>
+);
+
+export default MapView;